@@ -0,0 +1,108 @@
+""" Benchmark the CircleCI API cost of
+:obj:`karr_lab_build_utils.core.BuildHelper.trigger_tests_of_downstream_dependencies`
+
+The benchmark serves a synthetic build cascade from a local :obj:`karr_lab_build_utils.testing.CircleCiStandIn`, so
+it doesn't require network access. An upstream package is built, and it triggers each of its downstream packages, each
+of which has several recent builds. The cascade is run twice: first with empty local caches, and then again with the
+caches of the first run, as if the upstream build were retried. Usage::
+
+    python benchmarks/circleci_cascade.py [--n-packages 20] [--n-builds 30] [--latency 0.1]
+
+:License: MIT
+"""
+
+import argparse
+import json
+import mock
+import os
+import shutil
+import tempfile
+import time
+
+
+def get_fixtures(n_packages, n_builds):
+    """ Get the fixtures of a synthetic build cascade
+
+    Args:
+        n_packages (:obj:`int`): number of downstream packages
+        n_builds (:obj:`int`): number of recent builds of each downstream package
+
+    Returns:
+        :obj:`dict`: fixtures for :obj:`karr_lab_build_utils.testing.CircleCiStandIn`
+    """
+    fixtures = {
+        'GET /v1.1/project/github/KarrLab/upstream/1': {
+            'status': 200,
+            'body': {'build_num': 1, 'lifecycle': 'finished', 'status': 'success',
+                     'start_time': '2017-01-01T01:01:01-05:00', 'circle_yml': {'string': '{}'}},
+        },
+    }
+    circle_yml = {'string': json.dumps({'jobs': {'build': {'steps': ['checkout']}}})}
+    for i_package in range(n_packages):
+        package = 'downstream_{}'.format(i_package)
+        builds = []
+        for build_num in range(n_builds, 0, -1):
+            build = {'build_num': build_num, 'build_parameters': {}, 'start_time': '2016-01-01T01:01:01.001Z',
+                     'status': 'success', 'lifecycle': 'finished'}
+            builds.append(build)
+            fixtures['GET /v1.1/project/github/KarrLab/{}/{}'.format(package, build_num)] = {
+                'status': 200,
+                'body': dict(build, circle_yml=circle_yml),
+            }
+        fixtures['GET /v1.1/project/github/KarrLab/{}'.format(package)] = {'status': 200, 'body': builds}
+        fixtures['POST /v2/project/github/KarrLab/{}/pipeline'.format(package)] = {
+            'status': 201, 'body': {'number': n_builds + 1, 'state': 'pending'}}
+    return fixtures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the CircleCI API cost of a build cascade')
+    parser.add_argument('--n-packages', type=int, default=20, help='Number of downstream packages')
+    parser.add_argument('--n-builds', type=int, default=30, help='Number of recent builds of each package')
+    parser.add_argument('--latency', type=float, default=0.1, help='Simulated latency of each request (s)')
+    args = parser.parse_args()
+
+    from karr_lab_build_utils.core import BuildHelper, CircleCiBuildStore, SqliteCascadeLedger
+    from karr_lab_build_utils.testing import CircleCiStandIn
+
+    dirname = tempfile.mkdtemp()
+    config_filename = os.path.join(dirname, '.karr_lab_build_utils.yml')
+    with open(config_filename, 'w') as file:
+        json.dump({'downstream_dependencies': ['downstream_{}'.format(i) for i in range(args.n_packages)]}, file)
+
+    test_results = mock.Mock(get_num_errors=lambda: 0, get_num_failures=lambda: 0)
+    env = {'UPSTREAM_REPONAME': 'upstream', 'UPSTREAM_BUILD_NUM': '1', 'CIRCLE_PROJECT_USERNAME': 'KarrLab'}
+
+    durations = {}
+    try:
+        with CircleCiStandIn(fixtures=get_fixtures(args.n_packages, args.n_builds), latency=args.latency) as stand_in:
+            with mock.patch.dict(os.environ, env), \
+                    mock.patch.object(BuildHelper, 'download_package_config_files'), \
+                    mock.patch.object(BuildHelper, 'install_package_config_files'), \
+                    mock.patch.object(BuildHelper, 'get_test_results', return_value=test_results):
+                for scenario in ['cold', 'repeat']:
+                    build_helper = BuildHelper()
+                    build_helper.CIRCLE_API_ENDPOINT = stand_in.endpoint
+                    build_helper.circleci_build_store = CircleCiBuildStore(os.path.join(dirname, 'builds.sqlite'))
+                    build_helper.cascade_ledger = SqliteCascadeLedger(os.path.join(dirname, 'ledger.sqlite'))
+
+                    start = time.perf_counter()
+                    with stand_in.scenario(scenario):
+                        build_helper.trigger_tests_of_downstream_dependencies(config_filename=config_filename)
+                    durations[scenario] = time.perf_counter() - start
+
+                    build_helper.circleci_build_store.close()
+                    build_helper.cascade_ledger.close()
+    finally:
+        shutil.rmtree(dirname)
+
+    print('{} downstream packages, {} recent builds each, {:.0f} ms latency'.format(
+        args.n_packages, args.n_builds, args.latency * 1e3))
+    print('{:<10} {:>10} {:>10}'.format('Cascade', 'Requests', 'Time (s)'))
+    for scenario in ['cold', 'repeat']:
+        print('{:<10} {:>10d} {:>10.3f}'.format(
+            scenario, sum(stand_in.get_counts(scenario).values()), durations[scenario]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+""" Benchmark the overhead of the coverage types supported by :obj:`karr_lab_build_utils.core.BuildHelper.run_tests`
+
+Each coverage type is measured in a separate process which imports a synthetic package and runs a CPU-bound workload
+with many repeated lines and branches, which is representative of simulation tests. Usage::
+
+    python benchmarks/coverage_overhead.py [--repeats 3] [--n-iterations 1000000]
+
+:License: MIT
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+COVERAGE_TYPES = ('none', 'statement', 'branch', 'fast')
+
+WORKLOAD = '''
+def simulate(n_iterations):
+    state = [0, 0, 0]
+    for i_iteration in range(n_iterations):
+        if i_iteration % 3 == 0:
+            state[0] += 1
+        elif i_iteration % 3 == 1:
+            state[1] += 1
+        else:
+            state[2] += 1
+        if state[0] > state[1]:
+            state[2] -= 1
+    return state
+'''
+
+
+def run(coverage_type, dirname, n_iterations):
+    """ Run the workload with a type of coverage and return its duration
+
+    Args:
+        coverage_type (:obj:`str`): type of coverage (``none``, ``statement``, ``branch``, or ``fast``)
+        dirname (:obj:`str`): directory which contains the synthetic package
+        n_iterations (:obj:`int`): number of iterations of the workload
+
+    Returns:
+        :obj:`float`: duration of the workload (s)
+    """
+    import coverage
+    from karr_lab_build_utils.core import BuildHelper
+
+    sys.path.insert(0, dirname)
+    data_file = os.path.join(dirname, '.coverage')
+    if coverage_type == 'none':
+        cov = None
+    elif coverage_type == 'fast':
+        cov = BuildHelper._start_fast_coverage(data_file=data_file, source=['bench_pkg'])
+    else:
+        cov = coverage.Coverage(data_file=data_file, source=['bench_pkg'], branch=coverage_type == 'branch')
+        cov.start()
+
+    import bench_pkg.workload
+    start = time.perf_counter()
+    bench_pkg.workload.simulate(n_iterations)
+    duration = time.perf_counter() - start
+
+    if cov is not None:
+        cov.stop()
+        cov.save()
+    return duration
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the overhead of each type of coverage')
+    parser.add_argument('--repeats', type=int, default=3, help='Number of times to run each type of coverage')
+    parser.add_argument('--n-iterations', type=int, default=1000000, help='Number of iterations of the workload')
+    parser.add_argument('--coverage-type', choices=COVERAGE_TYPES, default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--dirname', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # run a single measurement in this process
+    if args.coverage_type:
+        print(run(args.coverage_type, args.dirname, args.n_iterations))
+        return
+
+    # run each type of coverage in a separate process
+    dirname = tempfile.mkdtemp()
+    try:
+        os.mkdir(os.path.join(dirname, 'bench_pkg'))
+        with open(os.path.join(dirname, 'bench_pkg', '__init__.py'), 'w'):
+            pass
+        with open(os.path.join(dirname, 'bench_pkg', 'workload.py'), 'w') as file:
+            file.write(WORKLOAD)
+
+        durations = {}
+        for coverage_type in COVERAGE_TYPES:
+            durations[coverage_type] = min(
+                float(subprocess.check_output([
+                    sys.executable, __file__,
+                    '--coverage-type', coverage_type,
+                    '--dirname', dirname,
+                    '--n-iterations', str(args.n_iterations),
+                ]).decode().strip().split('\n')[-1])
+                for i_repeat in range(args.repeats))
+    finally:
+        shutil.rmtree(dirname)
+
+    print('Python {}.{}.{}'.format(*sys.version_info[0:3]))
+    print('{:<10} {:>10} {:>10}'.format('Coverage', 'Time (s)', 'Overhead'))
+    for coverage_type in COVERAGE_TYPES:
+        print('{:<10} {:>10.3f} {:>9.2f}x'.format(
+            coverage_type, durations[coverage_type], durations[coverage_type] / durations['none']))
+
+
+if __name__ == '__main__':
+    main()
@@ -2,6 +2,9 @@ from ._version import __version__
 # :obj:`str`: version
 
 # API
-from .core import (CoverageType, Environment,
+from .core import (CoverageType, Environment, TaskExecutor,
                    BuildHelper, BuildHelperError,
-                   TestResults, TestCaseResult, TestCaseResultType)
+                   TestResults, TestResultsDiff, TestCaseResult, TestCaseResultType, XmlText,
+                   TestHistory, CoverageModel, FileCoverage, DiffCoverage, TaskScheduler, Tracer, TraceSpan, FileCache,
+                   CircleCiClient, CircleCiBuildStore, CascadeLedger, SqliteCascadeLedger,
+                   DependencyIndex)
@@ -232,7 +232,7 @@ class RunTestsController(cement.Controller):
                 type=str, default='tests/reports', help="Directory to store coverage data; default='tests/reports'")),
             (['--coverage-type'], dict(
                 type=str, default='branch',
-                help="Type of coverage analysis to run {statement, branch, or multiple-decision}; default='branch'")),
+                help="Type of coverage analysis to run {statement, branch, multiple-decision, or fast}; default='branch'")),
             (['--environment'], dict(
                 type=str, default='local',
                 help="Environment to run tests (local, docker, or circleci); default='local'")),
@@ -361,7 +361,7 @@ class RunTestsInDockerContainerController(cement.Controller):
                 type=str, default='tests/reports', help="Directory to store coverage data; default='tests/reports'")),
             (['--coverage-type'], dict(
                 type=str, default='branch',
-                help="Type of coverage analysis to run {statement, branch, or multiple-decision}; default='branch'")),
+                help="Type of coverage analysis to run {statement, branch, multiple-decision, or fast}; default='branch'")),
         ]
 
     @cement.ex(hide=True)
@@ -624,6 +624,135 @@ class DoPostTestTasksController(cement.Controller):
                 raise SystemExit('Post-test tasks were not successful')
 
 
+class TestHistoryController(cement.Controller):
+    """ Base controller for the local test history database """
+
+    class Meta:
+        label = 'test-history'
+        description = 'Local test history database utilities'
+        help = 'Local test history database utilities'
+        stacked_on = 'base'
+        stacked_type = 'nested'
+        arguments = []
+
+    @cement.ex(hide=True)
+    def _default(self):
+        self._parser.print_help()
+
+
+class ArchiveTestResultsToHistoryController(cement.Controller):
+    """ Archive the test results of the current build to the local test history database """
+
+    class Meta:
+        label = 'archive'
+        description = 'Archive the test results of the current build to the local test history database'
+        help = 'Archive the test results of the current build to the local test history database'
+        stacked_on = 'test-history'
+        stacked_type = 'nested'
+        arguments = []
+
+    @cement.ex(hide=True)
+    def _default(self):
+        buildHelper = BuildHelper()
+        buildHelper.archive_test_results_to_history()
+
+
+class GetFlakyTestsController(cement.Controller):
+    """ Get the test cases of a repository whose outcomes change between builds """
+
+    class Meta:
+        label = 'flaky-tests'
+        description = 'Get the test cases of a repository whose outcomes change between builds'
+        help = 'Get the test cases of a repository whose outcomes change between builds'
+        stacked_on = 'test-history'
+        stacked_type = 'nested'
+        arguments = [
+            (['--repo-name'], dict(
+                type=str, default=None, help='Name of the repository. This defaults to the name of the current repository.')),
+            (['--min-builds'], dict(
+                type=int, default=2, help='Minimum number of runs of a test case to calculate its flake rate')),
+        ]
+
+    @cement.ex(hide=True)
+    def _default(self):
+        args = self.app.pargs
+        buildHelper = BuildHelper()
+        history = buildHelper.get_test_history()
+        flake_rates = history.get_flake_rates(args.repo_name or buildHelper.repo_name, min_builds=args.min_builds)
+        history.close()
+
+        if flake_rates:
+            for classname, name, python_version, n_runs, flake_rate in flake_rates:
+                print('{}.{} (Python {}): {:.1f}% of {} runs'.format(classname, name, python_version, flake_rate * 100., n_runs))
+        else:
+            print('No flaky tests were found.')
+
+
+class GetTestDurationTrendController(cement.Controller):
+    """ Get the durations of a test case across builds """
+
+    class Meta:
+        label = 'duration-trend'
+        description = 'Get the durations of a test case across builds'
+        help = 'Get the durations of a test case across builds'
+        stacked_on = 'test-history'
+        stacked_type = 'nested'
+        arguments = [
+            (['classname'], dict(type=str, help='Name of the class of the test case')),
+            (['name'], dict(type=str, help='Name of the test case')),
+            (['--python-version'], dict(type=str, default=None, help='Python version')),
+            (['--repo-name'], dict(
+                type=str, default=None, help='Name of the repository. This defaults to the name of the current repository.')),
+        ]
+
+    @cement.ex(hide=True)
+    def _default(self):
+        args = self.app.pargs
+        buildHelper = BuildHelper()
+        history = buildHelper.get_test_history()
+        durations = history.get_duration_trend(args.repo_name or buildHelper.repo_name, args.classname, args.name,
+                                               python_version=args.python_version)
+        history.close()
+
+        if durations:
+            for build_num, python_version, time in durations:
+                print('{}\t{}\t{}'.format(build_num, python_version, time))
+        else:
+            print('No results were found.')
+
+
+class GetFirstFailingBuildController(cement.Controller):
+    """ Get the first build of the latest sequence of failing builds of a test case """
+
+    class Meta:
+        label = 'first-failing-build'
+        description = 'Get the first build of the latest sequence of failing builds of a test case'
+        help = 'Get the first build of the latest sequence of failing builds of a test case'
+        stacked_on = 'test-history'
+        stacked_type = 'nested'
+        arguments = [
+            (['classname'], dict(type=str, help='Name of the class of the test case')),
+            (['name'], dict(type=str, help='Name of the test case')),
+            (['--python-version'], dict(type=str, default=None, help='Python version')),
+            (['--repo-name'], dict(
+                type=str, default=None, help='Name of the repository. This defaults to the name of the current repository.')),
+        ]
+
+    @cement.ex(hide=True)
+    def _default(self):
+        args = self.app.pargs
+        buildHelper = BuildHelper()
+        history = buildHelper.get_test_history()
+        build_num = history.get_first_failing_build(args.repo_name or buildHelper.repo_name, args.classname, args.name,
+                                                    python_version=args.python_version)
+        history.close()
+
+        if build_num is None:
+            print('The test case passed in its latest build.')
+        else:
+            print('The test case has been failing since build {}.'.format(build_num))
+
+
 class MakeAndArchiveReportsController(cement.Controller):
     """ Make and archive reports:
 
@@ -676,6 +805,30 @@ class CombineCoverageReportsController(cement.Controller):
         buildHelper.combine_coverage_reports(coverage_dirname=args.coverage_dirname)
 
 
+class MakeCoverageReportController(cement.Controller):
+    """ Make an HTML coverage report """
+
+    class Meta:
+        label = 'make-coverage-report'
+        description = 'Make an HTML coverage report from the combined coverage data (.coverage)'
+        help = 'Make an HTML coverage report from the combined coverage data (.coverage)'
+        stacked_on = 'base'
+        stacked_type = 'nested'
+        arguments = [
+            (['--coverage-dirname'], dict(
+                type=str, default='tests/reports', help="Directory to store coverage data; default='tests/reports'")),
+            (['--html-dirname'], dict(
+                type=str, default=None,
+                help="Directory to save the report; default: the 'html' subdirectory of the coverage directory")),
+        ]
+
+    @cement.ex(hide=True)
+    def _default(self):
+        args = self.app.pargs
+        buildHelper = BuildHelper()
+        buildHelper.make_coverage_report(coverage_dirname=args.coverage_dirname, html_dirname=args.html_dirname)
+
+
 class ArchiveCoverageReportController(cement.Controller):
     """ Archive a coverage report:
 
@@ -707,6 +860,36 @@ class ArchiveCoverageReportController(cement.Controller):
         buildHelper.archive_coverage_report(coverage_dirname=args.coverage_dirname, dry_run=dry_run)
 
 
+class DiffCoverageController(cement.Controller):
+    """ Report the coverage of the lines which have changed relative to a base revision """
+
+    class Meta:
+        label = 'diff-coverage'
+        description = 'Report the coverage of the lines which have changed relative to a base revision'
+        help = 'Report the coverage of the lines which have changed relative to a base revision'
+        stacked_on = 'base'
+        stacked_type = 'nested'
+        arguments = [
+            (['--base'], dict(
+                type=str, default=BuildHelper.DEFAULT_DIFF_COVERAGE_BASE,
+                help="Git revision to compare against; default='{}'".format(BuildHelper.DEFAULT_DIFF_COVERAGE_BASE))),
+            (['--coverage-dirname'], dict(
+                type=str, default='tests/reports', help="Directory to store coverage data; default='tests/reports'")),
+        ]
+
+    @cement.ex(hide=True)
+    def _default(self):
+        args = self.app.pargs
+        buildHelper = BuildHelper()
+        diff_coverage = buildHelper.get_diff_coverage(base=args.base, coverage_dirname=args.coverage_dirname)
+
+        for filename, (covered, uncovered) in diff_coverage.files.items():
+            print('{}: {} of {} changed lines covered'.format(filename, len(covered), len(covered) + len(uncovered)))
+            if uncovered:
+                print('  Uncovered lines: {}'.format(', '.join(str(line) for line in uncovered)))
+        print('{:.1f}% of the lines changed since {} are covered'.format(diff_coverage.get_percent(), diff_coverage.base))
+
+
 class UploadCoverageReportToCoverallsController(cement.Controller):
     """ Upload coverage report to Code Climate """
 
@@ -816,6 +999,40 @@ class CompileDownstreamDependenciesController(cement.Controller):
             print('No downstream packages were found.')
 
 
+class CompileAllDownstreamDependenciesController(cement.Controller):
+    """ Compile the downstream dependencies of all of the packages in a directory and save them to the configuration
+    file of each package """
+
+    class Meta:
+        label = 'compile-all-downstream-dependencies'
+        description = 'Compile the downstream dependencies of all of the packages in a directory'
+        help = 'Compile the downstream dependencies of all of the packages in a directory'
+        stacked_on = 'base'
+        stacked_type = 'nested'
+        arguments = [
+            (['--packages-parent-dir'], dict(
+                type=str, default='..', help='Path to the parent directory of the packages')),
+            (['--config-filename'], dict(
+                type=str, default='.karr_lab_build_utils.yml',
+                help='Path to save the configuration of each package, relative to the package')),
+        ]
+
+    @cement.ex(hide=True)
+    def _default(self):
+        args = self.app.pargs
+        buildHelper = BuildHelper()
+        downstream_dependencies = buildHelper.compile_all_downstream_dependencies(
+            packages_parent_dir=args.packages_parent_dir,
+            config_filename=args.config_filename)
+
+        if downstream_dependencies:
+            print('The following downstream dependencies were found:')
+            for package, packages in sorted(downstream_dependencies.items()):
+                print('  {}: {}'.format(package, ', '.join(packages)))
+        else:
+            print('No packages were found.')
+
+
 class ArePackageDependenciesAcyclicController(cement.Controller):
     """ Check if the package dependencies are acyclic so they are supported by CircleCI """
 
@@ -863,6 +1080,120 @@ class VisualizePackageDependenciesController(cement.Controller):
         buildHelper.visualize_package_dependencies(packages_parent_dir=args.packages_parent_dir, out_filename=args.out_filename)
 
 
+class GetDownstreamDependenciesController(cement.Controller):
+    """ Get the direct and indirect downstream dependencies of a package in topological order """
+
+    class Meta:
+        label = 'get-downstream-dependencies'
+        description = 'Get the direct and indirect downstream dependencies of a package in topological order'
+        help = 'Get the direct and indirect downstream dependencies of a package in topological order'
+        stacked_on = 'base'
+        stacked_type = 'nested'
+        arguments = [
+            (['package'], dict(
+                type=str, help='Name of the package')),
+            (['--packages-parent-dir'], dict(
+                type=str, default='..', help='Path to the parent directory of the packages')),
+        ]
+
+    @cement.ex(hide=True)
+    def _default(self):
+        args = self.app.pargs
+        buildHelper = BuildHelper()
+        index = buildHelper.get_dependency_index(packages_parent_dir=args.packages_parent_dir)
+        packages = index.get_downstream_closure(args.package)
+        if packages:
+            print('The following downstream dependencies were found:')
+            for i_wave, wave in enumerate(index.get_topological_waves(packages)):
+                print('  {}: {}'.format(i_wave + 1, ', '.join(wave)))
+        else:
+            print('No downstream packages were found.')
+
+
+class PredictCascadeDurationController(cement.Controller):
+    """ Predict the wall time of the build cascade triggered by a package and its critical path """
+
+    class Meta:
+        label = 'predict-cascade-duration'
+        description = 'Predict the wall time of the build cascade triggered by a package and its critical path'
+        help = 'Predict the wall time of the build cascade triggered by a package and its critical path'
+        stacked_on = 'base'
+        stacked_type = 'nested'
+        arguments = [
+            (['package'], dict(
+                type=str, help='Name of the package')),
+            (['--packages-parent-dir'], dict(
+                type=str, default='..', help='Path to the parent directory of the packages')),
+        ]
+
+    @cement.ex(hide=True)
+    def _default(self):
+        args = self.app.pargs
+        buildHelper = BuildHelper()
+        prediction = buildHelper.predict_cascade_duration(
+            package=args.package, packages_parent_dir=args.packages_parent_dir)
+
+        print('Predicted wall time: {:.1f} min'.format(prediction['wall_time'] / 60.))
+        print('Total build time: {:.1f} min'.format(prediction['total_time'] / 60.))
+        print('Critical path: {}'.format(' -> '.join(prediction['critical_path'])))
+        print('')
+        print('{:<30} {:<30} {:>10} {:>10} {:>10} {:>10} {:>10}'.format(
+            'Package', 'Triggered by', 'Queue', 'Duration', 'Start', 'Finish', 'Slack'))
+        for package, entry in sorted(prediction['schedule'].items(), key=lambda item: (item[1]['start'], item[0])):
+            print('{:<30} {:<30} {:>10.1f} {:>10.1f} {:>10.1f} {:>10.1f} {:>10.1f}'.format(
+                package, entry['triggered_by'] or '', entry['queue_time'] / 60., entry['duration'] / 60.,
+                entry['start'] / 60., entry['finish'] / 60., entry['slack'] / 60.))
+
+
+class TestDownstreamController(cement.Controller):
+    """ Locally test the downstream dependencies of a package against its working copy """
+
+    class Meta:
+        label = 'test-downstream'
+        description = 'Locally test the downstream dependencies of a package against its working copy'
+        help = 'Locally test the downstream dependencies of a package against its working copy'
+        stacked_on = 'base'
+        stacked_type = 'nested'
+        arguments = [
+            (['--dirname'], dict(
+                type=str, default='.', help='Path to package')),
+            (['--packages-parent-dir'], dict(
+                type=str, default='..', help='Path to the parent directory of the packages')),
+            (['--test-path'], dict(
+                type=str, default='tests', help='Path to the tests of each downstream package')),
+            (['--n-workers'], dict(
+                type=int, default=None, help='Maximum number of test suites to run concurrently')),
+            (['--no-install'], dict(
+                default=True, dest='install', action='store_false',
+                help='If set, do not install the package in editable mode')),
+        ]
+
+    @cement.ex(hide=True)
+    def _default(self):
+        args = self.app.pargs
+        buildHelper = BuildHelper()
+        results = buildHelper.test_downstream_dependencies(
+            dirname=args.dirname, packages_parent_dir=args.packages_parent_dir, test_path=args.test_path,
+            n_workers=args.n_workers, install=args.install)
+
+        if not results:
+            print('No downstream packages were found.')
+            return
+
+        print('{:<30} {:>6} {:>6} {:>6} {:>8} {:>8} {:>6} {:>10}'.format(
+            'Package', 'Result', 'Tests', 'Passed', 'Skipped', 'Failures', 'Errors', 'Time (s)'))
+        for package, result in results.items():
+            print('{:<30} {:>6} {:>6d} {:>6d} {:>8d} {:>8d} {:>6d} {:>10.1f}'.format(
+                package, 'pass' if result['passed'] else 'fail', result['num_tests'], result['num_passed'],
+                result['num_skipped'], result['num_failures'], result['num_errors'], result['duration']))
+
+        failed = [package for package, result in results.items() if not result['passed']]
+        if failed:
+            raise SystemExit('{} of {} downstream packages failed: {}'.format(
+                len(failed), len(results), ', '.join(failed)))
+        print('All {} downstream packages passed.'.format(len(results)))
+
+
 class AnalyzePackageController(cement.Controller):
     """ Perform static analyses of a package using Pylint """
 
@@ -1010,15 +1341,26 @@ class App(cement.App):
             DeleteCircleciEnvironmentVariableController,
             CreateCodeClimateGithubWebhookController,
             DoPostTestTasksController,
+            TestHistoryController,
+            ArchiveTestResultsToHistoryController,
+            GetFlakyTestsController,
+            GetTestDurationTrendController,
+            GetFirstFailingBuildController,
             MakeAndArchiveReportsController,
             CombineCoverageReportsController,
+            MakeCoverageReportController,
             ArchiveCoverageReportController,
+            DiffCoverageController,
             UploadCoverageReportToCoverallsController,
             UploadCoverageReportToCodeClimateController,
             MakeDocumentationController,
             CompileDownstreamDependenciesController,
+            CompileAllDownstreamDependenciesController,
             ArePackageDependenciesAcyclicController,
             VisualizePackageDependenciesController,
+            GetDownstreamDependenciesController,
+            PredictCascadeDurationController,
+            TestDownstreamController,
             AnalyzePackageController,
             FindMissingRequirementsController,
             FindUnusedRequirementsController,
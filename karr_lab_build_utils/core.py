@@ -11,12 +11,19 @@ from jinja2 import Template
 from pylint import epylint
 from sphinx.cmdline import main as sphinx_main
 from mock import patch
-from xml.dom import minidom
+import abc
 import abduct
+import array
+import ast
+import atexit
 import attrdict
 import click
+import collections
+import concurrent.futures
 import configparser
+import copy
 import coverage
+import coverage.python
 import coveralls
 import dateutil.parser
 import email
@@ -26,20 +33,27 @@ import email.utils
 import enum
 import fnmatch
 import ftputil
+import functools
 import git
 import github
 import glob
 import graphviz
+import hashlib
+import inspect
 # import instrumental.api
 import io
+import itertools
 import json
 import karr_lab_build_utils.config.core
 import logging
+import mmap
 import mock
+import multiprocessing
 import natsort
 import networkx
 import nose
 import os
+import pickle
 import pypandoc
 import pip._internal.commands.show
 import pip._internal.operations.freeze
@@ -53,21 +67,27 @@ import pkg_resources
 import pytest
 import _pytest
 import quilt3
+import random
 import re
 import requests
 import sphinx.ext.apidoc
 import shutil
 import smtplib
+import sqlite3
 import stat
+import statistics
 import subprocess
 import sys
 import tempfile
+import threading
 import time
 import twine.commands.upload
 import unittest
 import warnings
 import wc_utils
 import whichcraft
+import xml.etree.ElementTree
+import xml.parsers.expat
 import yaml
 
 
@@ -77,6 +97,7 @@ class CoverageType(enum.Enum):
     branch = 1
     multiple_condition = 2
     decision = 2
+    fast = 3
 
 
 class Environment(enum.Enum):
@@ -86,6 +107,41 @@ class Environment(enum.Enum):
     circleci = 2
 
 
+class TaskExecutor(enum.Enum):
+    """ Pools to run tasks """
+    thread = 0
+    process = 1
+
+
+def traced(category='build'):
+    """ Decorator which records each call of a method of :obj:`BuildHelper` as a span of its :obj:`BuildHelper.tracer`
+
+    The span is named after the method and its attributes are the arguments of the call which are strings, numbers,
+    or Booleans.
+
+    Args:
+        category (:obj:`str`, optional): category of the span
+
+    Returns:
+        :obj:`callable`: decorator
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            if not self.tracer.enabled:
+                return func(self, *args, **kwargs)
+
+            arguments = signature.bind(self, *args, **kwargs).arguments
+            attrs = {key: value for key, value in arguments.items()
+                     if key != 'self' and isinstance(value, (str, int, float, bool))}
+            with self.tracer.span(func.__name__, category=category, attrs=attrs):
+                return func(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
 class BuildHelper(object):
     """ Utility class to help build projects:
 
@@ -120,6 +176,11 @@ class BuildHelper(object):
         github_api_token (:obj:`str`): GitHub API token
         circleci_api_token (:obj:`str`): CircleCI API token
         test_server_token (:obj:`str`): test history report server token
+        test_history_filename (:obj:`str`): path to the local SQLite database of the history of test results
+        circleci_build_store_filename (:obj:`str`): path to the local SQLite database of finished CircleCI builds
+        circleci_build_store_max_size (:obj:`int`): maximum size of the finished CircleCI builds to store (bytes)
+        cascade_ledger_filename (:obj:`str`): path to the local SQLite ledger of the triggered downstream builds
+        dependency_index_dirname (:obj:`str`): local directory to save the dependency indices of package directories
         email_hostname (:obj:`str`): hostname and port for email server
         email_username (:obj:`str`): username for email server
         email_password (:obj:`str`): password for :obj:`email_username`
@@ -136,6 +197,14 @@ class BuildHelper(object):
 
         coveralls_token (:obj:`str`): Coveralls token
         code_climate_token (:obj:`str`): Code Climate token
+        code_climate_test_reporter_dirname (:obj:`str`): local directory to cache the Code Climate test reporter
+
+        file_cache (:obj:`FileCache`): cache of the build configuration and requirements parsed from files
+        circleci_client (:obj:`CircleCiClient`): pooled, rate-limited, and caching client for the CircleCI API
+        circleci_build_store (:obj:`CircleCiBuildStore`): local store of finished CircleCI builds
+        cascade_ledger (:obj:`CascadeLedger`): local ledger of the downstream builds triggered by each build cascade
+            on this machine
+        tracer (:obj:`Tracer`): tracer which records the duration of each build operation
 
         INITIAL_PACKAGE_VERSION (:obj:`str`): initial package version
         DEFAULT_BUILD_IMAGE_VERSION (:obj:`str`): default build image version
@@ -150,12 +219,24 @@ class BuildHelper(object):
         DEFAULT_PROJ_DOCS_SPELLING_DIR (:obj:`str`): default local directory where spell check results should be saved
         DEFAULT_PROJ_DOCS_BUILD_HTML_DIR (:obj:`str`): default local directory where generated HTML documentation should be saved
         DEFAULT_BUILD_IMAGE (:obj:`str`): default Docker image to use to run tests
+        TEST_RESULTS_CACHE_FILENAME (:obj:`str`): name of the file within :obj:`proj_tests_xml_dir` which caches parsed
+            test results
+        TEST_RESULTS_CACHE_VERSION (:obj:`int`): version of the format of the cache of parsed test results
+        COVERAGE_MANIFEST_FILENAME (:obj:`str`): name of the file within the coverage directory which lists the
+            coverage reports that have been combined
+        DEFAULT_DIFF_COVERAGE_BASE (:obj:`str`): default Git revision to compare against to find changed lines
+        COVERAGE_REPORT_MANIFEST_FILENAME (:obj:`str`): name of the file within the HTML coverage report directory
+            which records the state of the source and coverage of each page
 
         GITHUB_API_ENDPOINT (:obj:`str`): GitHub API endpoint
         CIRCLE_API_ENDPOINT (:obj:`str`): CircleCI API endpoint
 
         COVERALLS_ENABLED (:obj:`bool`): if :obj:`True`, upload coverage reports to Coveralls
         CODE_CLIMATE_ENABLED (:obj:`bool`): if :obj:`True`, upload coverage reports to Code Climate
+        CODE_CLIMATE_TEST_REPORTER_VERSION (:obj:`str`): version of the Code Climate test reporter
+        CODE_CLIMATE_TEST_REPORTER_URL (:obj:`str`): URL pattern for the Code Climate test reporter
+        CODE_CLIMATE_PAYLOAD_FILENAME (:obj:`str`): name of the file within the coverage directory to save the
+            Code Climate coverage payload
     """
 
     INITIAL_PACKAGE_VERSION = '0.0.1'
@@ -172,12 +253,20 @@ class BuildHelper(object):
     DEFAULT_PROJ_DOCS_BUILD_HTML_DIR = 'docs/_build/html'
     DEFAULT_PROJ_DOCS_BUILD_SPELLING_DIR = 'docs/_build/spelling'
     DEFAULT_BUILD_IMAGE = 'karrlab/wc_env_dependencies:latest'
+    TEST_RESULTS_CACHE_FILENAME = '.test_results.cache'
+    TEST_RESULTS_CACHE_VERSION = 1
+    COVERAGE_MANIFEST_FILENAME = '.coverage_manifest.json'
+    DEFAULT_DIFF_COVERAGE_BASE = 'origin/master'
+    COVERAGE_REPORT_MANIFEST_FILENAME = '.manifest.json'
 
     GITHUB_API_ENDPOINT = 'https://api.github.com'
     CIRCLE_API_ENDPOINT = 'https://circleci.com/api'
 
     COVERALLS_ENABLED = True
     CODE_CLIMATE_ENABLED = True
+    CODE_CLIMATE_TEST_REPORTER_VERSION = '0.11.1'
+    CODE_CLIMATE_TEST_REPORTER_URL = 'https://codeclimate.com/downloads/test-reporter/test-reporter-{}-linux-amd64'
+    CODE_CLIMATE_PAYLOAD_FILENAME = 'codeclimate.json'
 
     PATCHED_PACKAGES = (
         'log',
@@ -212,6 +301,8 @@ class BuildHelper(object):
         self.proj_docs_build_html_dir = self.DEFAULT_PROJ_DOCS_BUILD_HTML_DIR
         self.proj_docs_build_spelling_dir = self.DEFAULT_PROJ_DOCS_BUILD_SPELLING_DIR
         self.build_image = self.DEFAULT_BUILD_IMAGE
+        self._parsed_test_results_files = {}
+        self._parsed_test_results_files_lock = threading.Lock()
 
         config = karr_lab_build_utils.config.core.get_config()['karr_lab_build_utils']
         self.configs_repo_url = config['configs_repo_url']
@@ -229,6 +320,11 @@ class BuildHelper(object):
         self.github_api_token = config['github_api_token']
         self.circleci_api_token = config['circleci_api_token']
         self.test_server_token = config['test_server_token']
+        self.test_history_filename = os.path.expanduser(config['test_history_filename'])
+        self.circleci_build_store_filename = os.path.expanduser(config['circleci_build_store_filename'])
+        self.circleci_build_store_max_size = config['circleci_build_store_max_size']
+        self.cascade_ledger_filename = os.path.expanduser(config['cascade_ledger_filename'])
+        self.dependency_index_dirname = os.path.expanduser(config['dependency_index_dirname'])
         self.email_hostname = config['email_hostname']
         self.email_username = config['email_username']
         self.email_password = config['email_password']
@@ -246,6 +342,17 @@ class BuildHelper(object):
         self.coveralls_token = os.getenv('COVERALLS_REPO_TOKEN')
         self.code_climate_token = os.getenv('CODECLIMATE_REPO_TOKEN')
 
+        self.file_cache = FileCache()
+        self.circleci_client = CircleCiClient()
+        self.circleci_build_store = CircleCiBuildStore(self.circleci_build_store_filename,
+                                                       max_size=self.circleci_build_store_max_size)
+        self.cascade_ledger = SqliteCascadeLedger(self.cascade_ledger_filename)
+        self.tracer = Tracer.get_default()
+        self.tracer.redact(self.configs_repo_password, self.github_api_token, self.circleci_api_token,
+                           self.test_server_token, self.email_password, self.code_server_password,
+                           self.docs_server_password, self.coveralls_token, self.code_climate_token)
+        self.code_climate_test_reporter_dirname = os.path.expanduser(config['code_climate_test_reporter_dirname'])
+
         # setup logging
         self.logger = logger = logging.getLogger('karr_lab_build_utils')
         logger.setLevel(logging.INFO)
@@ -260,6 +367,15 @@ class BuildHelper(object):
         formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(pathname)s:%(lineno)d - %(message)s')
         handler.setFormatter(formatter)
 
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state['_parsed_test_results_files_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._parsed_test_results_files_lock = threading.Lock()
+
     #####################
     # Create a package
     #####################
@@ -829,38 +945,35 @@ class BuildHelper(object):
     #########################
     # Installing dependencies
     #########################
+    @traced()
     def install_requirements(self, upgrade=False):
         """ Install requirements
 
         Args:
             upgrade (:obj:`bool`, optional): if :obj:`True`, upgrade requirements
         """
-        import pkg_utils
-        # pkg_utils is imported locally so that we can use karr_lab_build_utils to properly calculate its coverage;
-        # :todo: figure out how to fix this
-
         # upgrade pip, setuptools
         py_v = '{}.{}'.format(sys.version_info[0], sys.version_info[1])
 
         cmd = ['pip' + py_v, 'install', 'setuptools']
         if upgrade:
             cmd.append('-U')
-        subprocess.check_call(cmd)
+        self._check_call(cmd)
 
         cmd = ['pip' + py_v, 'install', 'pip']
         if upgrade:
             cmd.append('-U')
-        subprocess.check_call(cmd)
+        self._check_call(cmd)
 
         # requirements for package
-        install_requirements, extra_requirements, _, _ = pkg_utils.get_dependencies(
+        install_requirements, extra_requirements, _, _ = self.get_dependencies(
             '.', include_uri=True, include_extras=True, include_specs=True, include_markers=True)
         self._install_requirements_helper(install_requirements + extra_requirements['all'], upgrade=upgrade)
 
         # upgrade CircleCI
         if upgrade and whichcraft.which('docker') and whichcraft.which('circleci'):
-            subprocess.check_call(['circleci', 'update', 'install'])
-            subprocess.check_call(['circleci', 'update', 'build-agent'])
+            self._check_call(['circleci', 'update', 'install'])
+            self._check_call(['circleci', 'update', 'build-agent'])
 
     def _install_requirements_helper(self, reqs, upgrade=False):
         """ Install the packages in a requirements.txt file, including all optional dependencies
@@ -882,11 +995,24 @@ class BuildHelper(object):
         cmd = ['pip' + py_v, 'install', '-r', filename]
         if upgrade:
             cmd.append('-U')
-        subprocess.check_call(cmd)
+        self._check_call(cmd)
 
         # cleanup temporary file
         os.remove(filename)
 
+    def _check_call(self, cmd, **kwargs):
+        """ Run a command and record its duration as a span of :obj:`tracer`
+
+        Args:
+            cmd (:obj:`list` of :obj:`str`): command
+            **kwargs: options for :obj:`subprocess.check_call`
+
+        Raises:
+            :obj:`subprocess.CalledProcessError`: if the command fails
+        """
+        with self.tracer.span(os.path.basename(cmd[0]), category='subprocess', attrs={'cmd': ' '.join(cmd)}):
+            subprocess.check_call(cmd, **kwargs)
+
     def upgrade_karr_lab_packages(self):
         """ Upgrade the packages from the Karr Lab's GitHub organization
 
@@ -916,14 +1042,15 @@ class BuildHelper(object):
 
         # upgrade Karr Lab requirements
         if reqs:
-            subprocess.check_call(['pip{}.{}'.format(sys.version_info[0], sys.version_info[1]),
-                                   'install', '-U'] + reqs)
+            self._check_call(['pip{}.{}'.format(sys.version_info[0], sys.version_info[1]),
+                              'install', '-U'] + reqs)
 
         return reqs
 
     ########################
     # Running tests
     ########################
+    @traced()
     def run_tests(self, dirname='.', test_path=None,
                   n_workers=1, i_worker=0,
                   verbose=False, with_xunit=False,
@@ -977,6 +1104,7 @@ class BuildHelper(object):
         else:
             raise BuildHelperError('Unsupported environment: {}'.format(environment))
 
+    @traced()
     def _run_tests_local(self, dirname='.', test_path=None,
                          n_workers=1, i_worker=0,
                          verbose=False, with_xunit=False,
@@ -1029,6 +1157,9 @@ class BuildHelper(object):
                 cov = coverage.Coverage(data_file=os.path.join(coverage_dirname, '.coverage'),
                                         data_suffix=data_suffix, config_file=True, branch=True)
                 cov.start()
+            elif coverage_type == CoverageType.fast:
+                cov = self._start_fast_coverage(data_file=os.path.join(coverage_dirname, '.coverage'),
+                                                data_suffix=data_suffix, config_file=True)
             # elif coverage_type == CoverageType.multiple_condition:
             #     # :todo: support instrumental once its dependency astkit is updated for Python 3
             #     parser = configparser.ConfigParser()
@@ -1115,6 +1246,43 @@ class BuildHelper(object):
         if exit_on_failure and result != 0:
             sys.exit(1)
 
+    @staticmethod
+    def _start_fast_coverage(**kwargs):
+        """ Start measuring statement coverage with the low-overhead ``sys.monitoring`` API (Python 3.12+)
+
+        The ``sysmon`` core of coverage (7.4+) registers line events only for the code objects of the modules which
+        are measured (e.g., the packages listed in the ``source`` option of the ``[coverage:run]`` section of
+        ``setup.cfg``) and disables each line event after its first hit, so lines which have already been covered
+        have no tracing overhead. The results are saved as standard coverage data files. In older versions of Python,
+        statement coverage is measured with the default tracer.
+
+        Args:
+            **kwargs: arguments to :obj:`coverage.Coverage`
+
+        Returns:
+            :obj:`coverage.Coverage`: started coverage measurement
+        """
+        if not hasattr(sys, 'monitoring'):
+            warnings.warn(('sys.monitoring is not available in Python {}.{}; '
+                           'statement coverage will be measured with the default tracer').format(*sys.version_info[0:2]),
+                          UserWarning)
+            cov = coverage.Coverage(**kwargs)
+            cov.start()
+            return cov
+
+        # depending on the version of coverage, the core is selected when the measurement is constructed or started
+        prev_core = os.environ.get('COVERAGE_CORE', None)
+        os.environ['COVERAGE_CORE'] = 'sysmon'
+        try:
+            cov = coverage.Coverage(**kwargs)
+            cov.start()
+        finally:
+            if prev_core is None:
+                os.environ.pop('COVERAGE_CORE')
+            else:
+                os.environ['COVERAGE_CORE'] = prev_core
+        return cov
+
     def _get_test_cases(self, test_path=None, n_workers=1, i_worker=0,
                         with_xunit=False, exit_on_failure=True):
         """ Get test cases for worker *i* of *n* workers
@@ -1171,6 +1339,7 @@ class BuildHelper(object):
 
         return cases
 
+    @traced()
     def _run_tests_docker(self, dirname='.', test_path=None,
                           n_workers=1, i_worker=0,
                           verbose=False, with_xunit=False,
@@ -1209,6 +1378,7 @@ class BuildHelper(object):
         if remove_container:
             self.remove_docker_container(container)
 
+    @traced()
     def create_docker_container(self, ssh_key_filename='~/.ssh/id_rsa'):
         """ Create a docker container 
 
@@ -1274,6 +1444,7 @@ class BuildHelper(object):
 
         return container
 
+    @traced()
     def install_package_to_docker_container(self, container, dirname='.'):
         """ Copy and install package to Docker container
 
@@ -1328,6 +1499,7 @@ class BuildHelper(object):
                                       'karr_lab_build_utils{0} upgrade-karr-lab-packages'.format(py_v)),
                                   ])
 
+    @traced()
     def run_tests_in_docker_container(self, container, test_path=None,
                                       n_workers=1, i_worker=0,
                                       verbose=False, with_xunit=False, with_coverage=False,
@@ -1415,6 +1587,7 @@ class BuildHelper(object):
                                       os.path.join(self.proj_tests_xml_dir, match.group(1)),
                                       ])
 
+    @traced()
     def remove_docker_container(self, container):
         """ Stop and remove a docker container
 
@@ -1443,15 +1616,18 @@ class BuildHelper(object):
         Raises:
             :obj:`BuildHelperError`: if the docker command fails
         """
-        process = subprocess.Popen(['docker'] + cmd, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        while process.poll() is None:
-            time.sleep(0.5)
-        out, err = process.communicate()
+        with self.tracer.span('docker ' + cmd[0], category='docker', attrs={'cmd': ' '.join(cmd)}) as span:
+            process = subprocess.Popen(['docker'] + cmd, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            while process.poll() is None:
+                time.sleep(0.5)
+            out, err = process.communicate()
+            span.set('returncode', process.returncode)
         if process.returncode != 0 and raise_error:
             raise BuildHelperError(err.decode())
 
         return out.decode()
 
+    @traced()
     def _run_tests_circleci(self, dirname='.', test_path=None,
                             n_workers=1, i_worker=0,
                             verbose=False, ssh_key_filename='~/.ssh/id_rsa'):
@@ -1527,18 +1703,20 @@ class BuildHelper(object):
                                  cwd=circleci_context_dirname)
 
         # test package
-        process = subprocess.Popen(['circleci', 'local', 'execute',
-                                    '--env', 'test_path={}'.format(test_path),
-                                    '--env', 'CIRCLE_NODE_TOTAL={}'.format(n_workers),
-                                    '--env', 'CIRCLE_NODE_INDEX={}'.format(i_worker),
-                                    '--env', 'verbose={:d}'.format(verbose),
-                                    '--env', 'dry_run=1',
-                                    '--env', 'CONFIG__DOT__karr_lab_build_utils__DOT__configs_repo_password={}'.format(
-                                        self.configs_repo_password),
-                                    ], cwd=dirname, stderr=subprocess.PIPE)
-        while process.poll() is None:
-            time.sleep(0.5)
-        err = process.communicate()[1].decode()
+        with self.tracer.span('circleci local execute', category='subprocess') as span:
+            process = subprocess.Popen(['circleci', 'local', 'execute',
+                                        '--env', 'test_path={}'.format(test_path),
+                                        '--env', 'CIRCLE_NODE_TOTAL={}'.format(n_workers),
+                                        '--env', 'CIRCLE_NODE_INDEX={}'.format(i_worker),
+                                        '--env', 'verbose={:d}'.format(verbose),
+                                        '--env', 'dry_run=1',
+                                        '--env', 'CONFIG__DOT__karr_lab_build_utils__DOT__configs_repo_password={}'.format(
+                                            self.configs_repo_password),
+                                        ], cwd=dirname, stderr=subprocess.PIPE)
+            while process.poll() is None:
+                time.sleep(0.5)
+            err = process.communicate()[1].decode()
+            span.set('returncode', process.returncode)
 
         # revert CircleCI configuration file
         os.remove(circleci_config_filename)
@@ -1554,9 +1732,15 @@ class BuildHelper(object):
         if process.returncode != 0 or 'Task failed' in err:
             raise BuildHelperError(err)
 
+    @traced()
     def get_test_results(self):
         """ Load test results from a set of XML files
 
+        Parsed files are cached in memory and in :obj:`TEST_RESULTS_CACHE_FILENAME` (keyed by the path, modification
+        time, and size of each file) so that repeated calls, including calls from other commands, don't reparse the
+        files. Files which aren't in the cache are parsed in parallel. Concurrent calls are serialized so that they
+        don't modify the cache at the same time.
+
         Results:
             :obj:`TestResults`: test results
         """
@@ -1564,57 +1748,242 @@ class BuildHelper(object):
 
         filename_pattern = os.path.join(self.proj_tests_xml_dir,
                                         '{0}.*-*.*.xml'.format(self.proj_tests_xml_latest_filename))
-        for filename in glob.glob(filename_pattern):
+        filenames = sorted(glob.glob(filename_pattern))
+        if not filenames:
+            return test_results
+
+        with self._parsed_test_results_files_lock:
+            cases = self._get_test_results_cases(filenames)
+
+        for file_cases in cases:
+            test_results.add_cases(file_cases)
+
+        return test_results
+
+    def _get_test_results_cases(self, filenames):
+        """ Get the test case results of a set of XML files from the cache, parsing the files which aren't in the
+        cache and saving them to the cache
+
+        Args:
+            filenames (:obj:`list` of :obj:`str`): paths to the XML files
+
+        Returns:
+            :obj:`list` of :obj:`list` of :obj:`TestCaseResult`: test case results of each file
+        """
+        cache_filename = os.path.join(self.proj_tests_xml_dir, self.TEST_RESULTS_CACHE_FILENAME)
+        if not self._parsed_test_results_files:
+            self._parsed_test_results_files = self._read_test_results_cache(cache_filename)
+        cache = self._parsed_test_results_files
+
+        # determine which files need to be parsed
+        keys = {}
+        misses = []
+        for filename in filenames:
             match = re.match(r'^{}\.(.*?)\-(.*?)\.(.*?)\.xml$'.format(self.proj_tests_xml_latest_filename), os.path.basename(filename))
             python_version = match.group(3)
 
-            doc = minidom.parse(filename)
-            suite = doc.getElementsByTagName('testsuite')[0]
-            for case in suite.getElementsByTagName('testcase'):
-                case_result = TestCaseResult()
-                case_result.classname = case.getAttribute('classname')
-                case_result.name = case.getAttribute('name')
-                case_result.python_version = python_version
-                case_result.time = float(case.getAttribute('time'))
-
-                if case.hasAttribute('file'):
-                    case_result.file = case.getAttribute('file')
-
-                if case.hasAttribute('line'):
-                    case_result.line = int(float(case.getAttribute('line')))
-
-                stdout = case.getElementsByTagName('system-out')
-                if stdout:
-                    case_result.stdout = ''.join([child.nodeValue for child in stdout[0].childNodes])
-
-                stderr = case.getElementsByTagName('system-err')
-                if stderr:
-                    case_result.stderr = ''.join([child.nodeValue for child in stderr[0].childNodes])
-
-                skip = case.getElementsByTagName('skipped')
-                error = case.getElementsByTagName('error')
-                failure = case.getElementsByTagName('failure')
-
-                if skip:
-                    case_result.type = TestCaseResultType.skipped
-                elif error:
-                    case_result.type = TestCaseResultType.error
-                elif failure:
-                    case_result.type = TestCaseResultType.failure
+            file_stat = os.stat(filename)
+            keys[filename] = (file_stat.st_mtime_ns, file_stat.st_size)
+            entry = cache.get(filename, None)
+            if entry is None or entry[0] != keys[filename]:
+                misses.append((filename, python_version))
+
+        # parse the files which are not in the cache
+        if misses:
+            if len(misses) == 1:
+                parsed = [self._parse_test_results_file(*misses[0])]
+            else:
+                n_workers = min(len(misses), os.cpu_count() or 1)
+                with concurrent.futures.ProcessPoolExecutor(
+                        max_workers=n_workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+                    parsed = list(executor.map(self._parse_test_results_file, *zip(*misses)))
+
+            for (filename, _), cases in zip(misses, parsed):
+                cache[filename] = (keys[filename], cases)
+
+            for filename in list(cache.keys()):
+                if filename not in keys:
+                    cache.pop(filename)
+
+            self._write_test_results_cache(cache_filename, cache)
+
+        return [cache[filename][1] for filename in filenames]
+
+    def _read_test_results_cache(self, filename):
+        """ Read a cache of parsed test results
+
+        Args:
+            filename (:obj:`str`): path to the cache
+
+        Returns:
+            :obj:`dict`: dictionary which maps the path of each XML file to a tuple of the modification time and size
+                of the file and its test case results
+        """
+        if not os.path.isfile(filename):
+            return {}
+
+        try:
+            with open(filename, 'rb') as file:
+                version, files = pickle.load(file)
+        except Exception:
+            return {}
+
+        if version != self.TEST_RESULTS_CACHE_VERSION:
+            return {}
+
+        cache = {}
+        for xml_filename, (key, python_version, encoding, records) in files.items():
+            cases = [TestCaseResult._from_record(record, python_version, xml_filename, encoding) for record in records]
+            cache[xml_filename] = (key, cases)
+        return cache
+
+    def _write_test_results_cache(self, filename, cache):
+        """ Write a cache of parsed test results
+
+        Args:
+            filename (:obj:`str`): path to the cache
+            cache (:obj:`dict`): dictionary which maps the path of each XML file to a tuple of the modification time
+                and size of the file and its test case results
+        """
+        files = {}
+        for xml_filename, (key, cases) in cache.items():
+            python_version = cases[0].python_version if cases else None
+            encoding = 'utf-8'
+            for case in cases:
+                for text in (case._stdout, case._stderr, case._details):
+                    if isinstance(text, XmlText):
+                        encoding = text.encoding
+                        break
+            files[xml_filename] = (key, python_version, encoding, [case._to_record() for case in cases])
+
+        # write to a unique temporary file so that concurrent writers (e.g., parallel CircleCI containers which share
+        # the reports directory) don't clobber each other's partially written files
+        fid, tmp_filename = tempfile.mkstemp(dir=os.path.dirname(filename) or '.',
+                                             prefix=os.path.basename(filename) + '.', suffix='.tmp')
+        try:
+            with os.fdopen(fid, 'wb') as file:
+                pickle.dump((self.TEST_RESULTS_CACHE_VERSION, files), file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_filename, filename)
+        except Exception:
+            os.remove(tmp_filename)
+            raise
+
+    @staticmethod
+    def _parse_test_results_file(filename, python_version):
+        """ Parse the test case results from an XML file
+
+        The file is parsed in a single streaming pass. Rather than materializing the captured standard output,
+        standard error, and details of each test case, the byte offsets of these texts within the file are recorded
+        so that the texts can be decoded on demand.
+
+        Args:
+            filename (:obj:`str`): path to an XML file of test results
+            python_version (:obj:`str`): Python version which ran the tests
+
+        Returns:
+            :obj:`list` of :obj:`TestCaseResult`: test case results
+        """
+        result_types = {
+            'skipped': TestCaseResultType.skipped,
+            'error': TestCaseResultType.error,
+            'failure': TestCaseResultType.failure,
+        }
+        text_attrs = {
+            'system-out': 'stdout',
+            'system-err': 'stderr',
+        }
+
+        cases = []
+        state = {
+            'encoding': 'utf-8',
+            'case': None,
+            'text_attr': None,
+            'text_element': None,
+            'text_depth': 0,
+            'text_start': None,
+        }
+        parser = xml.parsers.expat.ParserCreate()
+
+        def handle_xml_decl(version, encoding, standalone):
+            if encoding:
+                state['encoding'] = encoding
+
+        def handle_start_element(name, attrs):
+            case = state['case']
+
+            if state['text_element'] is not None:
+                state['text_depth'] += 1
+                return
+
+            if name == 'testcase':
+                case = state['case'] = TestCaseResult()
+                case.classname = attrs.get('classname', '')
+                case.name = attrs.get('name', '')
+                case.python_version = python_version
+                case.time = float(attrs.get('time', 0.))
+                case.type = TestCaseResultType.passed
+
+                if 'file' in attrs:
+                    case.filename = attrs['file']
+
+                if 'line' in attrs:
+                    case.line = int(float(attrs['line']))
+
+            elif case is None:
+                return
+
+            elif name in text_attrs:
+                if getattr(case, text_attrs[name]) is None:
+                    state['text_attr'] = text_attrs[name]
+                    state['text_element'] = name
+
+            elif name in result_types:
+                # skips take precedence over errors, which take precedence over failures
+                if case.type == TestCaseResultType.passed or result_types[name].value < case.type.value:
+                    case.type = result_types[name]
+                    case.subtype = attrs.get('type', '')
+                    case.message = attrs.get('message', '')
+                    case.details = None
+                    state['text_attr'] = 'details'
+                    state['text_element'] = name
+
+        def handle_text(*args):
+            if state['text_element'] is not None and state['text_start'] is None:
+                state['text_start'] = parser.CurrentByteIndex
+
+        def handle_end_element(name):
+            if state['text_element'] is not None:
+                if state['text_depth']:
+                    state['text_depth'] -= 1
+                    return
+
+                if state['text_start'] is None:
+                    text = ''
                 else:
-                    case_result.type = TestCaseResultType.passed
+                    text = XmlText(filename, state['text_start'], parser.CurrentByteIndex, state['encoding'])
+                setattr(state['case'], state['text_attr'], text)
 
-                not_pass = skip or error or failure
-                if not_pass:
-                    case_result.subtype = not_pass[0].getAttribute('type')
-                    case_result.message = not_pass[0].getAttribute('message')
-                    case_result.details = ''.join([child.nodeValue for child in not_pass[0].childNodes])
+                state['text_attr'] = None
+                state['text_element'] = None
+                state['text_start'] = None
 
-                test_results.cases.append(case_result)
+            elif name == 'testcase' and state['case'] is not None:
+                cases.append(state['case'])
+                state['case'] = None
 
-        return test_results
+        parser.XmlDeclHandler = handle_xml_decl
+        parser.StartElementHandler = handle_start_element
+        parser.EndElementHandler = handle_end_element
+        parser.CharacterDataHandler = handle_text
+        parser.StartCdataSectionHandler = handle_text
+
+        with open(filename, 'rb') as file:
+            parser.ParseFile(file)
+
+        return cases
 
-    def get_test_results_status(self, test_results, installation_error, tests_error, other_error, dry_run=False):
+    def get_test_results_status(self, test_results, installation_error, tests_error, other_error, dry_run=False,
+                                test_results_diff=None):
         """ Get the status of a set of results
 
         * Old err
@@ -1622,6 +1991,11 @@ class BuildHelper(object):
         * Fixed error
         * New downstream error
 
+        If the results of the previous build are in the local test history database, whether errors are new is
+        determined from the transitions of the individual test cases. Otherwise, it is determined from the status
+        of the previous build reported by CircleCI. Builds are fixed if test cases of the previous build failed or if
+        CircleCI reports that the previous build failed (e.g., because of an installation error).
+
         Args:
             test_results (:obj:`TestResults`): test results
             installation_error (:obj:`bool`): :obj:`True` if there were other errors during the installation
@@ -1629,6 +2003,8 @@ class BuildHelper(object):
             other_error (:obj:`bool`): :obj:`True` if there were other errors during the build such as in generating and/or
                 archiving the reports
             dry_run (:obj:`bool`, optional): if true, don't upload to the Coveralls and Code Climate servers
+            test_results_diff (:obj:`TestResultsDiff`, optional): differences between the test results and those of
+                the previous build; if :obj:`None`, the differences are obtained from the local test history database
 
         Returns:
             :obj:`dict`: status of a set of results
@@ -1653,6 +2029,9 @@ class BuildHelper(object):
             passed = test_results.get_num_errors() == 0 and test_results.get_num_failures() == 0
 
             # determine if error is new
+            if self.build_num > 1 and test_results_diff is None:
+                test_results_diff = self.get_test_results_diff(test_results)
+
             if self.build_num <= 1:
                 if passed:
                     is_old_error = False
@@ -1662,8 +2041,18 @@ class BuildHelper(object):
                     is_old_error = False
                     is_new_error = True
                     is_fixed = False
+            elif test_results_diff is not None:
+                if passed:
+                    is_old_error = False
+                    is_new_error = False
+                    is_fixed = test_results_diff.num_prev_failing > 0 or \
+                        self.get_circleci_build(self.build_num - 1)['status'] not in ['success', 'fixed']
+                else:
+                    is_new_error = test_results_diff.get_num_new_failing() > 0
+                    is_old_error = not is_new_error
+                    is_fixed = False
             else:
-                prev_result = self.run_circleci_api('/' + str(self.build_num - 1))
+                prev_result = self.get_circleci_build(self.build_num - 1)
                 if passed:
                     is_old_error = False
                     is_new_error = False
@@ -1690,6 +2079,36 @@ class BuildHelper(object):
             'is_new_downstream_error': is_new_downstream_error,
         }
 
+    def get_test_results_diff(self, test_results):
+        """ Get the differences between test results and the results of the previous build in the local test
+        history database
+
+        The test history database isn't shared among CircleCI containers, so it may not contain the previous build.
+        To avoid comparing the results with those of an older build, the results are only compared if the database
+        contains the results of the immediately preceding build.
+
+        Args:
+            test_results (:obj:`TestResults`): test results
+
+        Returns:
+            :obj:`TestResultsDiff`: differences between the test results and the results of the previous build, or
+                :obj:`None` if the test history database doesn't contain the results of the previous build
+        """
+        if self.repo_name is None or not os.path.isfile(self.test_history_filename):
+            return None
+
+        history = self.get_test_history()
+        try:
+            prev_build_num = history.get_previous_build_num(self.repo_name, self.build_num)
+            if prev_build_num is None or prev_build_num != self.build_num - 1:
+                return None
+            prev_test_results = history.get_test_results(self.repo_name, prev_build_num)
+        finally:
+            history.close()
+
+        return test_results.diff(prev_test_results)
+
+    @traced()
     def do_post_test_tasks(self, installation_error, tests_error, dry_run=False):
         """ Do all post-test tasks for CircleCI
 
@@ -1711,23 +2130,41 @@ class BuildHelper(object):
             :obj:`dict`: status of a set of results
             :obj:`dict`: exception from `make_and_archive_reports`
         """
-        try:
-            static_analyses = self.make_and_archive_reports(dry_run=dry_run)
-            other_error = False
-            other_exception = None
-        except Exception as exception:
-            static_analyses = {'missing_requirements': [], 'unused_requirements': []}
+        # load the test results once, before the tasks which use them run concurrently
+        test_results = self.get_test_results()
+
+        # make the reports and trigger the downstream builds concurrently
+        scheduler = TaskScheduler()
+        scheduler.add_task('make_and_archive_reports', self.make_and_archive_reports,
+                           kwargs={'dry_run': dry_run, 'test_results': test_results})
+        scheduler.add_task('trigger_tests_of_downstream_dependencies', self.trigger_tests_of_downstream_dependencies,
+                           kwargs={'dry_run': dry_run, 'test_results': test_results})
+        results = scheduler.run(raise_errors=False)
+
+        if 'make_and_archive_reports' in scheduler.errors:
+            exception = scheduler.errors['make_and_archive_reports']
+            static_analyses = {'missing_requirements': [], 'unused_requirements': [], 'diff_coverage': None}
             other_error = True
             other_exception = {
                 'exception': exception,
-                'traceback': sys.exc_info()[2],
+                'traceback': exception.__traceback__,
             }
+        else:
+            static_analyses = results['make_and_archive_reports']
+            other_error = False
+            other_exception = None
 
-        triggered_packages, not_triggered_packages = self.trigger_tests_of_downstream_dependencies(dry_run=dry_run)
-        status = self.send_email_notifications(installation_error, tests_error, other_error, static_analyses, dry_run=dry_run)
+        if 'trigger_tests_of_downstream_dependencies' in scheduler.errors:
+            raise scheduler.errors['trigger_tests_of_downstream_dependencies']
+        triggered_packages, not_triggered_packages = results['trigger_tests_of_downstream_dependencies']
+
+        status = self.send_email_notifications(installation_error, tests_error, other_error, static_analyses,
+                                               dry_run=dry_run, test_results=test_results)
         return (triggered_packages, not_triggered_packages, status, other_exception)
 
-    def send_email_notifications(self, installation_error, tests_error, other_error, static_analyses, dry_run=False):
+    @traced()
+    def send_email_notifications(self, installation_error, tests_error, other_error, static_analyses, dry_run=False,
+                                 test_results=None):
         """ Send email notifications of failures, fixes, and downstream failures
 
         Args:
@@ -1735,21 +2172,30 @@ class BuildHelper(object):
             tests_error (:obj:`bool`): obj:`False` if the tests passes
             other_error (:obj:`bool`): :obj:`True` if there were other errors during the build such as in generating and/or
                 archiving the reports
-            static_analyses (:obj:`dict`): analyses of missing and unused requirements
+            static_analyses (:obj:`dict`): analyses of missing and unused requirements and of the coverage of the
+                changed lines
             dry_run (:obj:`bool`, optional): if true, don't upload to the Coveralls and Code Climate servers
+            test_results (:obj:`TestResults`, optional): test results; if :obj:`None`, the results are loaded
+                from the XML reports of the current build
 
         Returns:
             :obj:`dict`: status of a set of results
         """
-        test_results = self.get_test_results()
-        status = self.get_test_results_status(test_results, installation_error, tests_error, other_error, dry_run=dry_run)
+        if test_results is None:
+            test_results = self.get_test_results()
+        if dry_run:
+            test_results_diff = None
+        else:
+            test_results_diff = self.get_test_results_diff(test_results)
+        status = self.get_test_results_status(test_results, installation_error, tests_error, other_error, dry_run=dry_run,
+                                              test_results_diff=test_results_diff)
 
         # stop if this is a dry run
         if dry_run:
             return status
 
         # build context for email
-        result = self.run_circleci_api('/' + str(self.build_num))
+        result = self.get_circleci_build(self.build_num)
 
         if result['all_commit_details']:
             context = {
@@ -1762,7 +2208,9 @@ class BuildHelper(object):
                 'build_num': self.build_num,
                 'build_url': result['build_url'],
                 'test_results': test_results,
+                'test_results_diff': test_results_diff,
                 'static_analyses': static_analyses,
+                'diff_coverage': static_analyses.get('diff_coverage', None),
             }
         else:
             context = {
@@ -1775,13 +2223,15 @@ class BuildHelper(object):
                 'build_num': self.build_num,
                 'build_url': result['build_url'],
                 'test_results': test_results,
+                'test_results_diff': test_results_diff,
                 'static_analyses': static_analyses,
+                'diff_coverage': static_analyses.get('diff_coverage', None),
             }
 
         if status['is_new_downstream_error']:
             upstream_repo_name = os.getenv('UPSTREAM_REPONAME', '')
             upstream_build_num = int(os.getenv('UPSTREAM_BUILD_NUM', '0'))
-            result = self.run_circleci_api('/' + str(upstream_build_num), repo_name=upstream_repo_name)
+            result = self.get_circleci_build(upstream_build_num, repo_name=upstream_repo_name)
             if result['all_commit_details']:
                 context['upstream'] = {
                     'repo_name': upstream_repo_name,
@@ -1879,41 +2329,101 @@ class BuildHelper(object):
             smtp.quit()
         """    
 
-    def make_and_archive_reports(self, coverage_dirname='tests/reports', dry_run=False):
+    @traced()
+    def make_and_archive_reports(self, coverage_dirname='tests/reports', dry_run=False, test_results=None):
         """ Make and archive reports:
 
-        * Upload test report to history server
+        * Archive test results to the local test history database
+        * Make an HTML coverage report
         * Upload coverage report to Coveralls and Code Climate
+        * Check the coverage of the lines which have changed relative to the ``base`` of the ``diff_coverage``
+          section of the build configuration against its ``min_coverage``
+        * Analyze the package with Pylint and find missing and unused requirements
+        * Log the environment
+
+        The independent steps are run concurrently by a :obj:`TaskScheduler`. If a step fails, the other steps
+        still run, and then the error of the first failed step is raised. The combined coverage data is loaded once
+        into a :obj:`CoverageModel` which is shared by the HTML report and the reporters.
 
         Args:
             coverage_dirname (:obj:`str`, optional): directory to merge coverage files
             dry_run (:obj:`bool`, optional): if true, don't upload to the Coveralls and Code Climate servers
+            test_results (:obj:`TestResults`, optional): test results; if :obj:`None`, the results are loaded
+                from the XML reports of the current build
 
         Returns:
-            :obj:`dict`: analyses of missing and unused requirements
+            :obj:`dict`: analyses of missing and unused requirements and of the coverage of the changed lines
         """
         config = self.get_build_config()
         errors = []
+        scheduler = TaskScheduler()
 
         """ test reports """
         # Upload test report to history server
         #self.archive_test_report()
 
+        # Archive test results to the local test history database
+        scheduler.add_task('archive_test_results_to_history', self.archive_test_results_to_history,
+                           kwargs={'test_results': test_results})
+
         """ coverage """
         # Merge coverage reports
         # Generate HTML report
         # Upload coverage report to Coveralls and Code Climate
-        self.combine_coverage_reports(coverage_dirname=coverage_dirname)
-        self.archive_coverage_report(coverage_dirname=coverage_dirname, dry_run=dry_run)
+        # Check coverage of changed lines
+        scheduler.add_task('combine_coverage_reports', self.combine_coverage_reports,
+                           kwargs={'coverage_dirname': coverage_dirname})
+        scheduler.add_task('get_coverage_model', self._get_build_coverage_model,
+                           kwargs={'coverage_dirname': coverage_dirname},
+                           dependencies=['combine_coverage_reports'])
+        scheduler.add_task('make_coverage_report', self.make_coverage_report,
+                           kwargs={'coverage_dirname': coverage_dirname},
+                           dependencies=['get_coverage_model'],
+                           dependency_kwargs={'coverage_model': 'get_coverage_model'})
+        scheduler.add_task('archive_coverage_report', self.archive_coverage_report,
+                           kwargs={'coverage_dirname': coverage_dirname, 'dry_run': dry_run},
+                           dependencies=['get_coverage_model'],
+                           dependency_kwargs={'coverage_model': 'get_coverage_model'})
+        diff_coverage_config = config.get('diff_coverage', None) or {}
+        scheduler.add_task('get_diff_coverage', self._get_build_diff_coverage,
+                           kwargs={'base': diff_coverage_config.get('base', None), 'coverage_dirname': coverage_dirname},
+                           dependencies=['combine_coverage_reports'])
 
         """ static analysis """
-        self.analyze_package(self.repo_name)
+        scheduler.add_task('analyze_package', self.analyze_package, args=(self.repo_name,))
 
+        # the requirements analyses are CPU-bound and patch pip_check_reqs, so they are run in separate processes
         find_missing_requirements = config.get('static_analyses', {}).get('find_missing_requirements', True)
         find_unused_requirements = config.get('static_analyses', {}).get('find_unused_requirements', True)
 
         if find_missing_requirements:
-            missing_reqs = self.find_missing_requirements(self.repo_name)
+            scheduler.add_task('find_missing_requirements', self.find_missing_requirements, args=(self.repo_name,),
+                               executor=TaskExecutor.process)
+
+        if find_unused_requirements:
+            scheduler.add_task('find_unused_requirements', self.find_unused_requirements, args=(self.repo_name,),
+                               executor=TaskExecutor.process)
+
+        """ documentation """
+        #self.make_documentation()
+        #self.upload_documentation_to_docs_server()
+
+        """ Log environment """
+        scheduler.add_task('log_environment', self.log_environment)
+
+        """ Run tasks """
+        results = scheduler.run()
+
+        diff_coverage = results['get_diff_coverage']
+        min_diff_coverage = diff_coverage_config.get('min_coverage', None)
+        if diff_coverage and min_diff_coverage is not None and diff_coverage.get_percent() < min_diff_coverage:
+            errors.append('Only {:.1f}% of the lines changed since {} are covered (minimum: {}%):\n  {}'.format(
+                diff_coverage.get_percent(), diff_coverage.base, min_diff_coverage,
+                '\n  '.join('{}: {}'.format(filename, ', '.join(str(line) for line in uncovered))
+                             for filename, (_, uncovered) in diff_coverage.files.items() if uncovered)))
+
+        if find_missing_requirements:
+            missing_reqs = results['find_missing_requirements']
             if missing_reqs:
                 errors.append('The following requirements are missing:\n  {}'.format(
                     '\n  '.join(missing_req[0] for missing_req in missing_reqs)))
@@ -1921,20 +2431,13 @@ class BuildHelper(object):
             missing_reqs = []
 
         if find_unused_requirements:
-            unused_reqs = self.find_unused_requirements(self.repo_name)
+            unused_reqs = results['find_unused_requirements']
             if unused_reqs:
                 msg = 'The following requirements appear to be unused:\n  {}'.format('\n  '.join(unused_reqs))
                 warnings.warn(msg, UserWarning)
         else:
             unused_reqs = []
 
-        """ documentation """
-        #self.make_documentation()
-        #self.upload_documentation_to_docs_server()
-
-        """ Log environment """
-        self.log_environment()
-
         """ Throw error """
         if errors:
             raise BuildHelperError('\n\n'.join(errors))
@@ -1942,12 +2445,14 @@ class BuildHelper(object):
         return {
             'missing_requirements': missing_reqs,
             'unused_requirements': unused_reqs,
+            'diff_coverage': diff_coverage,
         }
 
     ########################
     # Test reports
     ########################
 
+    @traced()
     def archive_test_report(self):
         """ Upload test report to history server
 
@@ -1967,132 +2472,579 @@ class BuildHelper(object):
         for abs_xml_latest_filename in glob.glob(abs_xml_latest_filename_pattern):
             match = re.match(r'^.*?\.(\d+)\-(\d+)\.(\d+\.\d+\.\d+)\.xml$', abs_xml_latest_filename)
             pyv = match.group(3)
-            r = requests.post('https://tests.karrlab.org/rest/submit_report',
-                              data={
-                                  'token': self.test_server_token,
-                                  'repo_name': self.repo_name,
-                                  'repo_owner': self.repo_owner,
-                                  'repo_branch': self.repo_branch,
-                                  'repo_revision': self.repo_revision,
-                                  'build_num': self.build_num,
-                                  'report_name': pyv,
-                              },
-                              files={
-                                  'report': open(abs_xml_latest_filename, 'rb'),
-                              })
+            with self.tracer.span('POST submit_report', category='http', attrs={'report_name': pyv}) as span:
+                r = requests.post('https://tests.karrlab.org/rest/submit_report',
+                                  data={
+                                      'token': self.test_server_token,
+                                      'repo_name': self.repo_name,
+                                      'repo_owner': self.repo_owner,
+                                      'repo_branch': self.repo_branch,
+                                      'repo_revision': self.repo_revision,
+                                      'build_num': self.build_num,
+                                      'report_name': pyv,
+                                  },
+                                  files={
+                                      'report': open(abs_xml_latest_filename, 'rb'),
+                                  })
+                span.set('status_code', getattr(r, 'status_code', None))
             r.raise_for_status()
             r_json = r.json()
             if 'success' not in r_json or not r_json['success']:
                 raise BuildHelperError('Error uploading report to test history server: {}'.format(r_json['message']))
 
+    def get_test_history(self):
+        """ Get the local test history database
+
+        Returns:
+            :obj:`TestHistory`: test history database
+        """
+        return TestHistory(self.test_history_filename)
+
+    @traced()
+    def archive_test_results_to_history(self, test_results=None):
+        """ Archive the test results of the current build to the local test history database
+
+        Results are only archived for CircleCI builds (i.e. builds with a build number).
+
+        Args:
+            test_results (:obj:`TestResults`, optional): test results; if :obj:`None`, the results are loaded
+                from the XML reports of the current build
+        """
+        if self.repo_name is None or not self.build_num:
+            return
+
+        if test_results is None:
+            test_results = self.get_test_results()
+
+        history = self.get_test_history()
+        try:
+            history.add_results(test_results, self.repo_name, self.build_num,
+                                repo_branch=self.repo_branch, repo_revision=self.repo_revision)
+        finally:
+            history.close()
+
     ########################
     # Coverage reports
     ########################
+    @traced()
     def combine_coverage_reports(self, coverage_dirname='tests/reports'):
-        """
+        """ Combine coverage reports (.coverage.*) into a single file (.coverage)
+
+        The reports are read in place and merged in parallel: groups of reports are merged by worker processes and
+        the merged groups are then merged into the combined file. A manifest of the merged reports (keyed by their
+        modification times and sizes) is saved with the combined file so that repeated invocations only merge new
+        reports. If a previously merged report has been changed or removed, all of the reports are recombined.
+
         Args:
             coverage_dirname (:obj:`str`, optional): directory to merge coverage files
         """
-        data_paths = []
-        for name in glob.glob(os.path.join(coverage_dirname, '.coverage.*')):
-            data_path = tempfile.mktemp()
-            shutil.copyfile(name, data_path)
-            data_paths.append(data_path)
+        filenames = sorted(glob.glob(os.path.join(coverage_dirname, '.coverage.*')))
 
         # stop if there are no files to combine
-        if not data_paths:
+        if not filenames:
             warnings.warn('No coverage files exist to combine', UserWarning)
             return
 
-        coverage_doc = coverage.Coverage(data_file=os.path.join(coverage_dirname, '.coverage'))
-        coverage_doc.combine(data_paths=data_paths)
-        coverage_doc.save()
+        data_filename = os.path.join(coverage_dirname, '.coverage')
+        manifest_filename = os.path.join(coverage_dirname, self.COVERAGE_MANIFEST_FILENAME)
+
+        # determine which files have already been merged
+        shards = {}
+        for filename in filenames:
+            file_stat = os.stat(filename)
+            shards[os.path.basename(filename)] = [file_stat.st_mtime_ns, file_stat.st_size]
+
+        manifest = {}
+        if os.path.isfile(data_filename) and os.path.isfile(manifest_filename):
+            with open(manifest_filename, 'r') as file:
+                manifest = json.load(file)
+        if any(shards.get(name, None) != key for name, key in manifest.items()):
+            manifest = {}
+
+        pending_filenames = [filename for filename in filenames if os.path.basename(filename) not in manifest]
+        if not pending_filenames:
+            return
+
+        # merge the files
+        if not manifest and os.path.isfile(data_filename):
+            os.remove(data_filename)
+
+        paths = dict(coverage.Coverage(data_file=data_filename).config.paths)
+        combined_data = coverage.CoverageData(basename=data_filename)
+        if manifest:
+            combined_data.read()
+
+        n_workers = min(os.cpu_count() or 1, len(pending_filenames) // 2)
+        if n_workers <= 1:
+            aliases = self._get_coverage_path_aliases(paths)
+            for filename in pending_filenames:
+                data = coverage.CoverageData(basename=filename)
+                data.read()
+                self._update_coverage_data(combined_data, data, aliases)
+        else:
+            groups = [pending_filenames[i_worker::n_workers] for i_worker in range(n_workers)]
+            with concurrent.futures.ProcessPoolExecutor(
+                    max_workers=n_workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+                for serialized_data in executor.map(self._merge_coverage_data_files, groups, [paths] * n_workers):
+                    data = coverage.CoverageData(no_disk=True)
+                    data.loads(serialized_data)
+                    combined_data.update(data)
+        combined_data.write()
+
+        # save the manifest of merged files
+        with open(manifest_filename, 'w') as file:
+            json.dump(shards, file)
+
+    @staticmethod
+    def _merge_coverage_data_files(filenames, paths):
+        """ Merge coverage data files
+
+        Args:
+            filenames (:obj:`list` of :obj:`str`): paths to coverage data files
+            paths (:obj:`dict`): equivalent source paths (``[paths]`` section of the coverage configuration)
+
+        Returns:
+            :obj:`bytes`: serialized merged coverage data
+        """
+        aliases = BuildHelper._get_coverage_path_aliases(paths)
+        merged_data = coverage.CoverageData(no_disk=True)
+        for filename in filenames:
+            data = coverage.CoverageData(basename=filename)
+            data.read()
+            BuildHelper._update_coverage_data(merged_data, data, aliases)
+        return merged_data.dumps()
+
+    @staticmethod
+    def _update_coverage_data(data, other_data, aliases):
+        """ Merge coverage data into other coverage data
+
+        Args:
+            data (:obj:`coverage.CoverageData`): coverage data to merge into
+            other_data (:obj:`coverage.CoverageData`): coverage data to merge
+            aliases (:obj:`coverage.files.PathAliases`): aliases of equivalent source paths
+        """
+        if 'map_path' in inspect.signature(data.update).parameters:
+            data.update(other_data, map_path=aliases.map)
+        else:
+            data.update(other_data, aliases=aliases)
+
+    @staticmethod
+    def _get_coverage_path_aliases(paths):
+        """ Get the aliases of equivalent source paths
+
+        Args:
+            paths (:obj:`dict`): equivalent source paths (``[paths]`` section of the coverage configuration)
 
-    def archive_coverage_report(self, coverage_dirname='tests/reports', dry_run=False):
+        Returns:
+            :obj:`coverage.files.PathAliases`: aliases
+        """
+        aliases = coverage.files.PathAliases()
+        for equivalent_paths in paths.values():
+            for pattern in equivalent_paths[1:]:
+                aliases.add(pattern, equivalent_paths[0])
+        return aliases
+
+    @traced()
+    def archive_coverage_report(self, coverage_dirname='tests/reports', dry_run=False, coverage_model=None):
         """ Archive coverage report:
 
         * Upload report to Coveralls
         * Upload report to Code Climate
 
+        The coverage data and the source files are loaded once into a :obj:`CoverageModel` which is shared by
+        both reporters.
+
         Args:
             coverage_dirname (:obj:`str`, optional): directory to save coverage data
             dry_run (:obj:`bool`, optional): if true, don't upload to the Coveralls and Code Climate servers
+            coverage_model (:obj:`CoverageModel`, optional): coverage model; if :obj:`None`, the model is loaded
+                from :obj:`coverage_dirname`
         """
+        if coverage_model is None:
+            coverage_model = self._get_build_coverage_model(coverage_dirname=coverage_dirname)
 
         # upload to Coveralls
         if self.COVERALLS_ENABLED:
-            self.upload_coverage_report_to_coveralls(coverage_dirname=coverage_dirname, dry_run=dry_run)
+            self.upload_coverage_report_to_coveralls(coverage_dirname=coverage_dirname, dry_run=dry_run,
+                                                     coverage_model=coverage_model)
 
         # upload to Code Climate
         if self.CODE_CLIMATE_ENABLED:
-            self.upload_coverage_report_to_code_climate(coverage_dirname=coverage_dirname, dry_run=dry_run)
+            self.upload_coverage_report_to_code_climate(coverage_dirname=coverage_dirname, dry_run=dry_run,
+                                                        coverage_model=coverage_model)
+
+    @traced()
+    def make_coverage_report(self, coverage_dirname='tests/reports', html_dirname=None, coverage_model=None):
+        """ Make an HTML coverage report from the combined coverage data
+
+        The report contains an index of the coverage of each file and a page for each file. Pages are rendered in
+        parallel, and only the pages of the files whose source or coverage has changed since the last report are
+        rendered.
+
+        Args:
+            coverage_dirname (:obj:`str`, optional): directory with the combined coverage data
+            html_dirname (:obj:`str`, optional): directory to save the report; defaults to the ``html`` subdirectory
+                of :obj:`coverage_dirname`
+            coverage_model (:obj:`CoverageModel`, optional): coverage model; if :obj:`None`, the model is loaded
+                from :obj:`coverage_dirname`
+
+        Returns:
+            :obj:`list` of :obj:`str`: names of the files whose pages were rendered
+        """
+        # don't make a report if there is no coverage file
+        if coverage_model is None and not os.path.isfile(os.path.join(coverage_dirname, '.coverage')):
+            warnings.warn('No coverage file exists to make a report', UserWarning)
+            return []
+
+        if html_dirname is None:
+            html_dirname = os.path.join(coverage_dirname, 'html')
+        if not os.path.isdir(html_dirname):
+            os.makedirs(html_dirname)
+
+        if coverage_model is None:
+            coverage_model = self.get_coverage_model(coverage_dirname=coverage_dirname)
+
+        templates = {}
+        for template_filename in ['index.html', 'file.html']:
+            with open(pkg_resources.resource_filename(
+                    'karr_lab_build_utils', os.path.join('templates', 'coverage_report', template_filename)), 'r') as file:
+                templates[template_filename] = file.read()
+
+        # determine which pages have to be rendered
+        manifest_filename = os.path.join(html_dirname, self.COVERAGE_REPORT_MANIFEST_FILENAME)
+        if os.path.isfile(manifest_filename):
+            with open(manifest_filename, 'r') as file:
+                manifest = json.load(file)
+        else:
+            manifest = {}
+
+        template_hash = hashlib.sha1(templates['file.html'].encode()).hexdigest()
+        new_manifest = {}
+        pending = []
+        for file in coverage_model.files:
+            page_filename = re.sub(r'[^a-zA-Z0-9]', '_', file.filename) + '.html'
+            page_hash = hashlib.sha1(json.dumps([
+                template_hash,
+                hashlib.sha1(file.source.encode('utf-8')).hexdigest(),
+                file.get_bitmap().hex(),
+                sorted(file.missing_branches.items()),
+            ]).encode()).hexdigest()
+            new_manifest[file.filename] = [page_filename, page_hash]
+
+            if manifest.get(file.filename, None) != [page_filename, page_hash] \
+                    or not os.path.isfile(os.path.join(html_dirname, page_filename)):
+                pending.append((os.path.join(html_dirname, page_filename), file))
+
+        # render the pages of the files which have changed
+        if len(pending) <= 1:
+            for page_filename, file in pending:
+                self._render_coverage_report_page(templates['file.html'], page_filename, file)
+        else:
+            n_workers = min(len(pending), os.cpu_count() or 1)
+            with concurrent.futures.ProcessPoolExecutor(
+                    max_workers=n_workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+                list(executor.map(self._render_coverage_report_page,
+                                  [templates['file.html']] * len(pending), *zip(*pending)))
+
+        # remove the pages of files which are no longer measured
+        for filename, (page_filename, _) in manifest.items():
+            if filename not in new_manifest and os.path.isfile(os.path.join(html_dirname, page_filename)):
+                os.remove(os.path.join(html_dirname, page_filename))
+
+        # render the index
+        with open(os.path.join(html_dirname, 'index.html'), 'w') as file:
+            file.write(Template(templates['index.html']).render(
+                repo_name=self.repo_name,
+                summary=coverage_model.get_summary(),
+                files=[(file.filename, new_manifest[file.filename][0], CoverageModel(files=[file]).get_summary())
+                       for file in coverage_model.files],
+            ))
+
+        with open(manifest_filename, 'w') as file:
+            json.dump(new_manifest, file)
+
+        return [file.filename for _, file in pending]
+
+    @staticmethod
+    def _render_coverage_report_page(template, page_filename, file):
+        """ Render the page of an HTML coverage report for a file
+
+        Args:
+            template (:obj:`str`): template for the page
+            page_filename (:obj:`str`): path to save the page
+            file (:obj:`FileCoverage`): coverage of the file
+        """
+        lines = []
+        for i_line, text in enumerate(file.source.splitlines()):
+            line_num = i_line + 1
+            if line_num in file.missing:
+                status = 'missing'
+            elif line_num in file.missing_branches:
+                status = 'partial'
+            elif line_num in file.branches or line_num in file.statements:
+                status = 'covered'
+            else:
+                status = ''
+            lines.append((line_num, text, status, file.missing_branches.get(line_num, [])))
+
+        with open(page_filename, 'w') as page:
+            page.write(Template(template).render(
+                filename=file.filename,
+                summary=CoverageModel(files=[file]).get_summary(),
+                lines=lines,
+            ))
+
+    @traced()
+    def get_coverage_model(self, coverage_dirname='tests/reports'):
+        """ Load combined coverage data and the source files that it covers
+
+        Args:
+            coverage_dirname (:obj:`str`, optional): directory with the combined coverage data
+
+        Returns:
+            :obj:`CoverageModel`: coverage model
+        """
+        return CoverageModel.load(os.path.join(coverage_dirname, '.coverage'))
+
+    def _get_build_coverage_model(self, coverage_dirname='tests/reports'):
+        """ Load combined coverage data and the source files that it covers, if the data exists
+
+        Args:
+            coverage_dirname (:obj:`str`, optional): directory with the combined coverage data
+
+        Returns:
+            :obj:`CoverageModel`: coverage model, or :obj:`None` if there is no combined coverage data
+        """
+        if not os.path.isfile(os.path.join(coverage_dirname, '.coverage')):
+            return None
+        return self.get_coverage_model(coverage_dirname=coverage_dirname)
+
+    @traced()
+    def get_diff_coverage(self, base=None, coverage_dirname='tests/reports'):
+        """ Get the coverage of the lines which have changed relative to a base revision
+
+        Only the files which have changed are analyzed.
+
+        Args:
+            base (:obj:`str`, optional): Git revision to compare against; the lines which have changed since the
+                merge base of this revision and ``HEAD`` are analyzed. Defaults to :obj:`DEFAULT_DIFF_COVERAGE_BASE`.
+            coverage_dirname (:obj:`str`, optional): directory with the combined coverage data
+
+        Returns:
+            :obj:`DiffCoverage`: coverage of the changed lines
+        """
+        base = base or self.DEFAULT_DIFF_COVERAGE_BASE
+        changed_lines = self.get_changed_lines(base=base)
+        model = CoverageModel.load(os.path.join(coverage_dirname, '.coverage'), filenames=changed_lines.keys())
+        return DiffCoverage(base, model, changed_lines)
+
+    def _get_build_diff_coverage(self, base=None, coverage_dirname='tests/reports'):
+        """ Get the coverage of the lines which have changed relative to a base revision, if it can be determined
+
+        Args:
+            base (:obj:`str`, optional): Git revision to compare against
+            coverage_dirname (:obj:`str`, optional): directory with the combined coverage data
+
+        Returns:
+            :obj:`DiffCoverage`: coverage of the changed lines, or :obj:`None` if there is no coverage data or the
+                changed lines can't be determined
+        """
+        if not os.path.isfile(os.path.join(coverage_dirname, '.coverage')):
+            return None
+
+        try:
+            return self.get_diff_coverage(base=base, coverage_dirname=coverage_dirname)
+        except git.exc.GitError as exception:
+            warnings.warn('Unable to determine the changed lines: {}'.format(str(exception)), UserWarning)
+            return None
+
+    def get_changed_lines(self, base=None):
+        """ Get the lines of the Python files which have changed relative to a base revision
+
+        Args:
+            base (:obj:`str`, optional): Git revision to compare against; the working tree is compared with the
+                merge base of this revision and ``HEAD``. Defaults to :obj:`DEFAULT_DIFF_COVERAGE_BASE`.
 
-    def upload_coverage_report_to_coveralls(self, coverage_dirname='tests/reports', dry_run=False):
+        Returns:
+            :obj:`dict`: dictionary which maps the absolute path of each changed file to the set of the numbers of its
+                added or modified lines
+        """
+        repo = git.Repo(search_parent_directories=True)
+        merge_base = repo.merge_base(base or self.DEFAULT_DIFF_COVERAGE_BASE, 'HEAD')[0]
+        diff = repo.git.diff(merge_base.hexsha, '--unified=0', '--no-color', '--no-ext-diff', '--', '*.py')
+
+        changed_lines = {}
+        lines = None
+        for line in diff.split('\n'):
+            if line.startswith('+++ '):
+                if line == '+++ /dev/null':
+                    lines = None
+                else:
+                    filename = os.path.join(repo.working_tree_dir, line[6:] if line.startswith('+++ b/') else line[4:])
+                    lines = changed_lines.setdefault(os.path.abspath(filename), set())
+            elif line.startswith('@@ ') and lines is not None:
+                start, _, count = line.split(' ')[2][1:].partition(',')
+                start = int(start)
+                count = int(count) if count else 1
+                lines.update(range(start, start + count))
+
+        return {filename: lines for filename, lines in changed_lines.items() if lines}
+
+    @traced()
+    def upload_coverage_report_to_coveralls(self, coverage_dirname='tests/reports', dry_run=False, coverage_model=None):
         """ Upload coverage report to Coveralls
 
         Args:
             coverage_dirname (:obj:`str`, optional): directory to save coverage data
             dry_run (:obj:`bool`, optional): if true, don't upload to the Coveralls server
+            coverage_model (:obj:`CoverageModel`, optional): coverage model; if :obj:`None`, the model is loaded
+                from :obj:`coverage_dirname`
         """
         # don't upload if there is no coverage file
-        if not os.path.isfile(os.path.join(coverage_dirname, '.coverage')):
+        if coverage_model is None and not os.path.isfile(os.path.join(coverage_dirname, '.coverage')):
             warnings.warn('No coverage file exists to upload to Coveralls', UserWarning)
             return
 
         if self.coveralls_token:
+            if coverage_model is None:
+                coverage_model = self.get_coverage_model(coverage_dirname=coverage_dirname)
+
             runner = coveralls.Coveralls(True, repo_token=self.coveralls_token,
                                          service_name='circle-ci', service_job_id=self.build_num)
 
-            def get_coverage():
-                workman = coverage.Coverage(data_file=os.path.join(coverage_dirname, '.coverage'))
-                workman.load()
-                workman.get_data()
-
-                return coveralls.reporter.CoverallReporter(workman, workman.config).coverage
-
-            with patch.object(coveralls.Coveralls, 'get_coverage', return_value=get_coverage()):
+            with patch.object(coveralls.Coveralls, 'get_coverage', return_value=coverage_model.to_coveralls()):
                 runner.wear(dry_run=dry_run)
 
-    def upload_coverage_report_to_code_climate(self, coverage_dirname='tests/reports', dry_run=False):
+    @traced()
+    def upload_coverage_report_to_code_climate(self, coverage_dirname='tests/reports', dry_run=False,
+                                               coverage_model=None):
         """ Upload coverage report to Code Climate
 
+        The Code Climate coverage payload is generated directly from the coverage data and saved to
+        :obj:`CODE_CLIMATE_PAYLOAD_FILENAME` within :obj:`coverage_dirname`. The Code Climate test reporter is
+        only used to upload the payload. Because the coverage directory is archived as a build artifact, the
+        payload doesn't contain the Code Climate token; the token is passed directly to the reporter.
+
         Args:
             coverage_dirname (:obj:`str`, optional): directory to save coverage data
             dry_run (:obj:`bool`, optional): if true, don't upload to the Coveralls server
+            coverage_model (:obj:`CoverageModel`, optional): coverage model; if :obj:`None`, the model is loaded
+                from :obj:`coverage_dirname`
 
         Raises:
             :obj:`BuildHelperError`: If error uploading code coverage to Code Climate
         """
         # don't upload if there is no coverage file
-        if not os.path.isfile(os.path.join(coverage_dirname, '.coverage')):
+        if coverage_model is None and not os.path.isfile(os.path.join(coverage_dirname, '.coverage')):
             warnings.warn('No coverage file exists to upload to Code Climate', UserWarning)
             return
 
-        # save coverage data to xml
-        xml_cov_filename = 'coverage.xml'
+        if coverage_model is None:
+            coverage_model = self.get_coverage_model(coverage_dirname=coverage_dirname)
 
+        # save the coverage payload
         config = self.get_build_config()
         ignore_files = config.get('static_analyses', {}).get('ignore_files', [])
-        workman = coverage.Coverage(data_file=os.path.join(coverage_dirname, '.coverage'), omit=ignore_files)
-        workman.load()
-        workman.get_data()
-        workman.xml_report(outfile=xml_cov_filename)
+        payload = self.get_code_climate_payload(coverage_model.omit(ignore_files))
 
-        # download the Code Climate test reporter
-        response = requests.get('https://codeclimate.com/downloads/test-reporter/test-reporter-latest-linux-amd64')
-        response.raise_for_status()
-        cc_path = os.path.expanduser('~/cc-test-reporter')
-        with open(cc_path, 'wb') as file:
-            file.write(response.content)
-        os.chmod(cc_path, 0o755)
+        payload_filename = os.path.join(coverage_dirname, self.CODE_CLIMATE_PAYLOAD_FILENAME)
+        with open(payload_filename, 'w') as file:
+            json.dump(payload, file)
 
-        # run the reporter
+        # upload the payload
         if not dry_run:
-            subprocess.check_call([cc_path, 'before-build'])
-            subprocess.check_call([cc_path, 'after-build',
-                                   '-t', 'coverage.py',
-                                   '-r', self.code_climate_token,
-                                   ])
+            cc_path = self.get_code_climate_test_reporter()
+            self._check_call([cc_path, 'upload-coverage',
+                              '-i', payload_filename,
+                              '-r', self.code_climate_token,
+                              ])
+
+    def get_code_climate_payload(self, coverage_model):
+        """ Get the Code Climate coverage payload for the current revision of the package
+
+        Args:
+            coverage_model (:obj:`CoverageModel`): coverage model
+
+        Returns:
+            :obj:`dict`: Code Climate coverage payload
+        """
+        head = self.repo_revision
+        branch = self.repo_branch
+        committed_at = 0
+        try:
+            repo = git.Repo(search_parent_directories=True)
+            commit = repo.head.commit
+            head = head or commit.hexsha
+            committed_at = commit.committed_date
+            if not branch and not repo.head.is_detached:
+                branch = repo.active_branch.name
+        except (git.exc.InvalidGitRepositoryError, ValueError):
+            pass
+
+        payload = coverage_model.to_code_climate(head=head, branch=branch, committed_at=committed_at,
+                                                 reporter_version=self.CODE_CLIMATE_TEST_REPORTER_VERSION)
+        payload['ci_service'] = {
+            'name': 'circleci' if self.build_num else None,
+            'branch': branch,
+            'build_identifier': str(self.build_num) if self.build_num else None,
+            'build_url': os.getenv('CIRCLE_BUILD_URL'),
+            'commit_sha': head,
+            'committed_at': committed_at,
+            'pull_request': os.getenv('CIRCLE_PR_NUMBER'),
+            'worker_id': None,
+        }
+        return payload
+
+    @traced()
+    def get_code_climate_test_reporter(self):
+        """ Get the path to the Code Climate test reporter, downloading it if it isn't already cached
+
+        The reporter is cached in :obj:`code_climate_test_reporter_dirname` under a versioned file name, together
+        with its SHA-256 checksum. The cached reporter is reused as long as its checksum matches.
+
+        Returns:
+            :obj:`str`: path to the Code Climate test reporter
+
+        Raises:
+            :obj:`BuildHelperError`: if the checksum of the downloaded reporter doesn't match the published checksum
+        """
+        url = self.CODE_CLIMATE_TEST_REPORTER_URL.format(self.CODE_CLIMATE_TEST_REPORTER_VERSION)
+        cc_path = os.path.join(self.code_climate_test_reporter_dirname, os.path.basename(url))
+        checksum_filename = cc_path + '.sha256'
+
+        # use the cached reporter
+        if os.path.isfile(cc_path) and os.path.isfile(checksum_filename):
+            with open(checksum_filename, 'r') as file:
+                checksum = file.read().strip()
+            with open(cc_path, 'rb') as file:
+                if hashlib.sha256(file.read()).hexdigest() == checksum:
+                    return cc_path
+
+        # download the reporter and its checksum
+        with self.tracer.span('GET ' + os.path.basename(url) + '.sha256', category='http'):
+            response = requests.get(url + '.sha256')
+            response.raise_for_status()
+        checksum = response.text.split()[0].lower()
+
+        with self.tracer.span('GET ' + os.path.basename(url), category='http'):
+            response = requests.get(url)
+            response.raise_for_status()
+        if hashlib.sha256(response.content).hexdigest() != checksum:
+            raise BuildHelperError('Checksum of the Code Climate test reporter {} is invalid'.format(
+                self.CODE_CLIMATE_TEST_REPORTER_VERSION))
+
+        # save the reporter and its checksum to the cache
+        if not os.path.isdir(self.code_climate_test_reporter_dirname):
+            os.makedirs(self.code_climate_test_reporter_dirname)
+        tmp_path = cc_path + '.tmp'
+        with open(tmp_path, 'wb') as file:
+            file.write(response.content)
+        os.chmod(tmp_path, 0o755)
+        os.replace(tmp_path, cc_path)
+        with open(checksum_filename, 'w') as file:
+            file.write(checksum)
+
+        return cc_path
 
     ########################
     # Documentation
@@ -2144,6 +3096,7 @@ class BuildHelper(object):
                     template = Template(file.read())
                 template.stream(**context).dump(os.path.join(dirname, self.proj_docs_dir, filename))
 
+    @traced()
     def make_documentation(self, spell_check=False):
         """ Make HTML documentation using Sphinx for one or more packages. Save documentation to `proj_docs_build_html_dir`
 
@@ -2189,6 +3142,7 @@ class BuildHelper(object):
                 self.run_method_and_capture_stderr(sphinx.ext.apidoc.main,
                                                    argv=['-f', '-P', '-o', os.path.join(self.proj_docs_dir, 'source'), package])
 
+    @traced()
     def upload_documentation_to_docs_server(self, dirname='.'):
         """ Upload compiled documentation to the lab server
 
@@ -2264,6 +3218,7 @@ class BuildHelper(object):
         else:
             raise BuildHelperError("The directory must contain documentation for at least one version")
 
+    @traced()
     def log_environment(self):
         """ Log environment 
 
@@ -2305,12 +3260,6 @@ class BuildHelper(object):
         Raises:
             :obj:`BuildHelperError`: if a package has more than one module
         """
-        import pkg_utils
-        # pkg_utils is imported locally so that we can use karr_lab_build_utils to properly calculate its coverage;
-        # :todo: figure out how to fix this
-
-        packages_parent_dir = os.path.abspath(packages_parent_dir)
-
         # get the name of the current package
         parser = configparser.ConfigParser()
         parser.read(os.path.join(dirname, 'setup.cfg'))
@@ -2319,16 +3268,9 @@ class BuildHelper(object):
             raise BuildHelperError('Package should have only one module')
         this_pkg_name = tmp[0]
 
-        # collect the downstream dependencies by analyzing the requirements files of other packages
+        # collect the downstream dependencies from the index of the requirements files of other packages
         # :todo: support branches
-        downstream_dependencies = []
-        for dirname in glob.glob(os.path.join(packages_parent_dir, '*')):
-            if os.path.isdir(dirname) and os.path.isfile(os.path.join(dirname, '.circleci/config.yml')):
-                other_pkg_name = dirname[len(packages_parent_dir) + 1:]
-                install_requires, extras_require, _, _ = pkg_utils.get_dependencies(
-                    dirname, include_extras=False, include_specs=False, include_markers=False)
-                if this_pkg_name in install_requires or this_pkg_name in extras_require['all']:
-                    downstream_dependencies.append(other_pkg_name)
+        downstream_dependencies = self.get_dependency_index(packages_parent_dir).get_dependents(this_pkg_name)
 
         # save the downstream dependencies to a file
         if config_filename:
@@ -2345,39 +3287,55 @@ class BuildHelper(object):
         # return the downstream dependencies
         return downstream_dependencies
 
-    def are_package_dependencies_acyclic(self, packages_parent_dir='..'):
-        """ Check if the package dependencies are acyclic so they are supported by CircleCI
+    def compile_all_downstream_dependencies(self, packages_parent_dir='..', config_filename='.karr_lab_build_utils.yml'):
+        """ Compile the downstream dependencies of all of the packages in a directory and save them to the
+        configuration file of each package
+
+        The graph of the indirect downstream dependencies of each package, and the modules of each package which its
+        direct downstream dependencies import, are also saved, so that :obj:`trigger_tests_of_downstream_dependencies`
+        can defer the downstream dependencies which can be triggered by other downstream dependencies and skip those
+        which can't be affected by a change.
 
         Args:
             packages_parent_dir (:obj:`str`, optional): path to the parent directory of the packages
+            config_filename (:obj:`str`, optional): path to save the configuration of each package, relative to the
+                package
 
         Returns:
-            :obj:`bool`: :obj:`True` if the package dependencies are acyclic
+            :obj:`dict`: dictionary which maps the name of each package to its downstream dependencies
         """
-        graph = networkx.DiGraph()
+        index = self.get_dependency_index(packages_parent_dir)
+        if config_filename:
+            index.write_downstream_dependencies(config_filename=config_filename)
+        return index.downstream
 
-        for dirname in glob.glob(os.path.join(packages_parent_dir, '*')):
-            if os.path.isdir(dirname) and os.path.isfile(os.path.join(dirname, '.circleci/config.yml')):
-                # get package name
-                pkg = dirname[len(packages_parent_dir) + 1:]
+    def get_dependency_index(self, packages_parent_dir='..'):
+        """ Get the index of the dependencies among the packages in a directory
+
+        The index is saved to :obj:`dependency_index_dirname`, and only the packages whose requirements files have
+        changed since the index was last saved are reparsed.
+
+        Args:
+            packages_parent_dir (:obj:`str`, optional): path to the parent directory of the packages
 
-                # create node for package
-                graph.add_node(pkg)
+        Returns:
+            :obj:`DependencyIndex`: index of the dependencies among the packages in :obj:`packages_parent_dir`
+        """
+        packages_parent_dir = os.path.abspath(packages_parent_dir)
+        filename = os.path.join(self.dependency_index_dirname,
+                                hashlib.sha1(packages_parent_dir.encode()).hexdigest() + '.json')
+        return DependencyIndex(packages_parent_dir, filename=filename).update()
 
-                # create edges for dependencies
-                config_filename = os.path.join(dirname, '.karr_lab_build_utils.yml')
-                if os.path.isfile(config_filename):
-                    with open(config_filename, 'r') as file:
-                        config = yaml.load(file, Loader=yaml.FullLoader)
-                    deps = config.get('downstream_dependencies', [])
-                    for other_pkg in deps:
-                        graph.add_edge(pkg, other_pkg)
+    def are_package_dependencies_acyclic(self, packages_parent_dir='..'):
+        """ Check if the package dependencies are acyclic so they are supported by CircleCI
 
-        try:
-            networkx.algorithms.cycles.find_cycle(graph)
-            return False
-        except networkx.NetworkXNoCycle:
-            return True
+        Args:
+            packages_parent_dir (:obj:`str`, optional): path to the parent directory of the packages
+
+        Returns:
+            :obj:`bool`: :obj:`True` if the package dependencies are acyclic
+        """
+        return self.get_dependency_index(packages_parent_dir).is_acyclic()
 
     def visualize_package_dependencies(self, packages_parent_dir='..', out_filename='../package_dependencies.pdf'):
         """ Visualize downstream package dependencies as a graph
@@ -2386,37 +3344,200 @@ class BuildHelper(object):
             packages_parent_dir (:obj:`str`, optional): path to the parent directory of the packages
             out_filename (:obj:`str`, optional): path to save visualization
         """
+        self.get_dependency_index(packages_parent_dir).render(out_filename)
 
-        basename, format = os.path.splitext(out_filename)
-        dot = graphviz.Digraph(format=format[1:])
+    def predict_cascade_duration(self, package=None, packages_parent_dir='..', max_threads=8):
+        """ Predict the wall time of the build cascade triggered by a package, and its critical path, from the
+        historical durations and queue times of the CircleCI builds of the package and its downstream dependencies
 
-        for dirname in glob.glob(os.path.join(packages_parent_dir, '*')):
-            if os.path.isdir(dirname) and os.path.isfile(os.path.join(dirname, '.circleci/config.yml')):
-                # get package name
-                pkg = dirname[len(packages_parent_dir) + 1:]
+        Args:
+            package (:obj:`str`, optional): name of the package which triggers the cascade; default: this package
+            packages_parent_dir (:obj:`str`, optional): path to the parent directory of the packages
+            max_threads (:obj:`int`, optional): maximum number of concurrent requests to CircleCI
+
+        Returns:
+            :obj:`dict`: dictionary with the keys ``wall_time``, ``critical_path``, and ``schedule`` (see
+                :obj:`DependencyIndex.get_critical_path`), and ``total_time`` (total build time of the cascade)
+        """
+        package = package or self.repo_name
+        index = self.get_dependency_index(packages_parent_dir)
+        packages = [package] + index.get_downstream_closure(package)
+
+        durations, queue_times = self.get_circleci_build_times(packages, max_threads=max_threads)
+        known_durations = [duration for duration in durations.values() if duration is not None]
+        default_duration = statistics.median(known_durations) if known_durations else 0.
+        for other_package, duration in durations.items():
+            if duration is None:
+                warnings.warn(('{} has no successful CircleCI builds; its build duration is assumed to be the '
+                               'median of the other packages').format(other_package), UserWarning)
+                durations[other_package] = default_duration
+        queue_times = {other_package: queue_time for other_package, queue_time in queue_times.items()
+                       if queue_time is not None}
+
+        # get the packages which defer their downstream dependencies to other downstream dependencies
+        deferring_packages = []
+        for other_package in packages:
+            config_filename = os.path.join(index.packages_parent_dir, other_package, '.karr_lab_build_utils.yml')
+            if os.path.isfile(config_filename):
+                with open(config_filename, 'r') as file:
+                    config = yaml.load(file, Loader=yaml.FullLoader) or {}
+                if config.get('downstream_dependency_graph', None) and \
+                        config.get('defer_downstream_dependencies', False):
+                    deferring_packages.append(other_package)
 
-                # create node for package
-                dot.node(pkg, pkg)
+        prediction = index.get_critical_path(package, durations, queue_times=queue_times,
+                                             deferring_packages=deferring_packages)
+        prediction['total_time'] = sum(durations.values())
+        return prediction
 
-                # create edges for dependencies
-                config_filename = os.path.join(dirname, '.karr_lab_build_utils.yml')
-                if os.path.isfile(config_filename):
-                    with open(config_filename, 'r') as file:
-                        config = yaml.load(file, Loader=yaml.FullLoader)
-                    deps = config.get('downstream_dependencies', [])
-                    for other_pkg in deps:
-                        dot.edge(pkg, other_pkg)
+    def get_circleci_build_times(self, packages, max_threads=8):
+        """ Get the median durations and queue times of the recent successful CircleCI builds of packages
 
-        dot.render(filename=basename, cleanup=True)
+        Args:
+            packages (:obj:`list` of :obj:`str`): names of the packages
+            max_threads (:obj:`int`, optional): maximum number of concurrent requests to CircleCI
+
+        Returns:
+            :obj:`tuple` of :obj:`dict`: dictionaries which map the name of each package to the median duration and
+                the median queue time of its recent successful builds in seconds, or :obj:`None` if the package has
+                no recent successful builds
+        """
+        def get_times(package):
+            builds = [build for build in self.run_circleci_api('', repo_name=package)
+                      if build.get('lifecycle', None) == 'finished' and
+                      build.get('status', None) in ['success', 'fixed']]
+            durations = [build['build_time_millis'] / 1000. for build in builds
+                         if build.get('build_time_millis', None) is not None]
+            queue_times = [(dateutil.parser.parse(build['start_time']) -
+                            dateutil.parser.parse(build['queued_at'])).total_seconds() for build in builds
+                           if build.get('queued_at', None) and build.get('start_time', None)]
+            return (statistics.median(durations) if durations else None,
+                    statistics.median(queue_times) if queue_times else None)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_threads) as executor:
+            times = list(executor.map(get_times, packages))
+        return ({package: duration for package, (duration, _) in zip(packages, times)},
+                {package: queue_time for package, (_, queue_time) in zip(packages, times)})
+
+    @traced()
+    def test_downstream_dependencies(self, dirname='.', packages_parent_dir='..', test_path='tests', n_workers=None,
+                                     install=True):
+        """ Locally test the direct and indirect downstream dependencies of a package against its working copy
+
+        The package is installed in editable mode, and then the tests of its downstream dependencies under
+        :obj:`packages_parent_dir` are run with pytest, each in its own process. The tests of each downstream
+        dependency start once the tests of all of its upstream dependencies have finished, and at most
+        :obj:`n_workers` test suites run concurrently.
+
+        Args:
+            dirname (:obj:`str`, optional): path to the package
+            packages_parent_dir (:obj:`str`, optional): path to the parent directory of the packages
+            test_path (:obj:`str`, optional): path to the tests of each downstream dependency, relative to the
+                dependency
+            n_workers (:obj:`int`, optional): maximum number of test suites to run concurrently; if :obj:`None`, use
+                the number of CPUs
+            install (:obj:`bool`, optional): if :obj:`True`, install the package in editable mode
+
+        Returns:
+            :obj:`collections.OrderedDict`: dictionary which maps the name of each downstream dependency, in
+                topological order, to a dictionary with the keys ``passed``, ``num_tests``, ``num_passed``,
+                ``num_skipped``, ``num_failures``, ``num_errors``, ``duration`` (seconds), and ``output``
+        """
+        dirname = os.path.abspath(dirname)
+        index = self.get_dependency_index(packages_parent_dir)
+        packages = index.get_downstream_closure(os.path.basename(dirname))
+        if not packages:
+            return collections.OrderedDict()
+
+        if install:
+            py_v = '{}.{}'.format(sys.version_info[0], sys.version_info[1])
+            self._check_call(['pip' + py_v, 'install', '-e', dirname])
+
+        scheduler = TaskScheduler(max_threads=n_workers or os.cpu_count() or 1)
+        dependencies = index.get_graph().subgraph(packages)
+        order = index.get_topological_order(packages)
+        for package in order:
+            scheduler.add_task(package, self._test_downstream_dependency,
+                               args=(os.path.join(os.path.abspath(packages_parent_dir), package), test_path),
+                               dependencies=list(dependencies.predecessors(package)))
+        results = scheduler.run()
+
+        return collections.OrderedDict((package, results[package]) for package in order)
+
+    def _test_downstream_dependency(self, dirname, test_path):
+        """ Run the tests of a downstream dependency with pytest in a separate process
+
+        Args:
+            dirname (:obj:`str`): path to the downstream dependency
+            test_path (:obj:`str`): path to the tests, relative to :obj:`dirname`
+
+        Returns:
+            :obj:`dict`: dictionary with the keys ``passed``, ``num_tests``, ``num_passed``, ``num_skipped``,
+                ``num_failures``, ``num_errors``, ``duration`` (seconds), and ``output``
+        """
+        file, xml_filename = tempfile.mkstemp(suffix='.xml')
+        os.close(file)
+        try:
+            with self.tracer.span('test ' + os.path.basename(dirname), category='subprocess'):
+                start = time.perf_counter()
+                process = subprocess.run([sys.executable, '-m', 'pytest', test_path, '--junitxml=' + xml_filename],
+                                         cwd=dirname, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+                duration = time.perf_counter() - start
+
+            test_results = TestResults()
+            if os.path.getsize(xml_filename):
+                test_results.add_cases(self._parse_test_results_file(xml_filename, self.get_python_version()))
+        finally:
+            os.remove(xml_filename)
 
+        return {
+            'passed': process.returncode == 0,
+            'num_tests': test_results.get_num_tests(),
+            'num_passed': test_results.get_num_passed(),
+            'num_skipped': test_results.get_num_skipped(),
+            'num_failures': test_results.get_num_failures(),
+            'num_errors': test_results.get_num_errors(),
+            'duration': duration,
+            'output': process.stdout.decode(errors='replace'),
+        }
+
+    @traced()
     def trigger_tests_of_downstream_dependencies(self, config_filename='.karr_lab_build_utils.yml',
-                                                 dry_run=False):
+                                                 dry_run=False, max_threads=8, test_results=None):
         """ Trigger CircleCI to test downstream dependencies listed in :obj:`config_filename`
 
+        If :obj:`config_filename` also contains the modules which each downstream dependency imports (see
+        :obj:`compile_all_downstream_dependencies`) and this build started the build cascade, the downstream
+        dependencies which don't import any of the modules affected by the changes since the revision of the last
+        build of this package which started a build cascade are skipped. If none of the recent builds of this package
+        started a build cascade, the commits of this build are used instead, and if CircleCI truncated the commits of
+        this build, all of the downstream dependencies are triggered.
+
+        If :obj:`config_filename` also contains the graph of the indirect downstream dependencies (see
+        :obj:`compile_all_downstream_dependencies`) and its ``defer_downstream_dependencies`` option is true, the
+        direct downstream dependencies which are also indirect downstream dependencies through other downstream
+        dependencies are deferred to those dependencies, so that fewer redundant builds are run. Deferred packages are
+        still triggered directly if none of the downstream dependencies through which they depend on this package is
+        triggered by this build (e.g., because it has already been queued or doesn't import the changed modules).
+        Note, deferred packages are not tested if all of their intermediate dependencies fail their tests, and
+        packages with multiple intermediate dependencies are triggered by the first of them to pass its tests, rather
+        than after all of them.
+
+        Each triggered build is recorded in :obj:`cascade_ledger`, so that whether a package has already been
+        triggered by the current build cascade on this machine can be determined with a single lookup. The ledger
+        isn't shared among machines, and each CircleCI build runs in a new container, so the ledger only avoids
+        duplicate triggers among the builds of a cascade which run on the same machine (e.g., locally). Packages which
+        aren't in the ledger are checked against their recent CircleCI builds, which remain the source of truth. The recent builds of the downstream dependencies are
+        evaluated concurrently, and then the builds of the dependencies which haven't already been queued are
+        triggered concurrently.
+
         Args:
             config_filename (:obj:`str`, optional): path to YAML configuration file which contains a list of
                 downstream dependencies
             dry_run (:obj:`bool`, optional): if true, don't upload to the Coveralls and Code Climate servers
+            max_threads (:obj:`int`, optional): maximum number of concurrent requests to CircleCI
+            test_results (:obj:`TestResults`, optional): test results; if :obj:`None`, the results are loaded
+                from the XML reports of the current build
 
         Returns:
             :obj:`list` of :obj:`str`: names of triggered packages
@@ -2434,7 +3555,8 @@ class BuildHelper(object):
             return (None, None)
 
         # stop if the tests didn't pass
-        test_results = self.get_test_results()
+        if test_results is None:
+            test_results = self.get_test_results()
         if test_results.get_num_errors() > 0 or test_results.get_num_failures() > 0:
             self.logger.info("\tDon't trigger tests because the tests didn't succeed")
             return (None, None)
@@ -2455,70 +3577,364 @@ class BuildHelper(object):
             upstream_repo_name = self.repo_name
             upstream_build_num = str(self.build_num)
 
-        result = self.run_circleci_api('/' + str(upstream_build_num), repo_name=upstream_repo_name)
+        result = self.get_circleci_build(upstream_build_num, repo_name=upstream_repo_name)
         upstream_build_time_str = result['start_time']
         upstream_build_time = dateutil.parser.parse(upstream_build_time_str)
 
-        triggered_packages = []
+        # skip the packages which don't import any of the modules changed since the last build cascade of this package
         not_triggered_packages = {}
-        for package in packages:
-            branch = 'master'
-
-            # get summary of recent builds
-            builds = self.run_circleci_api('', repo_name=package)
-
-            # don't trigger build if a build has already been triggered from the same upstream build
-            # this prevents building the same project multiple times, including infinite looping
-            already_queued = False
-
-            for build in builds:
-                response = self.run_circleci_api('/{}'.format(build['build_num']), repo_name=package)
-                stream = io.StringIO(response['circle_yml']['string'])
-                jobs = yaml.load(stream).get('jobs', {})
-                for job in jobs.values():
-                    for step in job.get('steps', []):
-                        if 'run' in step and isinstance(step['run'], dict):
-                            env = step['run'].get('environment', {})
-                            if 'UPSTREAM_REPONAME' in env:
-                                build['build_parameters']['UPSTREAM_REPONAME'] = env.get('UPSTREAM_REPONAME')
-                                build['build_parameters']['UPSTREAM_BUILD_NUM'] = env.get('UPSTREAM_BUILD_NUM')
+        imports = config.get('downstream_dependency_imports', None)
+        if imports and upstream_repo_name == self.repo_name:
+            base = self._get_last_cascade_revision(result) if result.get('vcs_revision', None) else None
+            if base:
+                changed_modules = self.get_changed_modules(commits=[result['vcs_revision']], base=base)
+            elif result.get('all_commit_details_truncated', False):
+                changed_modules = None
+            else:
+                commits = [commit['commit'] for commit in (result.get('all_commit_details', None) or [])]
+                changed_modules = self.get_changed_modules(commits=commits or None)
+            if changed_modules is not None:
+                for package in packages:
+                    if package in imports and not self._imports_any_modules(imports[package], changed_modules):
+                        msg = ("don't trigger tests because this package doesn't import any of the changed modules\n"
+                               "\t\tchanged modules: {}").format(', '.join(changed_modules) or 'none')
+                        not_triggered_packages[package] = msg
+                        self.logger.info("\t{}: {}".format(package, msg))
+                packages = [package for package in packages if package not in not_triggered_packages]
+
+        # defer the packages which can be triggered by other downstream dependencies
+        graph = config.get('downstream_dependency_graph', None)
+        intermediates = {}
+        if graph and config.get('defer_downstream_dependencies', False):
+            waves, intermediates = self.get_downstream_dependency_waves(self.repo_name, packages, graph)
+            for i_wave, wave in enumerate(waves):
+                self.logger.info("\twave {}: {}".format(i_wave + 1, ', '.join(wave)))
+
+        # determine which packages to trigger
+        triggered_packages = self._claim_downstream_dependencies(
+            [package for package in packages if package not in intermediates], not_triggered_packages,
+            upstream_repo_name, upstream_build_num, upstream_build_time_str, upstream_build_time, max_threads)
+
+        # trigger the deferred packages which won't be triggered by any of the triggered packages
+        if intermediates:
+            reachable_packages = set()
+            unvisited_packages = list(triggered_packages)
+            while unvisited_packages:
+                for other_package in graph.get(unvisited_packages.pop(), []):
+                    if other_package not in reachable_packages:
+                        reachable_packages.add(other_package)
+                        unvisited_packages.append(other_package)
+
+            for package in packages:
+                if package in intermediates and package in reachable_packages:
+                    msg = ("don't trigger tests because this package will be triggered by its upstream "
+                           "dependencies\n"
+                           "\t\tupstream dependencies: {}").format(', '.join(intermediates[package]))
+                    not_triggered_packages[package] = msg
+                    self.logger.info("\t{}: {}".format(package, msg))
+
+            triggered_packages += self._claim_downstream_dependencies(
+                [package for package in packages if package in intermediates and package not in reachable_packages],
+                not_triggered_packages,
+                upstream_repo_name, upstream_build_num, upstream_build_time_str, upstream_build_time, max_threads)
+
+        # trigger builds concurrently
+        def trigger(package):
+            try:
+                self.run_circleci_api('/pipeline', version="2", method='post', repo_name=package, data={
+                    'branch': 'master',
+                    'parameters': {
+                        'upstream_repo_name': upstream_repo_name,
+                        'upstream_build_num': int(upstream_build_num),
+                    }
+                })
+            except Exception:
+                self.cascade_ledger.release(upstream_repo_name, upstream_build_num, package)
+                raise
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_threads) as executor:
+            for package, _ in zip(triggered_packages, executor.map(trigger, triggered_packages)):
+                self.logger.info(("\t{}: trigger tests").format(package))
+
+        return (triggered_packages, not_triggered_packages)
+
+    def _claim_downstream_dependencies(self, packages, not_triggered_packages, upstream_repo_name, upstream_build_num,
+                                       upstream_build_time_str, upstream_build_time, max_threads):
+        """ Determine which downstream dependencies haven't already been queued by the current build cascade, and
+        claim them in :obj:`cascade_ledger`
+
+        The packages and their recent builds are evaluated concurrently. The packages are claimed in the ledger so
+        that concurrent build cascades don't trigger them again.
+
+        Args:
+            packages (:obj:`list` of :obj:`str`): names of the downstream dependencies
+            not_triggered_packages (:obj:`dict`): dictionary to which the reasons why packages shouldn't be triggered
+                are added
+            upstream_repo_name (:obj:`str`): name of the repository which triggered the build cascade
+            upstream_build_num (:obj:`str`): number of the build which triggered the build cascade
+            upstream_build_time_str (:obj:`str`): start time of the build which triggered the build cascade
+            upstream_build_time (:obj:`datetime`): start time of the build which triggered the build cascade
+            max_threads (:obj:`int`): maximum number of concurrent requests to CircleCI
+
+        Returns:
+            :obj:`list` of :obj:`str`: names of the packages which should be triggered
+        """
+        if not packages:
+            return []
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_threads) as package_executor, \
+                concurrent.futures.ThreadPoolExecutor(max_workers=max_threads) as build_executor:
+            msgs = list(package_executor.map(
+                lambda package: self._get_downstream_dependency_queued_msg(
+                    package, upstream_repo_name, upstream_build_num, upstream_build_time_str, upstream_build_time,
+                    build_executor),
+                packages))
+
+        triggered_packages = []
+        for package, msg in zip(packages, msgs):
+            if not msg and not self.cascade_ledger.claim(upstream_repo_name, upstream_build_num, package,
+                                                         self.repo_name, self.build_num):
+                msg = self._get_cascade_ledger_msg(package, upstream_repo_name, upstream_build_num,
+                                                   upstream_build_time_str)
+            if msg:
+                not_triggered_packages[package] = msg
+                self.logger.info("\t{}: {}".format(package, msg))
+            else:
+                triggered_packages.append(package)
+        return triggered_packages
+
+    @staticmethod
+    def get_downstream_dependency_waves(package, downstream_dependencies, graph):
+        """ Schedule the builds of the downstream dependencies of a package into topological waves
+
+        Each wave is triggered by the packages in the previous waves. A direct downstream dependency which is also an
+        indirect downstream dependency through another downstream dependency is scheduled after that dependency,
+        rather than in the first wave.
+
+        Args:
+            package (:obj:`str`): name of the package
+            downstream_dependencies (:obj:`list` of :obj:`str`): names of the direct downstream dependencies of
+                :obj:`package`
+            graph (:obj:`dict`): dictionary which maps the name of each indirect downstream dependency of
+                :obj:`package` to its direct downstream dependencies
+
+        Returns:
+            :obj:`list` of :obj:`list` of :obj:`str`: names of the downstream dependencies in each wave
+            :obj:`dict`: dictionary which maps the names of the direct downstream dependencies which will be triggered
+                by other downstream dependencies to the names of those dependencies
+        """
+        dag = networkx.DiGraph()
+        dag.add_node(package)
+        for other_package in downstream_dependencies:
+            dag.add_edge(package, other_package)
+        for other_package, other_downstream_dependencies in graph.items():
+            for other_downstream_dependency in other_downstream_dependencies:
+                dag.add_edge(other_package, other_downstream_dependency)
+        dag = dag.subgraph(networkx.descendants(dag, package) | set([package]))
+
+        # trigger all of the direct downstream dependencies if the dependencies are cyclic
+        if not networkx.is_directed_acyclic_graph(dag):
+            return ([sorted(downstream_dependencies)], {})
+
+        reduced_dag = networkx.transitive_reduction(dag)
+        waves = [sorted(wave) for wave in networkx.topological_generations(reduced_dag)][1:]
+        intermediates = {}
+        for other_package in downstream_dependencies:
+            if not reduced_dag.has_edge(package, other_package):
+                intermediates[other_package] = sorted(reduced_dag.predecessors(other_package))
+        return (waves, intermediates)
+
+    def get_changed_modules(self, commits=None, dirname='.', base=None):
+        """ Get the modules of a package which are affected by commits
+
+        The modules which are affected are the modules whose files were changed by the commits, and the modules of the
+        package which directly or indirectly import them, as determined by statically scanning the imports of the
+        package. Changes to the tests and documentation of the package don't affect any modules.
+
+        Args:
+            commits (:obj:`list` of :obj:`str`, optional): SHA-1 hashes of the commits; default: the latest commit
+            dirname (:obj:`str`, optional): path to the package
+            base (:obj:`str`, optional): SHA-1 hash of a commit to compare the commits with; if provided, the files
+                which differ between :obj:`base` and each commit are used instead of the files changed by each
+                commit, so that the changes of all of the commits since :obj:`base` are included
+
+        Returns:
+            :obj:`list` of :obj:`str`: sorted names of the affected modules, or :obj:`None` if the commits can't be
+                found or if they change files outside of the modules of the package (e.g., requirements) which may
+                affect its downstream dependencies
+        """
+        module = DependencyIndex.get_module_name(dirname)
+
+        # get the files changed by the commits
+        filenames = set()
+        try:
+            repo = git.Repo(dirname, search_parent_directories=True)
+            for commit in commits or ['HEAD']:
+                commit = repo.commit(commit)
+                if base:
+                    parent = repo.commit(base)
+                elif commit.parents:
+                    parent = commit.parents[0]
+                else:
+                    return None
+                for diff in parent.diff(commit):
+                    filenames.update(filename for filename in [diff.a_path, diff.b_path] if filename)
+            rel_dirname = os.path.relpath(os.path.abspath(dirname), repo.working_tree_dir)
+        except (ValueError, git.exc.BadName, git.exc.GitError):
+            return None
+
+        # get the modules whose files were changed
+        changed_modules = set()
+        for filename in filenames:
+            filename = os.path.normpath(os.path.relpath(filename, rel_dirname))
+            parts = filename.split(os.sep)
+            if parts[0] in ['tests', 'docs'] or (len(parts) == 1 and os.path.splitext(filename)[1] in ['.md', '.rst']):
+                continue
+            if parts[0] != module.split('.')[0] or not filename.endswith('.py'):
+                return None
+            changed_modules.add(self._get_module_from_filename(filename))
+
+        # get the modules which import the changed modules
+        graph = networkx.DiGraph()
+        for filename in DependencyIndex.get_source_filenames(dirname):
+            if filename.split(os.sep)[0] != module.split('.')[0]:
+                continue
+            importing_module = self._get_module_from_filename(filename)
+            package = importing_module if filename.endswith('__init__.py') else importing_module.rpartition('.')[0]
+            for imported_module in DependencyIndex.scan_imports(os.path.join(dirname, filename), package=package):
+                parts = imported_module.split('.')
+                for i_part in range(len(parts)):
+                    graph.add_edge(importing_module, '.'.join(parts[0:i_part + 1]))
+
+        affected_modules = set(changed_modules)
+        for changed_module in changed_modules:
+            if changed_module in graph:
+                affected_modules.update(networkx.ancestors(graph, changed_module))
+        return sorted(affected_modules)
+
+    def _get_last_cascade_revision(self, build):
+        """ Get the revision tested by the last build of this package which started a build cascade before a build
+
+        Args:
+            build (:obj:`dict`): CircleCI build of this package
+
+        Returns:
+            :obj:`str`: SHA-1 hash of the revision tested by the last successful build of this package on the branch
+                of :obj:`build` which preceded :obj:`build` and which wasn't triggered by an upstream dependency, or
+                :obj:`None` if none of the recent builds of this package started a build cascade
+        """
+        other_builds = sorted(self.run_circleci_api('', repo_name=self.repo_name),
+                              key=lambda other_build: other_build['build_num'], reverse=True)
+        for other_build in other_builds:
+            if other_build['build_num'] < build['build_num'] and \
+                    other_build.get('branch', None) == build.get('branch', None) and \
+                    other_build.get('status', None) in ['success', 'fixed'] and \
+                    other_build.get('vcs_revision', None) and \
+                    not self.get_circleci_build(other_build['build_num'])['upstream_environment']:
+                return other_build['vcs_revision']
+        return None
+
+    @staticmethod
+    def _get_module_from_filename(filename):
+        """ Get the name of the module of a Python file
+
+        Args:
+            filename (:obj:`str`): path to the file, relative to the package
+
+        Returns:
+            :obj:`str`: name of the module
+        """
+        parts = os.path.splitext(os.path.normpath(filename))[0].split(os.sep)
+        if parts[-1] == '__init__':
+            parts.pop()
+        return '.'.join(parts)
+
+    @staticmethod
+    def _imports_any_modules(imports, modules):
+        """ Determine whether importing any of a list of modules runs the code of any of another list of modules
+
+        Importing a module also runs the code of the packages which contain it. For example, importing ``a.b.c`` runs
+        the code of ``a``, ``a.b``, and ``a.b.c``.
+
+        Args:
+            imports (:obj:`list` of :obj:`str`): names of the imported modules
+            modules (:obj:`list` of :obj:`str`): names of the modules
+
+        Returns:
+            :obj:`bool`: :obj:`True` if importing any of :obj:`imports` runs the code of any of :obj:`modules`
+        """
+        modules = set(modules)
+        for imported_module in imports:
+            parts = imported_module.split('.')
+            for i_part in range(len(parts)):
+                if '.'.join(parts[0:i_part + 1]) in modules:
+                    return True
+        return False
+
+    def _get_downstream_dependency_queued_msg(self, package, upstream_repo_name, upstream_build_num,
+                                              upstream_build_time_str, upstream_build_time, executor):
+        """ Determine whether a build of a downstream dependency has already been queued by the current build
+        cascade
+
+        The package is first looked up in :obj:`cascade_ledger`. If it isn't there, the details of the recent builds
+        of the package are retrieved concurrently, but the builds are evaluated in order, and the retrieval of the
+        remaining builds is canceled once a build which has already been queued is found.
+
+        Args:
+            package (:obj:`str`): name of the downstream dependency
+            upstream_repo_name (:obj:`str`): name of the repository which triggered the build cascade
+            upstream_build_num (:obj:`str`): number of the build which triggered the build cascade
+            upstream_build_time_str (:obj:`str`): start time of the build which triggered the build cascade
+            upstream_build_time (:obj:`datetime`): start time of the build which triggered the build cascade
+            executor (:obj:`concurrent.futures.Executor`): executor to retrieve the details of the builds
+
+        Returns:
+            :obj:`str`: reason why the package shouldn't be triggered, or :obj:`None` if it should be triggered
+
+        :todo: support branches
+        """
+        def format_msg(reason, build):
+            return ("don't trigger tests because {}\n"
+                    "\t\tbuild: {}\n"
+                    "\t\tbuild time: {}\n"
+                    "\t\tbuild status: {}\n"
+                    "\t\tupstream repo: {}\n"
+                    "\t\tupstream build: {}\n"
+                    "\t\tupstream build time: {}").format(reason, build['build_num'], build['start_time'], build['status'],
+                                                          upstream_repo_name, upstream_build_num, upstream_build_time_str)
+
+        # don't trigger a build if the ledger shows that the package has already been triggered by the current
+        # build cascade
+        msg = self._get_cascade_ledger_msg(package, upstream_repo_name, upstream_build_num, upstream_build_time_str)
+        if msg:
+            return msg
+
+        # otherwise, check the recent builds of the package
+        builds = self.run_circleci_api('', repo_name=package)
+
+        # don't trigger build if a build has already been triggered from the same upstream build
+        # this prevents building the same project multiple times, including infinite looping
+        futures = [executor.submit(self.get_circleci_build, build['build_num'], repo_name=package)
+                   for build in builds]
+        try:
+            for build, future in zip(builds, futures):
+                upstream_env = future.result()['upstream_environment']
+                if upstream_env:
+                    build['build_parameters']['UPSTREAM_REPONAME'] = upstream_env['UPSTREAM_REPONAME']
+                    build['build_parameters']['UPSTREAM_BUILD_NUM'] = upstream_env['UPSTREAM_BUILD_NUM']
 
                 # don'trigger a build if this is the same package which triggered the cascade
                 if package == upstream_repo_name and \
                         str(build['build_num']) == upstream_build_num and \
                         build['build_num'] != self.build_num:
-                    already_queued = True
-                    msg = ("don't trigger tests because this package already triggered the "
-                           "current build cascade\n"
-                           "\t\tbuild: {}\n"
-                           "\t\tbuild time: {}\n"
-                           "\t\tbuild status: {}\n"
-                           "\t\tupstream repo: {}\n"
-                           "\t\tupstream build: {}\n"
-                           "\t\tupstream build time: {}").format(build['build_num'], build['start_time'], build['status'],
-                                                                 upstream_repo_name, upstream_build_num, upstream_build_time_str)
-                    not_triggered_packages[package] = msg
-                    self.logger.info("\t{}: {}".format(package, msg))
-                    break
+                    return format_msg('this package already triggered the current build cascade', build)
 
                 # don't trigger a build if the package already been triggered from the same upstream commit
                 build_parameters = build['build_parameters']
                 if build_parameters and 'UPSTREAM_REPONAME' in build_parameters and \
                         build_parameters['UPSTREAM_REPONAME'] == upstream_repo_name and \
                         build_parameters['UPSTREAM_BUILD_NUM'] == upstream_build_num:
-                    already_queued = True
-                    msg = ("don't trigger tests because this package has already been triggered "
-                           "by the current build cascade\n"
-                           "\t\tbuild: {}\n"
-                           "\t\tbuild time: {}\n"
-                           "\t\tbuild status: {}\n"
-                           "\t\tupstream repo: {}\n"
-                           "\t\tupstream build: {}\n"
-                           "\t\tupstream build time: {}").format(build['build_num'], build['start_time'], build['status'],
-                                                                 upstream_repo_name, upstream_build_num, upstream_build_time_str)
-                    not_triggered_packages[package] = msg
-                    self.logger.info("\t{}: {}".format(package, msg))
-                    break
+                    return format_msg('this package has already been triggered by the current build cascade', build)
 
                 # don't trigger a build if the package has already been more recently tested than the commit time
                 build_start_time = build['start_time']
@@ -2527,35 +3943,37 @@ class BuildHelper(object):
                     (build['start_time'] is not None and
                         dateutil.parser.parse(build['start_time']) > upstream_build_time and
                         build['status'] not in ['canceled', 'infrastructure_fail', 'not_run']):
-                    already_queued = True
-                    msg = ("don't trigger tests because this package has already been tested since "
-                           "the commit time of the current build cascade\n"
-                           "\t\tbuild: {}\n"
-                           "\t\tbuild time: {}\n"
-                           "\t\tbuild status: {}\n"
-                           "\t\tupstream repo: {}\n"
-                           "\t\tupstream build: {}\n"
-                           "\t\tupstream build time: {}").format(build['build_num'], build['start_time'], build['status'],
-                                                                 upstream_repo_name, upstream_build_num, upstream_build_time_str)
-                    not_triggered_packages[package] = msg
-                    self.logger.info("\t{}: {}".format(package, msg))
-                    break
+                    return format_msg('this package has already been tested since the commit time of the current '
+                                      'build cascade', build)
+        finally:
+            for future in futures:
+                future.cancel()
 
-            if already_queued:
-                continue
+        return None
 
-            # trigger build
-            self.run_circleci_api('/pipeline', version="2", method='post', repo_name=package, data={
-                'branch': branch,
-                'parameters': {
-                    'upstream_repo_name': upstream_repo_name,
-                    'upstream_build_num': int(upstream_build_num),
-                }
-            })
-            triggered_packages.append(package)
-            self.logger.info(("\t{}: trigger tests").format(package))
+    def _get_cascade_ledger_msg(self, package, upstream_repo_name, upstream_build_num, upstream_build_time_str):
+        """ Get the reason why a downstream dependency shouldn't be triggered from :obj:`cascade_ledger`
 
-        return (triggered_packages, not_triggered_packages)
+        Args:
+            package (:obj:`str`): name of the downstream dependency
+            upstream_repo_name (:obj:`str`): name of the repository which triggered the build cascade
+            upstream_build_num (:obj:`str`): number of the build which triggered the build cascade
+            upstream_build_time_str (:obj:`str`): start time of the build which triggered the build cascade
+
+        Returns:
+            :obj:`str`: reason why the package shouldn't be triggered, or :obj:`None` if the ledger doesn't contain
+                the package
+        """
+        trigger = self.cascade_ledger.get(upstream_repo_name, upstream_build_num, package)
+        if trigger is None:
+            return None
+        return ("don't trigger tests because this package has already been triggered by the current build cascade\n"
+                "\t\ttriggered by: {} build {}\n"
+                "\t\ttrigger time: {}\n"
+                "\t\tupstream repo: {}\n"
+                "\t\tupstream build: {}\n"
+                "\t\tupstream build time: {}").format(trigger['repo_name'], trigger['build_num'], trigger['timestamp'],
+                                                      upstream_repo_name, upstream_build_num, upstream_build_time_str)
 
     def get_version(self):
         """ Get the version of this package
@@ -2616,6 +4034,7 @@ class BuildHelper(object):
             sys.stderr.flush()
             sys.exit(1)
 
+    @traced()
     def analyze_package(self, package_name, messages=None, config_filename=None, verbose=False):
         """ Perform static analyses of a package using Pylint.
 
@@ -2669,6 +4088,7 @@ class BuildHelper(object):
             other_opts.append('--verbose')
         return epylint.lint(package_name, msg_opts + report_opts + other_opts)
 
+    @traced()
     def find_missing_requirements(self, package_name, dirname='.'):
         """ Finding missing requirements
 
@@ -2679,10 +4099,6 @@ class BuildHelper(object):
         Returns:
             :obj:`list`: list of missing dependencies and their occurences in the code
         """
-        import pkg_utils
-        # pkg_utils is imported locally so that we can use karr_lab_build_utils to properly calculate its coverage;
-        # :todo: figure out how to fix this
-
         config = self.get_build_config()
         ignore_files = config.get('static_analyses', {}).get('ignore_files', [])
 
@@ -2698,7 +4114,7 @@ class BuildHelper(object):
         missing = pip_check_reqs.find_missing_reqs.find_missing_reqs(options)
 
         # filter out optional dependencies
-        install_requires, extras_require, _, _ = pkg_utils.get_dependencies(
+        install_requires, extras_require, _, _ = self.get_dependencies(
             dirname, include_extras=False, include_specs=False, include_markers=False)
         all_deps = install_requires
         for option, opt_deps in extras_require.items():
@@ -2717,6 +4133,7 @@ class BuildHelper(object):
 
         return missing
 
+    @traced()
     def find_unused_requirements(self, package_name, dirname='.'):
         """ Finding unused_requirements
 
@@ -2727,10 +4144,6 @@ class BuildHelper(object):
         Returns:
             :obj:`list`: name of the unused dependencies
         """
-        import pkg_utils
-        # pkg_utils is imported locally so that we can use karr_lab_build_utils to properly calculate its coverage;
-        # :todo: figure out how to fix this
-
         config = self.get_build_config()
         ignore_files = config.get('static_analyses', {}).get('ignore_files', [])
 
@@ -2745,7 +4158,7 @@ class BuildHelper(object):
         pip_check_reqs.find_extra_reqs.log.setLevel(logging.ERROR)
 
         # get all requirements
-        install_requires, extras_require, _, _ = pkg_utils.get_dependencies(
+        install_requires, extras_require, _, _ = self.get_dependencies(
             dirname, include_extras=False, include_specs=False, include_markers=False)
         all_deps = set(install_requires)
         for option, opt_deps in extras_require.items():
@@ -2774,6 +4187,7 @@ class BuildHelper(object):
 
         return unuseds
 
+    @traced()
     def upload_package_to_pypi(self, dirname='.', repository=None, upload_source=True, upload_build=True):
         """ Upload a package to PyPI
 
@@ -2798,12 +4212,12 @@ class BuildHelper(object):
 
         # package code
         if upload_source:
-            subprocess.check_call([sys.executable, os.path.join(os.path.abspath(dirname), 'setup.py'), 'sdist'],
-                                  cwd=dirname)
+            self._check_call([sys.executable, os.path.join(os.path.abspath(dirname), 'setup.py'), 'sdist'],
+                             cwd=dirname)
 
         if upload_build:
-            subprocess.check_call([sys.executable, os.path.join(os.path.abspath(dirname), 'setup.py'), 'bdist_wheel'],
-                                  cwd=dirname)
+            self._check_call([sys.executable, os.path.join(os.path.abspath(dirname), 'setup.py'), 'bdist_wheel'],
+                             cwd=dirname)
 
         if upload_source or upload_build:
             uploads = [os.path.join(dirname, 'dist', '*')]
@@ -2855,13 +4269,67 @@ class BuildHelper(object):
         if not repo_name:
             repo_name = self.repo_name
 
-        url = '{}/v{}/project/{}/{}/{}{}?circle-token={}'.format(
-            self.CIRCLE_API_ENDPOINT, version, repo_type, repo_owner, repo_name, command, self.circleci_api_token)
-        request_method = getattr(requests, method)
+        url = '{}/v{}/project/{}/{}/{}{}'.format(
+            self.CIRCLE_API_ENDPOINT, version, repo_type, repo_owner, repo_name, command)
 
-        response = request_method(url, json=data)
-        response.raise_for_status()
-        return response.json()
+        with self.tracer.span('{} {}'.format(method.upper(), command), category='http',
+                              attrs={'repo': '{}/{}'.format(repo_owner, repo_name)}):
+            return self.circleci_client.request(method, url, params={'circle-token': self.circleci_api_token},
+                                                data=data)
+
+    def get_circleci_build(self, build_num, repo_type=None, repo_owner=None, repo_name=None):
+        """ Get a CircleCI build
+
+        Finished builds are immutable, so they are saved to :obj:`circleci_build_store` and later retrieved from it
+        without a request to CircleCI.
+
+        Instead of the ``circle_yml`` string of the build, the returned build contains an ``upstream_environment``
+        dictionary of the ``UPSTREAM_REPONAME`` and ``UPSTREAM_BUILD_NUM`` environment variables of its steps.
+
+        Args:
+            build_num (:obj:`int`): build number
+            repo_type (:obj:`str`, optional): repository type (e.g., github)
+            repo_owner (:obj:`str`, optional): repository owner
+            repo_name (:obj:`str`, optional): repository name
+
+        Returns:
+            :obj:`dict`: build
+        """
+        repo = '{}/{}/{}'.format(repo_type or self.repo_type, repo_owner or self.repo_owner, repo_name or self.repo_name)
+        build = self.circleci_build_store.get(repo, build_num)
+        if build is not None:
+            return build
+
+        build = self.run_circleci_api('/' + str(build_num), repo_type=repo_type, repo_owner=repo_owner,
+                                      repo_name=repo_name)
+        build['upstream_environment'] = self._get_circleci_build_upstream_environment(build.pop('circle_yml', None))
+        if build.get('lifecycle', None) == 'finished':
+            self.circleci_build_store.set(repo, build_num, build)
+        return build
+
+    @staticmethod
+    def _get_circleci_build_upstream_environment(circle_yml):
+        """ Get the upstream repository and build which triggered a CircleCI build from its configuration
+
+        Args:
+            circle_yml (:obj:`dict`): ``circle_yml`` of a build
+
+        Returns:
+            :obj:`dict`: values of the ``UPSTREAM_REPONAME`` and ``UPSTREAM_BUILD_NUM`` environment variables of the
+                steps of the build, or an empty dictionary if these variables aren't defined
+        """
+        upstream_env = {}
+        if not circle_yml or not circle_yml.get('string', None):
+            return upstream_env
+        jobs = yaml.load(io.StringIO(circle_yml['string']), Loader=yaml.FullLoader).get('jobs', {})
+        for job in jobs.values():
+            for step in job.get('steps', []):
+                if 'run' in step and isinstance(step['run'], dict):
+                    env = step['run'].get('environment', {})
+                    if 'UPSTREAM_REPONAME' in env:
+                        upstream_env['UPSTREAM_REPONAME'] = env.get('UPSTREAM_REPONAME')
+                        upstream_env['UPSTREAM_BUILD_NUM'] = env.get('UPSTREAM_BUILD_NUM')
+        return upstream_env
 
     def get_build_config(self):
         """ Get build configuration
@@ -2869,9 +4337,37 @@ class BuildHelper(object):
         Returns:
             :obj:`dict`: build configuration
         """
-        with open('.karr_lab_build_utils.yml', 'r') as file:
-            return yaml.load(file, Loader=yaml.FullLoader)
+        def parse():
+            with open('.karr_lab_build_utils.yml', 'r') as file:
+                return yaml.load(file, Loader=yaml.FullLoader)
+
+        return self.file_cache.get(('build_config', os.path.abspath('.karr_lab_build_utils.yml')),
+                                   ['.karr_lab_build_utils.yml'], parse)
+
+    def get_dependencies(self, dirname='.', **kwargs):
+        """ Get the dependencies of a package from its requirements files
+
+        Args:
+            dirname (:obj:`str`, optional): path to package
+            **kwargs: options for :obj:`pkg_utils.get_dependencies`
+
+        Returns:
+            :obj:`tuple`: requirements, extra/optional requirements, test requirements, and documentation
+                requirements
+        """
+        import pkg_utils
+        # pkg_utils is imported locally so that we can use karr_lab_build_utils to properly calculate its coverage;
+        # :todo: figure out how to fix this
+
+        dirname = os.path.abspath(dirname)
+        filenames = [os.path.join(dirname, 'requirements.txt'),
+                     os.path.join(dirname, 'requirements.optional.txt'),
+                     os.path.join(dirname, 'tests', 'requirements.txt'),
+                     os.path.join(dirname, 'docs', 'requirements.txt')]
+        return self.file_cache.get(('dependencies', dirname, tuple(sorted(kwargs.items()))), filenames,
+                                   lambda: pkg_utils.get_dependencies(dirname, **kwargs))
 
+    @traced()
     def download_package_config_files(self):
         """ Download the configuration repository 
 
@@ -2922,12 +4418,31 @@ class BuildHelper(object):
 class TestResults(object):
     """ Unit test results
 
+    In addition to the list of test case results, the results are stored in columns (type, duration, file, class
+    name, Python version) so that the numbers of passed, skipped, errored, and failed tests can be maintained
+    incrementally and so that the results can be grouped without iterating over :obj:`TestCaseResult` objects.
+
     Attributes:
-        cases (:obj:`list` of :obj:`TestCase`): test case results
+        cases (:obj:`list` of :obj:`TestCaseResult`): test case results
+        GROUP_BY_ATTRIBUTES (:obj:`tuple` of :obj:`str`): attributes which results can be grouped by
     """
 
+    GROUP_BY_ATTRIBUTES = ('type', 'filename', 'classname', 'python_version')
+
     def __init__(self):
-        self.cases = []
+        self._cases = []
+        self._type_counts = [0] * len(TestCaseResultType)
+        self._columns = {
+            'type': [],
+            'filename': [],
+            'classname': [],
+            'python_version': [],
+            'time': array.array('d'),
+        }
+
+    @property
+    def cases(self):
+        return self._cases
 
     @property
     def num_tests(self):
@@ -2949,13 +4464,44 @@ class TestResults(object):
     def num_failures(self):
         return self.get_num_failures()
 
+    def add_case(self, case):
+        """ Add the result of a test case
+
+        Args:
+            case (:obj:`TestCaseResult`): result of a test case
+        """
+        # intern repeated strings so that cases from the same class, file, and Python version share memory
+        if case.classname is not None:
+            case.classname = sys.intern(case.classname)
+        if case.filename is not None:
+            case.filename = sys.intern(case.filename)
+        if case.python_version is not None:
+            case.python_version = sys.intern(case.python_version)
+
+        self._cases.append(case)
+        self._type_counts[case.type.value] += 1
+        self._columns['type'].append(case.type)
+        self._columns['filename'].append(case.filename)
+        self._columns['classname'].append(case.classname)
+        self._columns['python_version'].append(case.python_version)
+        self._columns['time'].append(case.time or 0.)
+
+    def add_cases(self, cases):
+        """ Add the results of several test cases
+
+        Args:
+            cases (:obj:`list` of :obj:`TestCaseResult`): results of test cases
+        """
+        for case in cases:
+            self.add_case(case)
+
     def get_num_tests(self):
         """ Get the number of tests
 
         Returns:
             :obj:`int`: number of tests
         """
-        return len(self.cases)
+        return len(self._cases)
 
     def get_num_passed(self):
         """ Get the number of tests that passed
@@ -2963,7 +4509,7 @@ class TestResults(object):
         Returns:
             :obj:`int`: number of tests that passed
         """
-        return len(list(filter(lambda case: case.type == TestCaseResultType.passed, self.cases)))
+        return self._type_counts[TestCaseResultType.passed.value]
 
     def get_num_skipped(self):
         """ Get the number of skipped tests
@@ -2971,7 +4517,7 @@ class TestResults(object):
         Returns:
             :obj:`int`: number of skipped tests
         """
-        return len(list(filter(lambda case: case.type == TestCaseResultType.skipped, self.cases)))
+        return self._type_counts[TestCaseResultType.skipped.value]
 
     def get_num_errors(self):
         """ Get the number of tests with errors
@@ -2979,7 +4525,7 @@ class TestResults(object):
         Returns:
             :obj:`int`: number of tests with errors
         """
-        return len(list(filter(lambda case: case.type == TestCaseResultType.error, self.cases)))
+        return self._type_counts[TestCaseResultType.error.value]
 
     def get_num_failures(self):
         """ Get the number of tests with failures
@@ -2987,48 +4533,2507 @@ class TestResults(object):
         Returns:
             :obj:`int`: number of tests with failures
         """
-        return len(list(filter(lambda case: case.type == TestCaseResultType.failure, self.cases)))
+        return self._type_counts[TestCaseResultType.failure.value]
 
+    def get_total_time(self):
+        """ Get the total duration of the tests
 
-class TestCaseResult(object):
-    """ The result of a test case
+        Returns:
+            :obj:`float`: total duration of the tests in seconds
+        """
+        return sum(self._columns['time'])
 
-    Attributes:
-        classname (:obj:`str`): name of the class of the test case
-        name (:obj:`str`): name of the test case
-        filename (:obj:`str`): file where the test was defined
-        line (:obj:`int`): line where the test was defined
-        python_version (:obj:`str`): python version which ran the test
-        type (:obj:`TestCaseResultType`): type of the result (pass, skip, error, failure)
-        subtype (:obj:`str`): detailed type of the result
-        message (:obj:`str`): message from the result
-        details (:obj:`str`): detailed message from the result
-        time (:obj:`float`): duration of the time in seconds
-        stdout (:obj:`str`): standard output
-        stderr (:obj:`str`): standard error
-    """
+    def group_by(self, *attributes):
+        """ Count the test cases grouped by one or more attributes
 
-    def __init__(self):
-        self.classname = None
-        self.name = None
-        self.filename = None
-        self.line = None
-        self.python_version = None
-        self.time = None
-        self.stdout = None
-        self.stderr = None
-        self.type = None
-        self.subtype = None
-        self.message = None
-        self.details = None
+        Args:
+            *attributes (:obj:`str`): attributes to group by (:obj:`GROUP_BY_ATTRIBUTES`)
 
+        Returns:
+            :obj:`collections.Counter`: dictionary which maps each value of the attribute (or tuple of values of the
+                attributes if multiple attributes are given) to the number of test cases with the value
+        """
+        return collections.Counter(self._get_group_keys(attributes))
 
-class TestCaseResultType(enum.Enum):
-    """ Type of test case result """
-    passed = 0
-    skipped = 1
-    error = 2
-    failure = 3
+    def get_time_by(self, *attributes):
+        """ Sum the durations of the test cases grouped by one or more attributes
+
+        Args:
+            *attributes (:obj:`str`): attributes to group by (:obj:`GROUP_BY_ATTRIBUTES`)
+
+        Returns:
+            :obj:`dict`: dictionary which maps each value of the attribute (or tuple of values of the
+                attributes if multiple attributes are given) to the total duration of the test cases with the value
+        """
+        times = collections.defaultdict(float)
+        for key, case_time in zip(self._get_group_keys(attributes), self._columns['time']):
+            times[key] += case_time
+        return dict(times)
+
+    def diff(self, prev_test_results):
+        """ Get the differences between these results and the results of a previous build
+
+        Args:
+            prev_test_results (:obj:`TestResults`): results of the previous build
+
+        Returns:
+            :obj:`TestResultsDiff`: differences between the results
+        """
+        return TestResultsDiff(prev_test_results, self)
+
+    def _get_group_keys(self, attributes):
+        """ Get an iterator over the group keys of the test cases
+
+        Args:
+            attributes (:obj:`tuple` of :obj:`str`): attributes to group by
+
+        Returns:
+            :obj:`iterator`: iterator over the values of the attribute (or tuples of values of the attributes
+                if multiple attributes are given) of each test case
+
+        Raises:
+            :obj:`BuildHelperError`: if no attributes are given or an attribute cannot be grouped by
+        """
+        if not attributes:
+            raise BuildHelperError('At least one attribute must be given to group test results')
+        for attribute in attributes:
+            if attribute not in self.GROUP_BY_ATTRIBUTES:
+                raise BuildHelperError('Test results cannot be grouped by {}'.format(attribute))
+
+        columns = [self._columns[attribute] for attribute in attributes]
+        if len(columns) == 1:
+            return iter(columns[0])
+        return zip(*columns)
+
+
+class TestResultsDiff(object):
+    """ Differences between the test results of two builds
+
+    Test cases are matched by their file, class name, name, and Python version.
+
+    Attributes:
+        new_failures (:obj:`list` of :obj:`TestCaseResult`): current results of test cases which passed or were skipped
+            in the previous build, but which have errors or failures in the current build
+        old_failures (:obj:`list` of :obj:`TestCaseResult`): current results of test cases which have errors or
+            failures in both builds
+        fixed (:obj:`list` of :obj:`TestCaseResult`): current results of test cases which had errors or failures in the
+            previous build, but which passed in the current build
+        added (:obj:`list` of :obj:`TestCaseResult`): current results of test cases which weren't run in the previous
+            build
+        removed (:obj:`list` of :obj:`TestCaseResult`): previous results of test cases which weren't run in the
+            current build
+        num_prev_failing (:obj:`int`): number of test cases which had errors or failures in the previous build
+    """
+
+    def __init__(self, prev_test_results, test_results):
+        """
+        Args:
+            prev_test_results (:obj:`TestResults`): results of the previous build
+            test_results (:obj:`TestResults`): results of the current build
+        """
+        self.new_failures = []
+        self.old_failures = []
+        self.fixed = []
+        self.added = []
+        self.removed = []
+        self.num_prev_failing = prev_test_results.get_num_errors() + prev_test_results.get_num_failures()
+
+        prev_cases = {case.key: case for case in prev_test_results.cases}
+        for case in test_results.cases:
+            prev_case = prev_cases.pop(case.key, None)
+            if prev_case is None:
+                self.added.append(case)
+            elif case.is_failing:
+                if prev_case.is_failing:
+                    self.old_failures.append(case)
+                else:
+                    self.new_failures.append(case)
+            elif prev_case.is_failing and case.type == TestCaseResultType.passed:
+                self.fixed.append(case)
+        self.removed = list(prev_cases.values())
+
+    @property
+    def newly_failing(self):
+        """ Get the current results of test cases which newly have errors or failures, including added test cases
+
+        Returns:
+            :obj:`list` of :obj:`TestCaseResult`: current results of newly failing test cases
+        """
+        return self.new_failures + [case for case in self.added if case.is_failing]
+
+    def get_num_new_failing(self):
+        """ Get the number of test cases which newly have errors or failures, including added test cases
+
+        Returns:
+            :obj:`int`: number of newly failing test cases
+        """
+        return len(self.newly_failing)
+
+
+class TestCaseResult(object):
+    """ The result of a test case
+
+    Attributes:
+        classname (:obj:`str`): name of the class of the test case
+        name (:obj:`str`): name of the test case
+        filename (:obj:`str`): file where the test was defined
+        line (:obj:`int`): line where the test was defined
+        python_version (:obj:`str`): python version which ran the test
+        type (:obj:`TestCaseResultType`): type of the result (pass, skip, error, failure)
+        subtype (:obj:`str`): detailed type of the result
+        message (:obj:`str`): message from the result
+        details (:obj:`str`): detailed message from the result
+        time (:obj:`float`): duration of the time in seconds
+        stdout (:obj:`str`): standard output
+        stderr (:obj:`str`): standard error
+    """
+
+    __slots__ = ('classname', 'name', 'filename', 'line', 'python_version', 'time',
+                 '_stdout', '_stderr', 'type', 'subtype', 'message', '_details')
+
+    def __init__(self):
+        self.classname = None
+        self.name = None
+        self.filename = None
+        self.line = None
+        self.python_version = None
+        self.time = None
+        self.stdout = None
+        self.stderr = None
+        self.type = None
+        self.subtype = None
+        self.message = None
+        self.details = None
+
+    @property
+    def key(self):
+        """ Get a key which identifies the test case across builds
+
+        Returns:
+            :obj:`tuple` of :obj:`str`: file, class name, name, and Python version of the test case
+        """
+        return (self.filename or '', self.classname or '', self.name or '', self.python_version or '')
+
+    @property
+    def is_failing(self):
+        return self.type in (TestCaseResultType.error, TestCaseResultType.failure)
+
+    @property
+    def stdout(self):
+        return self._get_text(self._stdout)
+
+    @stdout.setter
+    def stdout(self, value):
+        self._stdout = value
+
+    @property
+    def stderr(self):
+        return self._get_text(self._stderr)
+
+    @stderr.setter
+    def stderr(self, value):
+        self._stderr = value
+
+    @property
+    def details(self):
+        return self._get_text(self._details)
+
+    @details.setter
+    def details(self, value):
+        self._details = value
+
+    def _to_record(self):
+        """ Get a compact tuple representation of the result for caching
+
+        References to captured texts are stored as their byte offsets; the path and encoding of their file are
+        stored once per file by the cache.
+
+        Returns:
+            :obj:`tuple`: compact representation of the result
+        """
+        texts = []
+        for text in (self._stdout, self._stderr, self._details):
+            if isinstance(text, XmlText):
+                text = (text.start, text.end)
+            texts.append(text)
+
+        return (self.classname, self.name, self.filename, self.line, self.time,
+                self.type.value, self.subtype, self.message) + tuple(texts)
+
+    @classmethod
+    def _from_record(cls, record, python_version, xml_filename, encoding):
+        """ Create a result from its compact tuple representation
+
+        Args:
+            record (:obj:`tuple`): compact representation of the result
+            python_version (:obj:`str`): python version which ran the test
+            xml_filename (:obj:`str`): path to the XML file which contains the captured texts of the result
+            encoding (:obj:`str`): encoding of the XML file
+
+        Returns:
+            :obj:`TestCaseResult`: result
+        """
+        case = cls()
+        (case.classname, case.name, case.filename, case.line, case.time,
+         type, case.subtype, case.message, stdout, stderr, details) = record
+        case.python_version = python_version
+        case.type = TestCaseResultType(type)
+
+        texts = []
+        for text in (stdout, stderr, details):
+            if isinstance(text, tuple):
+                text = XmlText(xml_filename, text[0], text[1], encoding)
+            texts.append(text)
+        case.stdout, case.stderr, case.details = texts
+
+        return case
+
+    @staticmethod
+    def _get_text(value):
+        """ Get the value of a text attribute, decoding it from its source file if necessary
+
+        Args:
+            value (:obj:`str` or :obj:`XmlText`): value or reference to the value
+
+        Returns:
+            :obj:`str`: value
+        """
+        if isinstance(value, XmlText):
+            return value.read()
+        return value
+
+
+class XmlText(object):
+    """ Reference to the text content of an XML element, which is decoded on demand by memory-mapping the XML file
+
+    Attributes:
+        filename (:obj:`str`): path to the XML file
+        start (:obj:`int`): byte offset of the start of the content of the element
+        end (:obj:`int`): byte offset of the end of the content of the element
+        encoding (:obj:`str`): encoding of the XML file
+    """
+
+    __slots__ = ('filename', 'start', 'end', 'encoding')
+
+    def __init__(self, filename, start, end, encoding='utf-8'):
+        """
+        Args:
+            filename (:obj:`str`): path to the XML file
+            start (:obj:`int`): byte offset of the start of the content of the element
+            end (:obj:`int`): byte offset of the end of the content of the element
+            encoding (:obj:`str`, optional): encoding of the XML file
+        """
+        self.filename = filename
+        self.start = start
+        self.end = end
+        self.encoding = encoding
+
+    def read(self):
+        """ Decode the text
+
+        Returns:
+            :obj:`str`: text with entities and CDATA sections resolved
+        """
+        with open(self.filename, 'rb') as file:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                raw = data[self.start:self.end]
+
+        chunks = []
+        parser = xml.parsers.expat.ParserCreate()
+        parser.CharacterDataHandler = chunks.append
+        parser.Parse('<?xml version="1.0" encoding="{}"?><text>'.format(self.encoding).encode(), False)
+        parser.Parse(raw, False)
+        parser.Parse(b'</text>', True)
+        return ''.join(chunks)
+
+
+class TestCaseResultType(enum.Enum):
+    """ Type of test case result """
+    passed = 0
+    skipped = 1
+    error = 2
+    failure = 3
+
+
+class TestHistory(object):
+    """ Local SQLite database of the history of test results
+
+    The database stores the status, duration, and Python version of each test case in each build, along with the
+    commit and number of each build. The results are indexed by test case so that the time series of each test
+    case can be queried efficiently.
+
+    Attributes:
+        filename (:obj:`str`): path to the database
+        connection (:obj:`sqlite3.Connection`): connection to the database
+    """
+
+    SCHEMA = (
+        """CREATE TABLE IF NOT EXISTS builds (
+            id INTEGER PRIMARY KEY,
+            repo_name TEXT NOT NULL,
+            build_num INTEGER NOT NULL,
+            repo_branch TEXT,
+            repo_revision TEXT,
+            timestamp TEXT,
+            UNIQUE (repo_name, build_num)
+        )""",
+        """CREATE TABLE IF NOT EXISTS tests (
+            id INTEGER PRIMARY KEY,
+            repo_name TEXT NOT NULL,
+            filename TEXT NOT NULL,
+            classname TEXT NOT NULL,
+            name TEXT NOT NULL,
+            UNIQUE (repo_name, classname, name, filename)
+        )""",
+        """CREATE TABLE IF NOT EXISTS results (
+            test_id INTEGER NOT NULL REFERENCES tests (id),
+            python_version TEXT NOT NULL,
+            build_num INTEGER NOT NULL,
+            build_id INTEGER NOT NULL REFERENCES builds (id),
+            type INTEGER NOT NULL,
+            time REAL,
+            subtype TEXT,
+            message TEXT,
+            PRIMARY KEY (test_id, python_version, build_num)
+        ) WITHOUT ROWID""",
+        """CREATE INDEX IF NOT EXISTS results_build ON results (build_id)""",
+    )
+
+    def __init__(self, filename):
+        """
+        Args:
+            filename (:obj:`str`): path to the database
+        """
+        self.filename = filename
+        dirname = os.path.dirname(filename)
+        if dirname and not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        self.connection = sqlite3.connect(filename)
+        with self.connection:
+            for statement in self.SCHEMA:
+                self.connection.execute(statement)
+
+    def close(self):
+        """ Close the connection to the database """
+        self.connection.close()
+
+    def add_results(self, test_results, repo_name, build_num, repo_branch=None, repo_revision=None, timestamp=None):
+        """ Add the test results of a build to the database
+
+        If results for the build have already been added, they are replaced.
+
+        Args:
+            test_results (:obj:`TestResults`): test results
+            repo_name (:obj:`str`): repository name
+            build_num (:obj:`int`): build number
+            repo_branch (:obj:`str`, optional): repository branch name
+            repo_revision (:obj:`str`, optional): sha of repository revision
+            timestamp (:obj:`datetime`, optional): time of the build; defaults to now
+        """
+        timestamp = (timestamp or datetime.now()).isoformat()
+
+        with self.connection:
+            cursor = self.connection.cursor()
+            cursor.execute('INSERT OR IGNORE INTO builds (repo_name, build_num) VALUES (?, ?)', (repo_name, build_num))
+            cursor.execute('UPDATE builds SET repo_branch = ?, repo_revision = ?, timestamp = ? '
+                           'WHERE repo_name = ? AND build_num = ?',
+                           (repo_branch, repo_revision, timestamp, repo_name, build_num))
+            build_id = cursor.execute('SELECT id FROM builds WHERE repo_name = ? AND build_num = ?',
+                                      (repo_name, build_num)).fetchone()[0]
+            cursor.execute('DELETE FROM results WHERE build_id = ?', (build_id, ))
+
+            test_keys = set((case.filename or '', case.classname or '', case.name or '') for case in test_results.cases)
+            cursor.executemany('INSERT OR IGNORE INTO tests (repo_name, filename, classname, name) VALUES (?, ?, ?, ?)',
+                               ((repo_name, ) + test_key for test_key in test_keys))
+            test_ids = {}
+            for test_id, filename, classname, name in cursor.execute(
+                    'SELECT id, filename, classname, name FROM tests WHERE repo_name = ?', (repo_name, )):
+                test_ids[(filename, classname, name)] = test_id
+
+            cursor.executemany(
+                'INSERT OR REPLACE INTO results '
+                '(test_id, python_version, build_num, build_id, type, time, subtype, message) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                ((test_ids[(case.filename or '', case.classname or '', case.name or '')],
+                  case.python_version or '', build_num, build_id,
+                  case.type.value, case.time, case.subtype, case.message)
+                 for case in test_results.cases))
+
+    def get_builds(self, repo_name):
+        """ Get the builds of a repository in the database
+
+        Args:
+            repo_name (:obj:`str`): repository name
+
+        Returns:
+            :obj:`list` of :obj:`tuple`: build number, branch, revision, and timestamp of each build
+        """
+        return self.connection.execute(
+            'SELECT build_num, repo_branch, repo_revision, timestamp FROM builds '
+            'WHERE repo_name = ? ORDER BY build_num', (repo_name, )).fetchall()
+
+    def get_previous_build_num(self, repo_name, build_num):
+        """ Get the number of the latest build of a repository in the database before a build
+
+        Args:
+            repo_name (:obj:`str`): repository name
+            build_num (:obj:`int`): build number
+
+        Returns:
+            :obj:`int`: number of the previous build, or :obj:`None` if the database doesn't contain an earlier build
+        """
+        return self.connection.execute(
+            'SELECT MAX(build_num) FROM builds WHERE repo_name = ? AND build_num < ?',
+            (repo_name, build_num)).fetchone()[0]
+
+    def get_test_results(self, repo_name, build_num):
+        """ Get the test results of a build
+
+        Args:
+            repo_name (:obj:`str`): repository name
+            build_num (:obj:`int`): build number
+
+        Returns:
+            :obj:`TestResults`: test results
+        """
+        test_results = TestResults()
+        for filename, classname, name, python_version, type, duration, subtype, message in self.connection.execute(
+                'SELECT tests.filename, tests.classname, tests.name, results.python_version, '
+                'results.type, results.time, results.subtype, results.message '
+                'FROM tests INNER JOIN results ON results.test_id = tests.id '
+                'WHERE tests.repo_name = ? AND results.build_num = ?', (repo_name, build_num)):
+            case = TestCaseResult()
+            case.filename = filename or None
+            case.classname = classname
+            case.name = name
+            case.python_version = python_version
+            case.type = TestCaseResultType(type)
+            case.time = duration
+            case.subtype = subtype
+            case.message = message
+            test_results.add_case(case)
+        return test_results
+
+    def get_test_time_series(self, repo_name, classname, name, python_version=None):
+        """ Get the time series of the results of a test case
+
+        Args:
+            repo_name (:obj:`str`): repository name
+            classname (:obj:`str`): name of the class of the test case
+            name (:obj:`str`): name of the test case
+            python_version (:obj:`str`, optional): Python version; if :obj:`None`, get the results for all
+                Python versions
+
+        Returns:
+            :obj:`list` of :obj:`tuple`: build number, Python version, type (:obj:`TestCaseResultType`), and duration
+                of each result, ordered by build number
+        """
+        query = ('SELECT results.build_num, results.python_version, results.type, results.time '
+                 'FROM tests INNER JOIN results ON results.test_id = tests.id '
+                 'WHERE tests.repo_name = ? AND tests.classname = ? AND tests.name = ?')
+        args = [repo_name, classname, name]
+        if python_version is not None:
+            query += ' AND results.python_version = ?'
+            args.append(python_version)
+        query += ' ORDER BY results.build_num, results.python_version'
+
+        return [(build_num, py_v, TestCaseResultType(type), time)
+                for build_num, py_v, type, time in self.connection.execute(query, args)]
+
+    def get_duration_trend(self, repo_name, classname, name, python_version=None):
+        """ Get the trend of the duration of a test case
+
+        Args:
+            repo_name (:obj:`str`): repository name
+            classname (:obj:`str`): name of the class of the test case
+            name (:obj:`str`): name of the test case
+            python_version (:obj:`str`, optional): Python version; if :obj:`None`, get the durations for all
+                Python versions
+
+        Returns:
+            :obj:`list` of :obj:`tuple`: build number, Python version, and duration of each non-skipped result
+        """
+        return [(build_num, py_v, time)
+                for build_num, py_v, type, time in self.get_test_time_series(
+                    repo_name, classname, name, python_version=python_version)
+                if type != TestCaseResultType.skipped]
+
+    def get_first_failing_build(self, repo_name, classname, name, python_version=None):
+        """ Get the first build of the latest sequence of failing builds of a test case
+
+        Args:
+            repo_name (:obj:`str`): repository name
+            classname (:obj:`str`): name of the class of the test case
+            name (:obj:`str`): name of the test case
+            python_version (:obj:`str`, optional): Python version; if :obj:`None`, a build is considered
+                failing if the test case failed for any Python version
+
+        Returns:
+            :obj:`int`: number of the first build of the latest sequence of failing builds, or :obj:`None` if the
+                test case passed in its latest build
+        """
+        failing = collections.OrderedDict()
+        for build_num, _, type, _ in self.get_test_time_series(repo_name, classname, name, python_version=python_version):
+            if type == TestCaseResultType.skipped:
+                continue
+            failing[build_num] = failing.get(build_num, False) or type in (TestCaseResultType.error,
+                                                                            TestCaseResultType.failure)
+
+        first_failing_build_num = None
+        for build_num, is_failing in failing.items():
+            if is_failing:
+                if first_failing_build_num is None:
+                    first_failing_build_num = build_num
+            else:
+                first_failing_build_num = None
+        return first_failing_build_num
+
+    def get_flake_rates(self, repo_name, min_builds=2):
+        """ Get the flake rate of each test case of a repository
+
+        The flake rate is the fraction of successive non-skipped runs of a test case (for the same Python version)
+        whose outcomes (passing or not passing) differ.
+
+        Args:
+            repo_name (:obj:`str`): repository name
+            min_builds (:obj:`int`, optional): minimum number of non-skipped runs of a test case to calculate its
+                flake rate
+
+        Returns:
+            :obj:`list` of :obj:`tuple`: class name, name, Python version, number of runs, and flake rate of each
+                test case with at least one change in outcome, sorted in descending order of flake rate
+        """
+        rows = self.connection.execute(
+            'SELECT tests.classname, tests.name, results.python_version, results.type '
+            'FROM tests INNER JOIN results ON results.test_id = tests.id '
+            'WHERE tests.repo_name = ? AND results.type != ? '
+            'ORDER BY results.test_id, results.python_version, results.build_num',
+            (repo_name, TestCaseResultType.skipped.value))
+
+        flake_rates = []
+        for key, results in itertools.groupby(rows, key=lambda row: row[0:3]):
+            outcomes = [row[3] == TestCaseResultType.passed.value for row in results]
+            if len(outcomes) < max(min_builds, 2):
+                continue
+            n_flips = sum(outcome != next_outcome for outcome, next_outcome in zip(outcomes[:-1], outcomes[1:]))
+            if n_flips:
+                flake_rates.append(key + (len(outcomes), n_flips / (len(outcomes) - 1)))
+
+        flake_rates.sort(key=lambda flake_rate: (-flake_rate[4], flake_rate[0:3]))
+        return flake_rates
+
+
+class CoverageModel(object):
+    """ In-memory model of combined coverage data and the source files that it covers
+
+    The coverage data and the source files are read and analyzed once. The model can then be exported to each of
+    the formats needed by the coverage reporters (Coveralls JSON, Cobertura XML, LCOV) and summarized without
+    re-reading the data or the source files.
+
+    Attributes:
+        files (:obj:`list` of :obj:`FileCoverage`): coverage of each source file
+        has_branches (:obj:`bool`): :obj:`True` if the data includes branch coverage
+        root_dirname (:obj:`str`): directory that the names of the source files are relative to
+    """
+
+    def __init__(self, files=None, has_branches=False, root_dirname=None):
+        """
+        Args:
+            files (:obj:`list` of :obj:`FileCoverage`, optional): coverage of each source file
+            has_branches (:obj:`bool`, optional): :obj:`True` if the data includes branch coverage
+            root_dirname (:obj:`str`, optional): directory that the names of the source files are relative to
+        """
+        self.files = files or []
+        self.has_branches = has_branches
+        self.root_dirname = root_dirname or os.getcwd()
+
+    @classmethod
+    def load(cls, data_filename, filenames=None):
+        """ Load a coverage data file and analyze the source files that it covers
+
+        Files which are omitted by the ``[report]`` section of the coverage configuration are excluded, as are
+        files whose source cannot be found.
+
+        Args:
+            data_filename (:obj:`str`): path to the coverage data file
+            filenames (:obj:`collections.abc.Iterable` of :obj:`str`, optional): absolute paths of the files to
+                analyze; if :obj:`None`, analyze all of the measured files
+
+        Returns:
+            :obj:`CoverageModel`: coverage model
+        """
+        cov = coverage.Coverage(data_file=data_filename)
+        cov.load()
+        data = cov.get_data()
+        has_branches = data.has_arcs()
+
+        measured_files = data.measured_files()
+        if filenames is not None:
+            measured_files = set(measured_files).intersection(filenames)
+
+        files = []
+        for abs_filename in sorted(measured_files):
+            try:
+                _, statements, excluded, missing, _ = cov.analysis2(abs_filename)
+                file_reporter = coverage.python.PythonFileReporter(abs_filename, coverage=cov)
+                source = file_reporter.source()
+                if has_branches:
+                    branch_exits = cls._get_branch_exits(file_reporter, data.arcs(abs_filename) or [], set(excluded))
+                else:
+                    branch_exits = {}
+            except coverage.CoverageException as exception:
+                warnings.warn('Unable to analyze the coverage of {}: {}'.format(abs_filename, str(exception)), UserWarning)
+                continue
+
+            file_coverage = FileCoverage()
+            file_coverage.filename = file_reporter.relative_filename()
+            file_coverage.abs_filename = abs_filename
+            file_coverage.source = source
+            file_coverage.statements = sorted(statements)
+            file_coverage.missing = set(missing)
+            file_coverage.branch_exits = branch_exits
+            file_coverage.branches = {line: (len(exits), sum(taken for _, taken in exits))
+                                      for line, exits in branch_exits.items()}
+            file_coverage.missing_branches = {line: [dest for dest, taken in exits if not taken]
+                                              for line, exits in branch_exits.items()
+                                              if not all(taken for _, taken in exits)}
+            files.append(file_coverage)
+
+        model = cls(files=files, has_branches=has_branches)
+        return model.omit(cov.config.report_omit or [])
+
+    @staticmethod
+    def _get_branch_exits(file_reporter, executed_arcs, excluded):
+        """ Get the exits of each branch of a file, and whether each exit was taken
+
+        The branches and exits are determined in the same way as by coverage: a branch is a line with multiple
+        possible exits to non-excluded lines, and an exit is considered taken if its arc was executed or if its line
+        is marked as not a branch.
+
+        Args:
+            file_reporter (:obj:`coverage.python.PythonFileReporter`): reporter for the file
+            executed_arcs (:obj:`list` of :obj:`tuple` of :obj:`int`): arcs which were executed
+            excluded (:obj:`set` of :obj:`int`): line numbers which are excluded from coverage
+
+        Returns:
+            :obj:`dict`: dictionary which maps the line number of each branch to a list of tuples of the line number
+                of each of its exits (sorted by line number) and whether the exit was taken
+        """
+        possible_dests = collections.defaultdict(set)
+        for from_line, to_line in file_reporter.arcs():
+            if to_line not in excluded:
+                possible_dests[from_line].add(to_line)
+
+        # some tracers record arcs from a line to itself for lines with a single possible exit
+        executed = set()
+        for from_line, to_line in executed_arcs:
+            if from_line != to_line:
+                executed.add((from_line, to_line))
+            elif len(possible_dests[from_line]) == 1:
+                executed.add((from_line, next(iter(possible_dests[from_line]))))
+
+        no_branch_lines = file_reporter.no_branch_lines()
+        branch_exits = {}
+        for line, n_exits in file_reporter.exit_counts().items():
+            if n_exits > 1:
+                branch_exits[line] = [(dest, (line, dest) in executed or line in no_branch_lines)
+                                      for dest in sorted(possible_dests[line])]
+        return branch_exits
+
+    def omit(self, patterns):
+        """ Get a model without the files which match one or more patterns
+
+        Args:
+            patterns (:obj:`list` of :obj:`str`): file name patterns (relative patterns are interpreted
+                relative to the current directory, as by coverage)
+
+        Returns:
+            :obj:`CoverageModel`: model without the matching files
+        """
+        if not patterns:
+            return self
+
+        abs_patterns = []
+        for pattern in patterns:
+            if not pattern.startswith('*'):
+                pattern = os.path.abspath(pattern)
+            abs_patterns.append(pattern)
+
+        files = [file for file in self.files
+                 if not any(fnmatch.fnmatch(file.abs_filename, pattern) for pattern in abs_patterns)]
+        return self.__class__(files=files, has_branches=self.has_branches, root_dirname=self.root_dirname)
+
+    def get_summary(self):
+        """ Get summary statistics of the coverage
+
+        Returns:
+            :obj:`dict`: numbers of files, statements, missing statements, branches, and missing branches, and the
+                percentages of statements, branches, and statements and branches that are covered
+        """
+        n_statements = sum(len(file.statements) for file in self.files)
+        n_missing = sum(len(file.missing) for file in self.files)
+        n_branches = sum(file.get_num_branches() for file in self.files)
+        n_missing_branches = sum(file.get_num_missing_branches() for file in self.files)
+
+        return {
+            'n_files': len(self.files),
+            'n_statements': n_statements,
+            'n_missing': n_missing,
+            'n_branches': n_branches,
+            'n_missing_branches': n_missing_branches,
+            'statement_coverage': self._get_percent(n_statements - n_missing, n_statements),
+            'branch_coverage': self._get_percent(n_branches - n_missing_branches, n_branches),
+            'coverage': self._get_percent(n_statements - n_missing + n_branches - n_missing_branches,
+                                          n_statements + n_branches),
+        }
+
+    def to_coveralls(self):
+        """ Get the source file coverages in the format of the Coveralls API
+
+        Returns:
+            :obj:`list` of :obj:`dict`: coverage of each source file
+        """
+        source_files = []
+        for file in self.files:
+            source_file = {
+                'name': file.filename,
+                'source_digest': hashlib.md5(file.source.encode('utf-8')).hexdigest(),
+                'coverage': file.get_line_hits(),
+            }
+            if self.has_branches:
+                branches = []
+                for line, i_branch, hits in file.get_branch_hits():
+                    branches.extend([line, 0, i_branch, hits])
+                source_file['branches'] = branches
+            source_files.append(source_file)
+        return source_files
+
+    def to_code_climate(self, head=None, branch=None, committed_at=0, reporter_version=None):
+        """ Get the coverage in the format of the Code Climate test reporter
+
+        Args:
+            head (:obj:`str`, optional): SHA of the Git commit
+            branch (:obj:`str`, optional): Git branch
+            committed_at (:obj:`int`, optional): time that the commit was made (Unix time)
+            reporter_version (:obj:`str`, optional): version of the Code Climate test reporter
+
+        Returns:
+            :obj:`dict`: Code Climate coverage payload
+        """
+        source_files = []
+        n_covered = 0
+        n_missed = 0
+        for file in self.files:
+            source = file.source.encode('utf-8')
+            file_n_covered = len(file.statements) - len(file.missing)
+            file_n_missed = len(file.missing)
+            source_files.append({
+                'name': file.filename,
+                'blob_id': hashlib.sha1(b'blob ' + str(len(source)).encode() + b'\0' + source).hexdigest(),
+                'coverage': json.dumps(file.get_line_hits()),
+                'covered_percent': self._get_percent(file_n_covered, len(file.statements)),
+                'covered_strength': self._get_rate_value(file_n_covered, len(file.statements)),
+                'line_counts': {'covered': file_n_covered, 'missed': file_n_missed, 'total': len(file.statements)},
+            })
+            n_covered += file_n_covered
+            n_missed += file_n_missed
+
+        return {
+            'source_files': source_files,
+            'line_counts': {'covered': n_covered, 'missed': n_missed, 'total': n_covered + n_missed},
+            'covered_percent': self._get_percent(n_covered, n_covered + n_missed),
+            'covered_strength': self._get_rate_value(n_covered, n_covered + n_missed),
+            'git': {'branch': branch, 'committed_at': committed_at, 'head': head},
+            'environment': {'pwd': self.root_dirname, 'reporter_version': reporter_version},
+        }
+
+    def to_lcov(self):
+        """ Get the coverage in LCOV format
+
+        Returns:
+            :obj:`str`: coverage in LCOV format
+        """
+        lines = []
+        for file in self.files:
+            lines.append('TN:')
+            lines.append('SF:{}'.format(file.abs_filename))
+            for line in file.statements:
+                lines.append('DA:{},{:d}'.format(line, line not in file.missing))
+            for line, i_branch, hits in file.get_branch_hits():
+                lines.append('BRDA:{},0,{},{}'.format(line, i_branch, hits))
+            if self.has_branches:
+                lines.append('BRF:{}'.format(file.get_num_branches()))
+                lines.append('BRH:{}'.format(file.get_num_branches() - file.get_num_missing_branches()))
+            lines.append('LF:{}'.format(len(file.statements)))
+            lines.append('LH:{}'.format(len(file.statements) - len(file.missing)))
+            lines.append('end_of_record')
+        return '\n'.join(lines) + '\n'
+
+    def write_lcov(self, filename):
+        """ Write the coverage to an LCOV file
+
+        Args:
+            filename (:obj:`str`): path to save the coverage
+        """
+        with open(filename, 'w') as file:
+            file.write(self.to_lcov())
+
+    def to_cobertura_xml(self):
+        """ Get the coverage in Cobertura XML format
+
+        Returns:
+            :obj:`xml.etree.ElementTree.ElementTree`: coverage in Cobertura XML format
+        """
+        summary = self.get_summary()
+        root = xml.etree.ElementTree.Element('coverage', {
+            'version': coverage.__version__,
+            'timestamp': str(int(time.time() * 1000)),
+            'lines-valid': str(summary['n_statements']),
+            'lines-covered': str(summary['n_statements'] - summary['n_missing']),
+            'line-rate': self._get_rate(summary['n_statements'] - summary['n_missing'], summary['n_statements']),
+            'branches-valid': str(summary['n_branches']),
+            'branches-covered': str(summary['n_branches'] - summary['n_missing_branches']),
+            'branch-rate': self._get_rate(summary['n_branches'] - summary['n_missing_branches'], summary['n_branches']),
+            'complexity': '0',
+        })
+        sources = xml.etree.ElementTree.SubElement(root, 'sources')
+        xml.etree.ElementTree.SubElement(sources, 'source').text = self.root_dirname
+        packages = xml.etree.ElementTree.SubElement(root, 'packages')
+
+        files_by_package = collections.OrderedDict()
+        for file in sorted(self.files, key=lambda file: file.filename):
+            package_name = os.path.dirname(file.filename).replace(os.path.sep, '.') or '.'
+            files_by_package.setdefault(package_name, []).append(file)
+
+        for package_name, files in files_by_package.items():
+            n_statements = sum(len(file.statements) for file in files)
+            n_hits = n_statements - sum(len(file.missing) for file in files)
+            n_branches = sum(file.get_num_branches() for file in files)
+            n_branch_hits = n_branches - sum(file.get_num_missing_branches() for file in files)
+            package = xml.etree.ElementTree.SubElement(packages, 'package', {
+                'name': package_name,
+                'line-rate': self._get_rate(n_hits, n_statements),
+                'branch-rate': self._get_rate(n_branch_hits, n_branches),
+                'complexity': '0',
+            })
+            classes = xml.etree.ElementTree.SubElement(package, 'classes')
+
+            for file in files:
+                n_branches = file.get_num_branches()
+                class_ = xml.etree.ElementTree.SubElement(classes, 'class', {
+                    'name': os.path.basename(file.filename),
+                    'filename': file.filename,
+                    'line-rate': self._get_rate(len(file.statements) - len(file.missing), len(file.statements)),
+                    'branch-rate': self._get_rate(n_branches - file.get_num_missing_branches(), n_branches),
+                    'complexity': '0',
+                })
+                xml.etree.ElementTree.SubElement(class_, 'methods')
+                lines = xml.etree.ElementTree.SubElement(class_, 'lines')
+                for line_num in file.statements:
+                    attrs = {
+                        'number': str(line_num),
+                        'hits': str(int(line_num not in file.missing)),
+                    }
+                    if line_num in file.branches:
+                        n_exits, n_taken = file.branches[line_num]
+                        attrs['branch'] = 'true'
+                        attrs['condition-coverage'] = '{:d}% ({}/{})'.format(
+                            int(100 * n_taken / n_exits) if n_exits else 100, n_taken, n_exits)
+                        if file.missing_branches.get(line_num, None):
+                            attrs['missing-branches'] = ','.join(str(dest) for dest in file.missing_branches[line_num])
+                    xml.etree.ElementTree.SubElement(lines, 'line', attrs)
+
+        return xml.etree.ElementTree.ElementTree(root)
+
+    def write_cobertura_xml(self, filename):
+        """ Write the coverage to a Cobertura XML file
+
+        Args:
+            filename (:obj:`str`): path to save the coverage
+        """
+        self.to_cobertura_xml().write(filename, encoding='utf-8', xml_declaration=True)
+
+    @staticmethod
+    def _get_percent(numerator, denominator):
+        return 100. * numerator / denominator if denominator else 100.
+
+    @staticmethod
+    def _get_rate_value(numerator, denominator):
+        return numerator / denominator if denominator else 1.
+
+    @classmethod
+    def _get_rate(cls, numerator, denominator):
+        return '{:.4g}'.format(cls._get_rate_value(numerator, denominator))
+
+
+class FileCoverage(object):
+    """ Coverage of a source file
+
+    Attributes:
+        filename (:obj:`str`): path to the file relative to the current directory
+        abs_filename (:obj:`str`): absolute path to the file
+        source (:obj:`str`): source code of the file
+        statements (:obj:`list` of :obj:`int`): sorted line numbers of the statements
+        missing (:obj:`set` of :obj:`int`): line numbers of the statements which were not executed
+        branch_exits (:obj:`dict`): dictionary which maps the line number of each branch to a list of tuples of the
+            line number of each of its exits (sorted by line number) and whether the exit was taken
+        branches (:obj:`dict`): dictionary which maps the line number of each branch to a tuple of the number
+            of possible exits and the number of exits which were taken
+        missing_branches (:obj:`dict`): dictionary which maps the line number of each partially executed branch
+            to a list of the line numbers of the exits which were not taken
+    """
+
+    __slots__ = ('filename', 'abs_filename', 'source', 'statements', 'missing', 'branch_exits', 'branches',
+                 'missing_branches')
+
+    def __init__(self):
+        self.filename = None
+        self.abs_filename = None
+        self.source = None
+        self.statements = []
+        self.missing = set()
+        self.branch_exits = {}
+        self.branches = {}
+        self.missing_branches = {}
+
+    def get_num_branches(self):
+        """ Get the number of possible branch exits
+
+        Returns:
+            :obj:`int`: number of possible branch exits
+        """
+        return sum(n_exits for n_exits, _ in self.branches.values())
+
+    def get_num_missing_branches(self):
+        """ Get the number of branch exits which were not taken
+
+        Returns:
+            :obj:`int`: number of branch exits which were not taken
+        """
+        return sum(n_exits - n_taken for n_exits, n_taken in self.branches.values())
+
+    def get_bitmap(self):
+        """ Get a compact representation of the coverage of the file which can be used to detect changes
+
+        Returns:
+            :obj:`bytes`: one byte for each line of the file which encodes whether the line is a statement, whether it
+                was executed, whether it is a branch, and whether all of its branch exits were taken
+        """
+        bitmap = bytearray(max([0] + list(self.statements) + list(self.branches.keys())))
+        for line in self.statements:
+            bitmap[line - 1] |= 1 if line in self.missing else 3
+        for line, (n_exits, n_taken) in self.branches.items():
+            bitmap[line - 1] |= 4 if n_taken < n_exits else 12
+        return bytes(bitmap)
+
+    def get_line_hits(self):
+        """ Get the coverage of each line of the file
+
+        Returns:
+            :obj:`list`: list which contains :obj:`None` for each line which is not a statement, 1 for each
+                executed statement, and 0 for each statement which was not executed
+        """
+        hits = [None] * len(self.source.splitlines())
+        for line in self.statements:
+            if line <= len(hits):
+                hits[line - 1] = 0 if line in self.missing else 1
+        return hits
+
+    def get_branch_hits(self):
+        """ Get the coverage of each branch exit
+
+        Returns:
+            :obj:`list` of :obj:`tuple`: line number, index of the exit (in the order of the line numbers of the
+                exits), and whether the exit was taken (1 or 0) for each branch exit
+        """
+        hits = []
+        for line in sorted(self.branch_exits.keys()):
+            for i_exit, (_, taken) in enumerate(self.branch_exits[line]):
+                hits.append((line, i_exit, int(taken)))
+        return hits
+
+
+class DiffCoverage(object):
+    """ Coverage of the lines which have changed relative to a base revision
+
+    Changed lines which aren't statements (e.g., comments and blank lines) and changed files which weren't measured
+    (e.g., tests and files outside the package) are ignored.
+
+    Attributes:
+        base (:obj:`str`): Git revision that the changes are relative to
+        files (:obj:`collections.OrderedDict`): dictionary which maps the name of each changed file to a tuple of
+            sorted lists of the numbers of its covered and uncovered changed statements
+    """
+
+    def __init__(self, base, coverage_model, changed_lines):
+        """
+        Args:
+            base (:obj:`str`): Git revision that the changes are relative to
+            coverage_model (:obj:`CoverageModel`): coverage of the changed files
+            changed_lines (:obj:`dict`): dictionary which maps the absolute path of each changed file to the set of
+                the numbers of its changed lines
+        """
+        self.base = base
+        self.files = collections.OrderedDict()
+        for file in coverage_model.files:
+            statements = changed_lines.get(file.abs_filename, set()).intersection(file.statements)
+            if statements:
+                covered = sorted(statements.difference(file.missing))
+                uncovered = sorted(statements.intersection(file.missing))
+                self.files[file.filename] = (covered, uncovered)
+
+    def get_num_covered(self):
+        """ Get the number of changed statements which were executed
+
+        Returns:
+            :obj:`int`: number of covered changed statements
+        """
+        return sum(len(covered) for covered, _ in self.files.values())
+
+    def get_num_uncovered(self):
+        """ Get the number of changed statements which were not executed
+
+        Returns:
+            :obj:`int`: number of uncovered changed statements
+        """
+        return sum(len(uncovered) for _, uncovered in self.files.values())
+
+    def get_percent(self):
+        """ Get the percentage of the changed statements which were executed
+
+        Returns:
+            :obj:`float`: percentage of the changed statements which were executed (100 if no statements changed)
+        """
+        n_covered = self.get_num_covered()
+        n_statements = n_covered + self.get_num_uncovered()
+        return 100. * n_covered / n_statements if n_statements else 100.
+
+
+class TaskScheduler(object):
+    """ Run tasks concurrently in thread and process pools while respecting the dependencies among them
+
+    Each task starts as soon as all of its dependencies have succeeded. The return values of dependencies can be
+    passed to tasks as keyword arguments. Tasks are isolated from each other's errors: if a task raises an exception,
+    the tasks which depend on it are skipped, but all other tasks still run. Tasks must be added after their
+    dependencies, which ensures that the dependencies are acyclic.
+
+    Tasks which are run in the process pool must be picklable. The process pool uses the ``spawn`` start method
+    because the thread pool may already be running when the process pool starts.
+
+    Attributes:
+        tasks (:obj:`collections.OrderedDict`): dictionary which maps the name of each task to a tuple of its function,
+            positional arguments, keyword arguments, names of its dependencies, :obj:`TaskExecutor`, and dictionary
+            which maps keyword arguments to the dependencies whose return values are passed as the arguments
+        max_threads (:obj:`int`): maximum number of threads; if :obj:`None`, use the default of
+            :obj:`concurrent.futures.ThreadPoolExecutor`
+        max_processes (:obj:`int`): maximum number of processes; if :obj:`None`, use the number of CPUs
+        results (:obj:`dict`): dictionary which maps the name of each task which succeeded to its return value
+        errors (:obj:`dict`): dictionary which maps the name of each task which failed to its exception
+        skipped (:obj:`list` of :obj:`str`): names of the tasks which were skipped because a dependency failed
+    """
+
+    def __init__(self, max_threads=None, max_processes=None):
+        """
+        Args:
+            max_threads (:obj:`int`, optional): maximum number of threads
+            max_processes (:obj:`int`, optional): maximum number of processes
+        """
+        self.tasks = collections.OrderedDict()
+        self.max_threads = max_threads
+        self.max_processes = max_processes
+        self.results = {}
+        self.errors = {}
+        self.skipped = []
+
+    def add_task(self, name, func, args=(), kwargs=None, dependencies=(), executor=TaskExecutor.thread,
+                 dependency_kwargs=None):
+        """ Add a task
+
+        Args:
+            name (:obj:`str`): name of the task
+            func (:obj:`callable`): function which executes the task
+            args (:obj:`tuple`, optional): positional arguments to :obj:`func`
+            kwargs (:obj:`dict`, optional): keyword arguments to :obj:`func`
+            dependencies (:obj:`list` of :obj:`str`, optional): names of the tasks which must succeed before this task
+            executor (:obj:`TaskExecutor`, optional): pool to run the task
+            dependency_kwargs (:obj:`dict`, optional): dictionary which maps the names of keyword arguments of
+                :obj:`func` to the names of the dependencies whose return values are passed as the arguments
+
+        Raises:
+            :obj:`BuildHelperError`: if a task with the same name has already been added, or if a dependency
+                hasn't been added, or if a return value is passed from a task which isn't a dependency
+        """
+        if name in self.tasks:
+            raise BuildHelperError('Task {} has already been added'.format(name))
+        for dependency in dependencies:
+            if dependency not in self.tasks:
+                raise BuildHelperError('Dependency {} of task {} must be added before the task'.format(dependency, name))
+        for dependency in (dependency_kwargs or {}).values():
+            if dependency not in dependencies:
+                raise BuildHelperError('Task {} must be a dependency of task {} to pass its return value'.format(
+                    dependency, name))
+        self.tasks[name] = (func, tuple(args), dict(kwargs or {}), tuple(dependencies), executor,
+                            dict(dependency_kwargs or {}))
+
+    def run(self, raise_errors=True):
+        """ Run the tasks
+
+        Args:
+            raise_errors (:obj:`bool`, optional): if :obj:`True`, after all of the tasks have finished, raise the
+                exception of the first task (in the order that the tasks were added) which failed
+
+        Returns:
+            :obj:`dict`: dictionary which maps the name of each task which succeeded to its return value
+        """
+        self.results = {}
+        self.errors = {}
+        self.skipped = []
+
+        pending = collections.OrderedDict(self.tasks)
+        running = {}
+        pools = {}
+        try:
+            while pending or running:
+                for name, (func, args, kwargs, dependencies, executor, dependency_kwargs) in list(pending.items()):
+                    if any(dependency in self.errors or dependency in self.skipped for dependency in dependencies):
+                        pending.pop(name)
+                        self.skipped.append(name)
+                    elif all(dependency in self.results for dependency in dependencies):
+                        pending.pop(name)
+                        if executor not in pools:
+                            if executor == TaskExecutor.process:
+                                pools[executor] = concurrent.futures.ProcessPoolExecutor(
+                                    max_workers=self.max_processes, mp_context=multiprocessing.get_context('spawn'))
+                            else:
+                                pools[executor] = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_threads)
+                        kwargs = dict(kwargs, **{arg: self.results[dependency]
+                                                 for arg, dependency in dependency_kwargs.items()})
+                        running[pools[executor].submit(func, *args, **kwargs)] = name
+
+                if not running:
+                    break
+
+                done, _ = concurrent.futures.wait(running.keys(), return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        self.results[name] = future.result()
+                    except Exception as exception:
+                        self.errors[name] = exception
+        finally:
+            for pool in pools.values():
+                pool.shutdown(wait=True)
+
+        if raise_errors:
+            for name in self.tasks.keys():
+                if name in self.errors:
+                    raise self.errors[name]
+
+        return self.results
+
+
+class CircleCiClient(object):
+    """ Client for the CircleCI API which reuses connections, limits the rate of requests, retries failed requests,
+    and caches the results of GET requests
+
+    * Connections are pooled and kept alive by a :obj:`requests.Session`.
+    * Requests are limited by a token bucket which holds up to :obj:`burst` requests and refills at :obj:`rate`
+      requests per second. A ``Retry-After`` header pauses all requests until the time which it indicates.
+    * Requests which fail with a 429 or 5xx status code, or with a connection error, are retried up to
+      :obj:`max_retries` times with exponential backoff. Non-idempotent requests (e.g., POST) are only retried
+      after 429 responses, which CircleCI returns before processing a request.
+    * The results of GET requests are cached with their ``ETag`` and ``Last-Modified`` headers and revalidated with
+      conditional requests, so that a result which hasn't changed isn't downloaded again. Results with a
+      ``Cache-Control: max-age`` header are reused without a request until they expire.
+
+    Attributes:
+        timeout (:obj:`float`): timeout of each request (s)
+        max_retries (:obj:`int`): maximum number of times to retry a failed request
+        backoff_factor (:obj:`float`): delay before the first retry (s); the delay doubles for each retry
+        max_backoff (:obj:`float`): maximum delay between retries (s)
+        rate (:obj:`float`): maximum sustained rate of requests (requests per second)
+        burst (:obj:`int`): maximum number of requests which can be sent without waiting
+        max_cache_size (:obj:`int`): maximum number of results to cache
+        session (:obj:`requests.Session`): HTTP session
+        n_requests (:obj:`int`): number of HTTP requests sent
+        n_retries (:obj:`int`): number of HTTP requests which were retries
+        n_cache_hits (:obj:`int`): number of results returned from the cache without a request
+        n_not_modified (:obj:`int`): number of results returned from the cache after a conditional request
+    """
+
+    IDEMPOTENT_METHODS = ('get', 'head', 'put', 'delete', 'options')
+    RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+    def __init__(self, timeout=30., max_retries=5, backoff_factor=1., max_backoff=60., rate=5., burst=10,
+                 max_cache_size=256, pool_maxsize=10):
+        """
+        Args:
+            timeout (:obj:`float`, optional): timeout of each request (s)
+            max_retries (:obj:`int`, optional): maximum number of times to retry a failed request
+            backoff_factor (:obj:`float`, optional): delay before the first retry (s)
+            max_backoff (:obj:`float`, optional): maximum delay between retries (s)
+            rate (:obj:`float`, optional): maximum sustained rate of requests (requests per second)
+            burst (:obj:`int`, optional): maximum number of requests which can be sent without waiting
+            max_cache_size (:obj:`int`, optional): maximum number of results to cache
+            pool_maxsize (:obj:`int`, optional): maximum number of connections to keep alive
+        """
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.rate = rate
+        self.burst = burst
+        self.max_cache_size = max_cache_size
+        self.pool_maxsize = pool_maxsize
+        self.n_requests = 0
+        self.n_retries = 0
+        self.n_cache_hits = 0
+        self.n_not_modified = 0
+        self._cache = collections.OrderedDict()
+        self._init_session()
+
+    def _init_session(self):
+        self.session = requests.Session()
+        self.session.mount('https://', requests.adapters.HTTPAdapter(pool_maxsize=self.pool_maxsize))
+        self._lock = threading.Lock()
+        self._tokens = float(self.burst)
+        self._last_refill = time.monotonic()
+        self._paused_until = 0.
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        for key in ['session', '_lock', '_tokens', '_last_refill', '_paused_until']:
+            del state[key]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_session()
+
+    def request(self, method, url, params=None, data=None):
+        """ Send a request to the CircleCI API and return its JSON-encoded result
+
+        Args:
+            method (:obj:`str`): type of HTTP request (get, post, delete)
+            url (:obj:`str`): URL, which is also the key of the cached result
+            params (:obj:`dict`, optional): query parameters (e.g., the API token)
+            data (:obj:`object`, optional): JSON-encodable body of the request
+
+        Returns:
+            :obj:`object`: result
+
+        Raises:
+            :obj:`requests.exceptions.HTTPError`: if the request does not succeed
+            :obj:`requests.exceptions.RequestException`: if the request could not be sent after :obj:`max_retries`
+                retries
+        """
+        method = method.lower()
+        headers = {'Accept': 'application/json'}
+
+        # get the cached result
+        entry = None
+        if method == 'get':
+            with self._lock:
+                entry = self._cache.get(url, None)
+                if entry is not None:
+                    self._cache.move_to_end(url)
+                    if entry['expires'] is not None and time.time() < entry['expires']:
+                        self.n_cache_hits += 1
+                        return copy.deepcopy(entry['result'])
+            if entry is not None:
+                if entry['etag']:
+                    headers['If-None-Match'] = entry['etag']
+                if entry['last_modified']:
+                    headers['If-Modified-Since'] = entry['last_modified']
+
+        # send the request, retrying failed requests
+        request_method = getattr(self.session, method)
+        i_retry = 0
+        while True:
+            self._acquire()
+            self.n_requests += 1
+            try:
+                response = request_method(url, params=params, json=data, headers=headers, timeout=self.timeout)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if method not in self.IDEMPOTENT_METHODS or i_retry >= self.max_retries:
+                    raise
+                time.sleep(self._get_backoff(i_retry))
+                i_retry += 1
+                self.n_retries += 1
+                continue
+
+            status_code = getattr(response, 'status_code', 200)
+            response_headers = getattr(response, 'headers', None) or {}
+            if status_code in self.RETRY_STATUS_CODES and i_retry < self.max_retries and \
+                    (status_code == 429 or method in self.IDEMPOTENT_METHODS):
+                retry_after = self._parse_retry_after(response_headers.get('Retry-After', None))
+                if retry_after is None:
+                    time.sleep(self._get_backoff(i_retry))
+                else:
+                    with self._lock:
+                        self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+                i_retry += 1
+                self.n_retries += 1
+                continue
+            break
+
+        # return the cached result if it hasn't been modified
+        if status_code == 304 and entry is not None:
+            with self._lock:
+                entry['expires'] = self._get_expiration(response_headers)
+                self.n_not_modified += 1
+            return copy.deepcopy(entry['result'])
+
+        response.raise_for_status()
+        result = response.json()
+
+        # cache the result
+        if method == 'get':
+            etag = response_headers.get('ETag', None)
+            last_modified = response_headers.get('Last-Modified', None)
+            expires = self._get_expiration(response_headers)
+            with self._lock:
+                if etag or last_modified or expires is not None:
+                    self._cache[url] = {
+                        'etag': etag,
+                        'last_modified': last_modified,
+                        'expires': expires,
+                        'result': copy.deepcopy(result),
+                    }
+                    self._cache.move_to_end(url)
+                    while len(self._cache) > self.max_cache_size:
+                        self._cache.popitem(last=False)
+                else:
+                    self._cache.pop(url, None)
+
+        return result
+
+    def get_stats(self):
+        """ Get statistics about the requests sent by the client
+
+        Returns:
+            :obj:`dict`: numbers of requests, retries, cache hits, and not-modified responses, and the size of the
+                cache
+        """
+        with self._lock:
+            return {
+                'requests': self.n_requests,
+                'retries': self.n_retries,
+                'cache_hits': self.n_cache_hits,
+                'not_modified': self.n_not_modified,
+                'cache_size': len(self._cache),
+            }
+
+    def clear_cache(self):
+        """ Clear the cached results """
+        with self._lock:
+            self._cache.clear()
+
+    def _acquire(self):
+        """ Wait until the token bucket permits another request """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(float(self.burst), self._tokens + (now - self._last_refill) * self.rate)
+                self._last_refill = now
+                if now >= self._paused_until and self._tokens >= 1.:
+                    self._tokens -= 1.
+                    return
+                wait = max(self._paused_until - now, (1. - self._tokens) / self.rate)
+            time.sleep(wait)
+
+    def _get_backoff(self, i_retry):
+        """ Get the delay before a retry
+
+        Args:
+            i_retry (:obj:`int`): index of the retry
+
+        Returns:
+            :obj:`float`: delay (s)
+        """
+        return min(self.max_backoff, self.backoff_factor * 2 ** i_retry) * random.uniform(0.5, 1.)
+
+    @staticmethod
+    def _parse_retry_after(value):
+        """ Parse the value of a ``Retry-After`` header
+
+        Args:
+            value (:obj:`str`): number of seconds or HTTP date
+
+        Returns:
+            :obj:`float`: number of seconds to wait, or :obj:`None` if :obj:`value` is empty or invalid
+        """
+        if not value:
+            return None
+        try:
+            return max(0., float(value))
+        except ValueError:
+            pass
+        try:
+            date = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        return max(0., date.timestamp() - time.time())
+
+    @staticmethod
+    def _get_expiration(headers):
+        """ Get the time when a result expires from the ``max-age`` directive of its ``Cache-Control`` header
+
+        Args:
+            headers (:obj:`dict`): headers of the response
+
+        Returns:
+            :obj:`float`: time when the result expires (Unix time), or :obj:`None` if the result must be
+                revalidated
+        """
+        match = re.search(r'(^|,)\s*max-age=(\d+)', headers.get('Cache-Control', None) or '')
+        if not match or 'no-cache' in headers.get('Cache-Control') or 'no-store' in headers.get('Cache-Control'):
+            return None
+        return time.time() + int(match.group(2))
+
+
+class CircleCiBuildStore(object):
+    """ Local SQLite store of finished CircleCI builds
+
+    Finished builds never change, so they can be reused without requests to CircleCI. The builds are keyed by their
+    repository and number. When the total size of the stored builds exceeds :obj:`max_size`, the least recently used
+    builds are evicted.
+
+    The database is opened on first use, and the store can be used by multiple threads.
+
+    Attributes:
+        filename (:obj:`str`): path to the database
+        max_size (:obj:`int`): maximum total size of the stored builds (bytes); if :obj:`None`, the size is unbounded
+    """
+
+    SCHEMA = (
+        """CREATE TABLE IF NOT EXISTS builds (
+            repo TEXT NOT NULL,
+            build_num INTEGER NOT NULL,
+            build TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            last_access REAL NOT NULL,
+            PRIMARY KEY (repo, build_num)
+        ) WITHOUT ROWID""",
+        """CREATE INDEX IF NOT EXISTS builds_last_access ON builds (last_access)""",
+    )
+
+    def __init__(self, filename, max_size=None):
+        """
+        Args:
+            filename (:obj:`str`): path to the database
+            max_size (:obj:`int`, optional): maximum total size of the stored builds (bytes)
+        """
+        self.filename = filename
+        self.max_size = max_size
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        return {'filename': self.filename, 'max_size': self.max_size}
+
+    def __setstate__(self, state):
+        self.__init__(state['filename'], max_size=state['max_size'])
+
+    def _connect(self):
+        """ Get the connection to the database, opening the database if necessary
+
+        Returns:
+            :obj:`sqlite3.Connection`: connection to the database
+        """
+        if self._connection is None:
+            dirname = os.path.dirname(self.filename)
+            if dirname and not os.path.isdir(dirname):
+                os.makedirs(dirname)
+            self._connection = sqlite3.connect(self.filename, check_same_thread=False, timeout=30.)
+            with self._connection:
+                for statement in self.SCHEMA:
+                    self._connection.execute(statement)
+        return self._connection
+
+    def get(self, repo, build_num):
+        """ Get a stored build
+
+        Args:
+            repo (:obj:`str`): repository (``<type>/<owner>/<name>``)
+            build_num (:obj:`int`): build number
+
+        Returns:
+            :obj:`dict`: build, or :obj:`None` if the build isn't stored
+        """
+        with self._lock:
+            connection = self._connect()
+            row = connection.execute('SELECT build FROM builds WHERE repo = ? AND build_num = ?',
+                                     (repo, int(build_num))).fetchone()
+            if row is None:
+                return None
+            with connection:
+                connection.execute('UPDATE builds SET last_access = ? WHERE repo = ? AND build_num = ?',
+                                   (time.time(), repo, int(build_num)))
+        return json.loads(row[0])
+
+    def set(self, repo, build_num, build):
+        """ Store a finished build, and evict the least recently used builds if the store is full
+
+        Args:
+            repo (:obj:`str`): repository (``<type>/<owner>/<name>``)
+            build_num (:obj:`int`): build number
+            build (:obj:`dict`): build
+        """
+        value = json.dumps(build)
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute('INSERT OR REPLACE INTO builds (repo, build_num, build, size, last_access) '
+                                   'VALUES (?, ?, ?, ?, ?)',
+                                   (repo, int(build_num), value, len(value), time.time()))
+                if self.max_size is not None:
+                    size = connection.execute('SELECT COALESCE(SUM(size), 0) FROM builds').fetchone()[0]
+                    rows = connection.execute('SELECT repo, build_num, size FROM builds ORDER BY last_access')
+                    evicted = []
+                    for evicted_repo, evicted_build_num, evicted_size in rows:
+                        if size <= self.max_size:
+                            break
+                        evicted.append((evicted_repo, evicted_build_num))
+                        size -= evicted_size
+                    connection.executemany('DELETE FROM builds WHERE repo = ? AND build_num = ?', evicted)
+
+    def get_stats(self):
+        """ Get the number and total size of the stored builds
+
+        Returns:
+            :obj:`dict`: dictionary with the keys ``builds`` and ``size``
+        """
+        with self._lock:
+            n_builds, size = self._connect().execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM builds').fetchone()
+        return {'builds': n_builds, 'size': size}
+
+    def clear(self):
+        """ Remove all of the stored builds """
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute('DELETE FROM builds')
+
+    def close(self):
+        """ Close the connection to the database """
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+class CascadeLedger(abc.ABC):
+    """ Ledger of the downstream builds triggered by each build cascade
+
+    Each entry records that a downstream package was triggered by a build cascade, which is identified by the
+    repository and number of the build which started the cascade. Subclasses implement the storage of the ledger.
+    The only implementation is a local SQLite database (:obj:`SqliteCascadeLedger`), which only deduplicates the
+    triggers of the builds which run on the same machine; the recent builds reported by CircleCI remain the source of
+    truth for whether a package has already been triggered.
+    """
+
+    @abc.abstractmethod
+    def get(self, upstream_repo_name, upstream_build_num, package):
+        """ Get the entry for a downstream package triggered by a build cascade
+
+        Args:
+            upstream_repo_name (:obj:`str`): name of the repository which started the build cascade
+            upstream_build_num (:obj:`int`): number of the build which started the build cascade
+            package (:obj:`str`): name of the downstream package
+
+        Returns:
+            :obj:`dict`: entry with the keys ``repo_name`` and ``build_num`` of the build which triggered the
+                package and the ``timestamp`` when it was triggered, or :obj:`None` if the package hasn't been
+                triggered by the build cascade
+        """
+
+    @abc.abstractmethod
+    def claim(self, upstream_repo_name, upstream_build_num, package, repo_name, build_num):
+        """ Atomically record that a downstream package is being triggered by a build cascade, unless it already
+        has been
+
+        Args:
+            upstream_repo_name (:obj:`str`): name of the repository which started the build cascade
+            upstream_build_num (:obj:`int`): number of the build which started the build cascade
+            package (:obj:`str`): name of the downstream package
+            repo_name (:obj:`str`): name of the repository of the build which is triggering the package
+            build_num (:obj:`int`): number of the build which is triggering the package
+
+        Returns:
+            :obj:`bool`: :obj:`True` if the entry was recorded, or :obj:`False` if the package has already been
+                triggered by the build cascade
+        """
+
+    @abc.abstractmethod
+    def release(self, upstream_repo_name, upstream_build_num, package):
+        """ Remove the entry for a downstream package, e.g., because it couldn't be triggered
+
+        Args:
+            upstream_repo_name (:obj:`str`): name of the repository which started the build cascade
+            upstream_build_num (:obj:`int`): number of the build which started the build cascade
+            package (:obj:`str`): name of the downstream package
+        """
+
+
+class SqliteCascadeLedger(CascadeLedger):
+    """ Cascade ledger stored in a local SQLite database
+
+    The entries are indexed by their upstream repository, upstream build, and downstream package, so each lookup is
+    a single index probe. The database is opened on first use, and the ledger can be used by multiple threads. The
+    database isn't shared among CircleCI containers, so it doesn't contain the triggers of the other builds of a
+    cascade which ran in other containers.
+
+    Attributes:
+        filename (:obj:`str`): path to the database
+    """
+
+    SCHEMA = (
+        """CREATE TABLE IF NOT EXISTS triggers (
+            upstream_repo_name TEXT NOT NULL,
+            upstream_build_num INTEGER NOT NULL,
+            package TEXT NOT NULL,
+            repo_name TEXT,
+            build_num INTEGER,
+            timestamp TEXT NOT NULL,
+            PRIMARY KEY (upstream_repo_name, upstream_build_num, package)
+        ) WITHOUT ROWID""",
+    )
+
+    def __init__(self, filename):
+        """
+        Args:
+            filename (:obj:`str`): path to the database
+        """
+        self.filename = filename
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        return {'filename': self.filename}
+
+    def __setstate__(self, state):
+        self.__init__(state['filename'])
+
+    def _connect(self):
+        """ Get the connection to the database, opening the database if necessary
+
+        Returns:
+            :obj:`sqlite3.Connection`: connection to the database
+        """
+        if self._connection is None:
+            dirname = os.path.dirname(self.filename)
+            if dirname and not os.path.isdir(dirname):
+                os.makedirs(dirname)
+            self._connection = sqlite3.connect(self.filename, check_same_thread=False, timeout=30.)
+            with self._connection:
+                for statement in self.SCHEMA:
+                    self._connection.execute(statement)
+        return self._connection
+
+    def get(self, upstream_repo_name, upstream_build_num, package):
+        with self._lock:
+            row = self._connect().execute(
+                'SELECT repo_name, build_num, timestamp FROM triggers '
+                'WHERE upstream_repo_name = ? AND upstream_build_num = ? AND package = ?',
+                (upstream_repo_name, int(upstream_build_num), package)).fetchone()
+        if row is None:
+            return None
+        return {'repo_name': row[0], 'build_num': row[1], 'timestamp': row[2]}
+
+    def claim(self, upstream_repo_name, upstream_build_num, package, repo_name, build_num):
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                cursor = connection.execute(
+                    'INSERT OR IGNORE INTO triggers '
+                    '(upstream_repo_name, upstream_build_num, package, repo_name, build_num, timestamp) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    (upstream_repo_name, int(upstream_build_num), package, repo_name,
+                     None if build_num is None else int(build_num), datetime.now().isoformat()))
+        return cursor.rowcount == 1
+
+    def release(self, upstream_repo_name, upstream_build_num, package):
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute(
+                    'DELETE FROM triggers WHERE upstream_repo_name = ? AND upstream_build_num = ? AND package = ?',
+                    (upstream_repo_name, int(upstream_build_num), package))
+
+    def close(self):
+        """ Close the connection to the database """
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+class Tracer(object):
+    """ Record timed spans of build operations and save them in the Chrome trace event format, which can be viewed
+    with ``chrome://tracing`` or Perfetto
+
+    When the tracer is disabled, :obj:`span` returns a shared no-op span, so tracing has negligible overhead.
+
+    Attributes:
+        filename (:obj:`str`): path to save the spans; if :obj:`None`, the tracer is disabled
+        enabled (:obj:`bool`): if :obj:`True`, record spans
+        events (:obj:`list` of :obj:`dict`): recorded trace events
+        secrets (:obj:`set` of :obj:`str`): values (e.g., tokens and passwords) to redact from the attributes of the
+            spans when they are saved
+        ENV_VAR (:obj:`str`): environment variable which enables the default tracer
+    """
+
+    ENV_VAR = 'KARR_LAB_BUILD_UTILS_TRACE'
+    _default = None
+
+    def __init__(self, filename=None):
+        """
+        Args:
+            filename (:obj:`str`, optional): path to save the spans; if :obj:`None`, the tracer is disabled
+        """
+        self.filename = filename
+        self.enabled = filename is not None
+        self.events = []
+        self.secrets = set()
+        self._thread_names = {}
+
+    @classmethod
+    def get_default(cls):
+        """ Get the tracer shared by the build helpers of this process
+
+        The tracer is enabled if :obj:`ENV_VAR` is set to a value other than ``0``. Its spans are saved to
+        ``logs/trace.<date>.<pid>.json`` when the process exits.
+
+        Returns:
+            :obj:`Tracer`: tracer
+        """
+        if cls._default is None:
+            if os.getenv(cls.ENV_VAR, '0') not in ['', '0']:
+                cls._default = cls(os.path.abspath(os.path.join('logs', 'trace.{}.{}.json'.format(
+                    datetime.now().strftime('%Y-%m-%d-%H-%M-%S'), os.getpid()))))
+                atexit.register(cls._default.save)
+            else:
+                cls._default = cls()
+        return cls._default
+
+    def redact(self, *secrets):
+        """ Redact values (e.g., tokens and passwords) from the attributes of the spans
+
+        Args:
+            *secrets (:obj:`str`): values to redact
+        """
+        self.secrets.update(secret for secret in secrets if secret)
+
+    def span(self, name, category='build', attrs=None):
+        """ Get a span which times a block of code
+
+        Args:
+            name (:obj:`str`): name of the span
+            category (:obj:`str`, optional): category of the span (e.g., ``build``, ``subprocess``, ``docker``,
+                ``http``)
+            attrs (:obj:`dict`, optional): attributes of the span
+
+        Returns:
+            :obj:`TraceSpan`: span, which is a context manager
+        """
+        if not self.enabled:
+            return _DISABLED_SPAN
+        return TraceSpan(self, name, category, dict(attrs or {}))
+
+    def save(self):
+        """ Save the recorded spans to :obj:`filename` """
+        if not self.enabled or not self.events:
+            return
+
+        events = []
+        for event in list(self.events):
+            event = dict(event)
+            event['args'] = {key: self._redact(value) for key, value in event['args'].items()}
+            events.append(event)
+        for tid, thread_name in self._thread_names.items():
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': tid,
+                           'args': {'name': thread_name}})
+
+        dirname = os.path.dirname(self.filename)
+        if dirname and not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        tmp_filename = self.filename + '.tmp'
+        with open(tmp_filename, 'w') as file:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, file)
+        os.replace(tmp_filename, self.filename)
+
+    def _redact(self, value):
+        if isinstance(value, str):
+            for secret in self.secrets:
+                value = value.replace(secret, '***')
+        return value
+
+    def _add_span(self, span, duration, error):
+        thread = threading.current_thread()
+        self._thread_names[thread.ident] = thread.name
+        if error is not None:
+            span.attrs['error'] = error.__name__
+        self.events.append({
+            'name': span.name,
+            'cat': span.category,
+            'ph': 'X',
+            'ts': span.start * 1e6,
+            'dur': duration * 1e6,
+            'pid': os.getpid(),
+            'tid': thread.ident,
+            'args': span.attrs,
+        })
+
+
+class TraceSpan(object):
+    """ Timed span of a build operation
+
+    Attributes:
+        tracer (:obj:`Tracer`): tracer which records the span; if :obj:`None`, the span is a no-op
+        name (:obj:`str`): name
+        category (:obj:`str`): category
+        attrs (:obj:`dict`): attributes
+        start (:obj:`float`): time when the span started (Unix time)
+    """
+
+    __slots__ = ('tracer', 'name', 'category', 'attrs', 'start', '_start_counter')
+
+    def __init__(self, tracer, name, category, attrs):
+        """
+        Args:
+            tracer (:obj:`Tracer`): tracer which records the span; if :obj:`None`, the span is a no-op
+            name (:obj:`str`): name
+            category (:obj:`str`): category
+            attrs (:obj:`dict`): attributes
+        """
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.attrs = attrs
+        self.start = None
+        self._start_counter = None
+
+    def set(self, key, value):
+        """ Set an attribute of the span
+
+        Args:
+            key (:obj:`str`): name of the attribute
+            value (:obj:`object`): value of the attribute
+        """
+        if self.tracer is not None:
+            self.attrs[key] = value
+
+    def __enter__(self):
+        if self.tracer is not None:
+            self.start = time.time()
+            self._start_counter = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.tracer is not None:
+            self.tracer._add_span(self, time.perf_counter() - self._start_counter, exc_type)
+        return False
+
+
+_DISABLED_SPAN = TraceSpan(None, None, None, None)
+
+
+class FileCache(object):
+    """ Per-process cache of values parsed from files (e.g., the build configuration and the requirements files)
+
+    A cached value is reused until one of the files it was parsed from changes. Each file is first compared by its
+    modification time and size. If these have changed, the file is compared by the SHA-256 hash of its content, so
+    that touching a file doesn't invalidate its cached value.
+
+    Each call to :obj:`get` returns a copy of the cached value, so callers can modify the returned value.
+
+    Attributes:
+        hits (:obj:`int`): number of calls to :obj:`get` which reused a cached value
+        misses (:obj:`int`): number of calls to :obj:`get` which parsed the files
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._lock = threading.RLock()
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+
+    def get(self, key, filenames, parse):
+        """ Get the value parsed from files, parsing the files only if they have changed since they were cached
+
+        Args:
+            key (:obj:`object`): hashable key of the value
+            filenames (:obj:`list` of :obj:`str`): paths to the files the value is parsed from
+            parse (:obj:`callable`): function which parses the files and returns the value
+
+        Returns:
+            :obj:`object`: copy of the parsed value
+        """
+        with self._lock:
+            stats = [self._get_stat(filename) for filename in filenames]
+            entry = self._entries.get(key, None)
+
+            if entry is not None and entry['stats'] != stats:
+                hashes = [self._get_hash(filename) for filename in filenames]
+                if hashes == entry['hashes']:
+                    entry['stats'] = stats
+                else:
+                    entry = None
+
+            if entry is None:
+                self.misses += 1
+                hashes = [self._get_hash(filename) for filename in filenames]
+                entry = self._entries[key] = {'stats': stats, 'hashes': hashes, 'value': parse()}
+            else:
+                self.hits += 1
+
+            return copy.deepcopy(entry['value'])
+
+    def get_stats(self):
+        """ Get the numbers of hits and misses of the cache
+
+        Returns:
+            :obj:`dict`: dictionary with the keys ``hits``, ``misses``, and ``size``
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries)}
+
+    def clear(self):
+        """ Clear the cache and its statistics """
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    @staticmethod
+    def _get_stat(filename):
+        try:
+            stat = os.stat(filename)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    @staticmethod
+    def _get_hash(filename):
+        try:
+            with open(filename, 'rb') as file:
+                return hashlib.sha256(file.read()).hexdigest()
+        except FileNotFoundError:
+            return None
+
+
+class DependencyIndex(object):
+    """ Index and graph of the dependencies among the packages in a directory
+
+    The index is built in a single pass over the packages. The requirements of each package are parsed once, and then
+    the upstream and downstream dependencies of every package are computed together. The index is the single model of
+    the package dependencies from which the dependency commands (e.g., checking whether the dependencies are acyclic,
+    visualizing them, and predicting the duration of build cascades) and the downstream dependencies saved to the
+    configuration file of each package are derived. The index can be saved to :obj:`filename`, together with the
+    modification time and size of the files it was parsed from, so that later calls to :obj:`update` only reparse the
+    packages whose files have changed.
+
+    Attributes:
+        packages_parent_dir (:obj:`str`): path to the parent directory of the packages
+        filename (:obj:`str`): path to save the index in JSON format
+        packages (:obj:`dict`): dictionary which maps the name of each package to its module, requirements, and
+            the stats of the files they were parsed from
+        upstream (:obj:`dict`): dictionary which maps the name of each package to the names of the packages it
+            depends on
+        downstream (:obj:`dict`): dictionary which maps the name of each package to the names of the packages which
+            depend on it
+        n_parsed (:obj:`int`): number of packages parsed by the last call to :obj:`update`
+    """
+
+    FILENAMES = ('setup.cfg', 'requirements.txt', 'requirements.optional.txt', 'tests/requirements.txt',
+                 'docs/requirements.txt')
+    # :obj:`tuple` of :obj:`str`: files which the module name and requirements of each package are parsed from
+
+    def __init__(self, packages_parent_dir='..', filename=None):
+        """
+        Args:
+            packages_parent_dir (:obj:`str`, optional): path to the parent directory of the packages
+            filename (:obj:`str`, optional): path to save the index in JSON format
+        """
+        self.packages_parent_dir = os.path.abspath(packages_parent_dir)
+        self.filename = filename
+        self.packages = {}
+        self.upstream = {}
+        self.downstream = {}
+        self.n_parsed = 0
+        self._graph = None
+
+        if filename and os.path.isfile(filename):
+            with open(filename, 'r') as file:
+                index = json.load(file)
+            if index.get('packages_parent_dir', None) == self.packages_parent_dir:
+                self.packages = index['packages']
+                self._index_dependencies()
+
+    def update(self):
+        """ Update the index with the packages in :obj:`packages_parent_dir`, reparsing only the packages whose files
+        have changed, and save the index to :obj:`filename`
+
+        Returns:
+            :obj:`DependencyIndex`: this index
+        """
+        packages = {}
+        self.n_parsed = 0
+        for dirname in sorted(glob.glob(os.path.join(self.packages_parent_dir, '*'))):
+            if os.path.isdir(dirname) and os.path.isfile(os.path.join(dirname, '.circleci/config.yml')):
+                package = os.path.basename(dirname)
+                stats = [FileCache._get_stat(os.path.join(dirname, filename)) for filename in self.FILENAMES]
+                stats = [list(stat) if stat else None for stat in stats]
+                entry = self.packages.get(package, None)
+                if entry is None or entry['stats'] != stats:
+                    self.n_parsed += 1
+                    entry = self._parse_package(dirname)
+                    entry['stats'] = stats
+                packages[package] = entry
+        self.packages = packages
+        self._index_dependencies()
+
+        if self.filename:
+            self.save()
+
+        return self
+
+    def save(self):
+        """ Save the index to :obj:`filename` """
+        dirname = os.path.dirname(self.filename)
+        if dirname and not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        tmp_filename = self.filename + '.tmp'
+        with open(tmp_filename, 'w') as file:
+            json.dump({'packages_parent_dir': self.packages_parent_dir, 'packages': self.packages}, file)
+        os.replace(tmp_filename, self.filename)
+
+    def get_dependents(self, module):
+        """ Get the packages which require a module
+
+        Args:
+            module (:obj:`str`): name of the module
+
+        Returns:
+            :obj:`list` of :obj:`str`: names of the packages which require :obj:`module`
+        """
+        return [package for package, entry in self.packages.items() if module in entry['requirements']]
+
+    def get_graph(self):
+        """ Get the graph as a directed graph whose edges point from packages to their downstream dependencies
+
+        Returns:
+            :obj:`networkx.DiGraph`: graph
+        """
+        if self._graph is None:
+            graph = networkx.DiGraph()
+            for package, downstream_dependencies in self.downstream.items():
+                graph.add_node(package)
+                for other_package in downstream_dependencies:
+                    graph.add_edge(package, other_package)
+            self._graph = graph
+        return self._graph
+
+    def find_cycle(self):
+        """ Find a cycle in the graph
+
+        Returns:
+            :obj:`list` of :obj:`tuple` of :obj:`str`: edges of a cycle, or :obj:`None` if the graph is acyclic
+        """
+        try:
+            return networkx.algorithms.cycles.find_cycle(self.get_graph())
+        except networkx.NetworkXNoCycle:
+            return None
+
+    def is_acyclic(self):
+        """ Determine whether the graph is acyclic
+
+        Returns:
+            :obj:`bool`: :obj:`True` if the graph is acyclic
+        """
+        return networkx.is_directed_acyclic_graph(self.get_graph())
+
+    def get_downstream_closure(self, package):
+        """ Get the direct and indirect downstream dependencies of a package
+
+        Args:
+            package (:obj:`str`): name of the package
+
+        Returns:
+            :obj:`list` of :obj:`str`: names of the direct and indirect downstream dependencies of :obj:`package`
+        """
+        graph = self.get_graph()
+        if package not in graph:
+            return []
+        return sorted(networkx.descendants(graph, package))
+
+    def get_upstream_closure(self, package):
+        """ Get the direct and indirect upstream dependencies of a package
+
+        Args:
+            package (:obj:`str`): name of the package
+
+        Returns:
+            :obj:`list` of :obj:`str`: names of the direct and indirect upstream dependencies of :obj:`package`
+        """
+        graph = self.get_graph()
+        if package not in graph:
+            return []
+        return sorted(networkx.ancestors(graph, package))
+
+    def get_topological_order(self, packages=None):
+        """ Order packages so that each package follows all of its upstream dependencies
+
+        Args:
+            packages (:obj:`list` of :obj:`str`, optional): names of the packages to order; if :obj:`None`, order
+                all of the packages
+
+        Returns:
+            :obj:`list` of :obj:`str`: names of the ordered packages
+
+        Raises:
+            :obj:`BuildHelperError`: if the dependencies of the packages are cyclic
+        """
+        graph = self.get_graph()
+        if packages is not None:
+            graph = graph.subgraph(packages)
+        try:
+            return list(networkx.lexicographical_topological_sort(graph))
+        except networkx.NetworkXUnfeasible:
+            raise BuildHelperError('The package dependencies are cyclic')
+
+    def get_topological_waves(self, packages=None):
+        """ Group packages into waves, so that the upstream dependencies of each package are in earlier waves
+
+        Args:
+            packages (:obj:`list` of :obj:`str`, optional): names of the packages to group; if :obj:`None`, group
+                all of the packages
+
+        Returns:
+            :obj:`list` of :obj:`list` of :obj:`str`: names of the packages in each wave
+
+        Raises:
+            :obj:`BuildHelperError`: if the dependencies of the packages are cyclic
+        """
+        graph = self.get_graph()
+        if packages is not None:
+            graph = graph.subgraph(packages)
+        try:
+            return [sorted(wave) for wave in networkx.topological_generations(graph)]
+        except networkx.NetworkXUnfeasible:
+            raise BuildHelperError('The package dependencies are cyclic')
+
+    def get_critical_path(self, package, durations, queue_times=None, deferring_packages=()):
+        """ Predict the schedule of the build cascade triggered by a package and its critical path
+
+        The cascade is modeled as :obj:`BuildHelper.trigger_tests_of_downstream_dependencies` runs it. When a build
+        finishes, it triggers all of its direct downstream dependencies at once, except that the packages in
+        :obj:`deferring_packages` defer the direct downstream dependencies which are also indirect downstream
+        dependencies through their other direct downstream dependencies. Each package is built once per cascade, so
+        it is triggered by the first of its triggering upstream dependencies to finish, and its build starts after it
+        waits in the CircleCI queue. All of the packages in the cascade are assumed to be triggered, although the
+        packages which don't import any of the changed modules are skipped.
+
+        The critical path is the chain of builds which trigger each other up to the last build to finish, which
+        determines the wall time of the cascade. The slack of a package is how much its build could be delayed or
+        slowed down without delaying the cascade, assuming that it still triggers the same builds; the packages on
+        the critical path have no slack.
+
+        Args:
+            package (:obj:`str`): name of the package which triggers the cascade
+            durations (:obj:`dict`): dictionary which maps the name of each package in the cascade to the duration of
+                its build
+            queue_times (:obj:`dict`, optional): dictionary which maps the name of each package in the cascade to the
+                time that its build waits in the queue; default: no queueing
+            deferring_packages (:obj:`list` of :obj:`str`, optional): names of the packages whose
+                ``defer_downstream_dependencies`` option is true
+
+        Returns:
+            :obj:`dict`: dictionary with the keys ``wall_time`` (predicted wall time of the cascade),
+                ``critical_path`` (names of the packages on the critical path), and ``schedule`` (dictionary which
+                maps the name of each package to its ``triggered_by``, ``queue_time``, ``duration``, ``start``,
+                ``finish``, and ``slack``)
+
+        Raises:
+            :obj:`BuildHelperError`: if the dependencies of the packages are cyclic
+        """
+        queue_times = queue_times or {}
+        graph = self.get_graph().subgraph([package] + self.get_downstream_closure(package)).copy()
+        graph.add_node(package)
+        try:
+            order = list(networkx.lexicographical_topological_sort(graph))
+        except networkx.NetworkXUnfeasible:
+            raise BuildHelperError('The package dependencies are cyclic')
+
+        # remove the edges to the downstream dependencies which are deferred to other downstream dependencies
+        reduced_graph = networkx.transitive_reduction(graph)
+        for upstream, downstream in list(graph.edges):
+            if upstream in deferring_packages and not reduced_graph.has_edge(upstream, downstream):
+                graph.remove_edge(upstream, downstream)
+
+        schedule = {}
+        for other_package in order:
+            triggered_by = min(graph.predecessors(other_package),
+                               key=lambda upstream: (schedule[upstream]['finish'], upstream), default=None)
+            queue_time = queue_times.get(other_package, 0.)
+            start = (schedule[triggered_by]['finish'] if triggered_by else 0.) + queue_time
+            schedule[other_package] = {
+                'triggered_by': triggered_by,
+                'queue_time': queue_time,
+                'duration': durations[other_package],
+                'start': start,
+                'finish': start + durations[other_package],
+            }
+        wall_time = max(entry['finish'] for entry in schedule.values())
+
+        latest_finishes = {}
+        for other_package in reversed(order):
+            latest_finishes[other_package] = min(
+                [latest_finishes[downstream] - schedule[downstream]['duration'] - schedule[downstream]['queue_time']
+                 for downstream in graph.successors(other_package)
+                 if schedule[downstream]['triggered_by'] == other_package], default=wall_time)
+            schedule[other_package]['slack'] = latest_finishes[other_package] - schedule[other_package]['finish']
+
+        critical_path = [max(order, key=lambda other_package: schedule[other_package]['finish'])]
+        while schedule[critical_path[0]]['triggered_by']:
+            critical_path.insert(0, schedule[critical_path[0]]['triggered_by'])
+
+        return {'wall_time': wall_time, 'critical_path': critical_path, 'schedule': schedule}
+
+    def get_imports(self, package):
+        """ Get the modules imported by the Python files of a package
+
+        The imports of each file are saved to the index with the modification time and size of the file, so that
+        only the files which have changed are rescanned.
+
+        Args:
+            package (:obj:`str`): name of the package
+
+        Returns:
+            :obj:`list` of :obj:`str`: sorted names of the modules imported by :obj:`package`
+        """
+        dirname = os.path.join(self.packages_parent_dir, package)
+        entry = self.packages[package]
+        old_sources = entry.get('sources', {})
+        sources = {}
+        for filename in self.get_source_filenames(dirname):
+            stat = list(FileCache._get_stat(os.path.join(dirname, filename)))
+            source = old_sources.get(filename, None)
+            if source is None or source['stat'] != stat:
+                source = {'stat': stat, 'imports': self.scan_imports(os.path.join(dirname, filename))}
+            sources[filename] = source
+
+        if sources != old_sources:
+            entry['sources'] = sources
+            if self.filename:
+                self.save()
+
+        imports = set()
+        for source in sources.values():
+            imports.update(source['imports'])
+        return sorted(imports)
+
+    def get_downstream_imports(self, package):
+        """ Get the modules of a package which are imported by each of its direct downstream dependencies
+
+        Args:
+            package (:obj:`str`): name of the package
+
+        Returns:
+            :obj:`dict`: dictionary which maps the name of each direct downstream dependency of :obj:`package` to
+                the sorted names of the modules of :obj:`package` which it imports
+        """
+        module = self.packages[package]['module']
+        downstream_imports = {}
+        for other_package in self.downstream[package]:
+            downstream_imports[other_package] = [imported_module for imported_module in self.get_imports(other_package)
+                                                 if imported_module == module or
+                                                 imported_module.startswith(module + '.')]
+        return downstream_imports
+
+    def get_downstream_graph(self, package):
+        """ Get the graph of the downstream dependencies of a package
+
+        Args:
+            package (:obj:`str`): name of the package
+
+        Returns:
+            :obj:`dict`: dictionary which maps the name of each direct and indirect downstream dependency of
+                :obj:`package` to its direct downstream dependencies
+        """
+        return {other_package: self.downstream[other_package] for other_package in self.get_downstream_closure(package)}
+
+    def write_downstream_dependencies(self, config_filename='.karr_lab_build_utils.yml'):
+        """ Save the downstream dependencies of each package, the graph of its indirect downstream dependencies, and
+        the modules of the package which its direct downstream dependencies import, to its configuration file
+
+        Args:
+            config_filename (:obj:`str`, optional): path to the configuration file of each package, relative to the
+                package
+
+        Returns:
+            :obj:`list` of :obj:`str`: names of the packages whose configuration files were changed
+        """
+        changed = []
+        for package, downstream_dependencies in self.downstream.items():
+            filename = os.path.join(self.packages_parent_dir, package, config_filename)
+            config = {}
+            if os.path.isfile(filename):
+                with open(filename, 'r') as file:
+                    config = yaml.load(file, Loader=yaml.FullLoader) or {}
+
+            downstream_dependency_graph = self.get_downstream_graph(package)
+            downstream_dependency_imports = self.get_downstream_imports(package)
+            if config.get('downstream_dependencies', None) != downstream_dependencies or \
+                    config.get('downstream_dependency_graph', None) != downstream_dependency_graph or \
+                    config.get('downstream_dependency_imports', None) != downstream_dependency_imports:
+                config['downstream_dependencies'] = downstream_dependencies
+                config['downstream_dependency_graph'] = downstream_dependency_graph
+                config['downstream_dependency_imports'] = downstream_dependency_imports
+                with open(filename, 'w') as file:
+                    yaml.dump(config, file, default_flow_style=False)
+                changed.append(package)
+
+        return changed
+
+    def render(self, out_filename):
+        """ Render the graph to a file
+
+        Args:
+            out_filename (:obj:`str`): path to save the rendered graph; the extension determines the format
+        """
+        basename, format = os.path.splitext(out_filename)
+        dot = graphviz.Digraph(format=format[1:])
+        for package in sorted(self.downstream.keys()):
+            dot.node(package, package)
+            for other_package in self.downstream[package]:
+                dot.edge(package, other_package)
+        dot.render(filename=basename, cleanup=True)
+
+    def _index_dependencies(self):
+        """ Compute the upstream and downstream dependencies of each package from the requirements of the packages """
+        packages = {entry['module']: package for package, entry in self.packages.items()}
+        self.upstream = {package: [] for package in self.packages}
+        self.downstream = {package: [] for package in self.packages}
+        self._graph = None
+        for package in sorted(self.packages.keys()):
+            for requirement in self.packages[package]['requirements']:
+                other_package = packages.get(requirement, None)
+                if other_package is not None and other_package != package:
+                    self.upstream[package].append(other_package)
+                    self.downstream[other_package].append(package)
+
+    @staticmethod
+    def _parse_package(dirname):
+        """ Parse the module name and the requirements of a package
+
+        Args:
+            dirname (:obj:`str`): path to the package
+
+        Returns:
+            :obj:`dict`: dictionary with the keys ``module`` and ``requirements``
+        """
+        import pkg_utils
+        # pkg_utils is imported locally so that we can use karr_lab_build_utils to properly calculate its coverage;
+        # :todo: figure out how to fix this
+
+        install_requires, extras_require, _, _ = pkg_utils.get_dependencies(
+            dirname, include_extras=False, include_specs=False, include_markers=False)
+        requirements = sorted(set(install_requires) | set(extras_require.get('all', [])))
+
+        return {'module': DependencyIndex.get_module_name(dirname), 'requirements': requirements}
+
+    @staticmethod
+    def get_module_name(dirname):
+        """ Get the name of the module of a package from the ``source`` of the ``coverage:run`` section of its
+        ``setup.cfg`` file, or from the name of its directory
+
+        Args:
+            dirname (:obj:`str`): path to the package
+
+        Returns:
+            :obj:`str`: name of the module of the package
+        """
+        parser = configparser.ConfigParser()
+        parser.read(os.path.join(dirname, 'setup.cfg'))
+        if parser.has_option('coverage:run', 'source'):
+            tmp = parser.get('coverage:run', 'source').strip().split('\n')
+            if len(tmp) == 1:
+                return tmp[0].strip()
+        return os.path.basename(os.path.abspath(dirname))
+
+    @staticmethod
+    def get_source_filenames(dirname):
+        """ Get the paths to the Python files of a package, excluding hidden, build, and distribution directories
+
+        Args:
+            dirname (:obj:`str`): path to the package
+
+        Returns:
+            :obj:`list` of :obj:`str`: paths to the Python files, relative to :obj:`dirname`
+        """
+        filenames = []
+        for root, subdirnames, basenames in os.walk(dirname):
+            subdirnames[:] = sorted(subdirname for subdirname in subdirnames
+                                    if not subdirname.startswith('.') and subdirname not in ['build', 'dist'] and
+                                    not subdirname.endswith('.egg-info'))
+            for basename in sorted(basenames):
+                if basename.endswith('.py'):
+                    filenames.append(os.path.relpath(os.path.join(root, basename), dirname))
+        return filenames
+
+    @staticmethod
+    def scan_imports(filename, package=None):
+        """ Get the modules imported by a Python file by statically scanning its abstract syntax tree
+
+        ``from x import y`` is recorded as importing both ``x`` and ``x.y`` because ``y`` may be a submodule.
+        Dynamic imports (e.g., with :obj:`importlib.import_module`) are not detected.
+
+        Args:
+            filename (:obj:`str`): path to the file
+            package (:obj:`str`, optional): name of the package which contains the file, which is used to resolve
+                relative imports; if :obj:`None`, relative imports are ignored
+
+        Returns:
+            :obj:`list` of :obj:`str`: sorted names of the imported modules
+        """
+        with open(filename, 'rb') as file:
+            try:
+                tree = ast.parse(file.read(), filename=filename)
+            except (SyntaxError, ValueError) as exception:
+                warnings.warn('{} could not be parsed: {}'.format(filename, exception), UserWarning)
+                return []
+
+        imports = set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                for alias in node.names:
+                    imports.add(alias.name)
+            elif isinstance(node, ast.ImportFrom):
+                if node.level:
+                    if package is None:
+                        continue
+                    parts = package.split('.')
+                    if node.level - 1 >= len(parts):
+                        continue
+                    module = '.'.join(parts[0:len(parts) - node.level + 1] + ([node.module] if node.module else []))
+                else:
+                    module = node.module
+                imports.add(module)
+                for alias in node.names:
+                    if alias.name != '*':
+                        imports.add(module + '.' + alias.name)
+        return sorted(imports)
 
 
 class BuildHelperError(Exception):
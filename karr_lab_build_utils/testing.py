@@ -0,0 +1,279 @@
+""" Utilities for testing and benchmarking the build utilities without network access
+
+These utilities aren't used by :obj:`karr_lab_build_utils.core`.
+
+:License: MIT
+"""
+
+import collections
+import contextlib
+import hashlib
+import http.server
+import json
+import math
+import os
+import requests
+import threading
+import time
+import urllib.parse
+
+
+class CircleCiStandIn(object):
+    """ Local HTTP stand-in for the CircleCI API, which can be used to test and benchmark the requests of the build
+    helper without network access
+
+    The stand-in serves the ``v1.1`` and ``v2`` endpoints used by
+    :obj:`karr_lab_build_utils.core.BuildHelper.run_circleci_api` from fixtures,
+    which map requests (e.g., ``GET /v1.1/project/github/KarrLab/wc_lang/12``) to responses. A fixture can be a
+    single response, which is served for each request, or a list of responses, which are served in order, with the
+    last response served for any further requests. Requests without fixtures receive 404 responses. Responses carry
+    ``ETag`` headers and conditional requests are answered with 304 responses, like CircleCI.
+
+    In record mode, requests without fixtures are forwarded to CircleCI, and the responses, including their headers
+    (e.g., ``Retry-After``), are recorded as fixtures (without the API token) and saved to :obj:`fixtures_filename`
+    when the stand-in stops.
+
+    The stand-in can simulate the latency of CircleCI and limit the rate of requests with 429 responses with
+    ``Retry-After`` headers. It counts the requests for each scenario (see :obj:`scenario`). To use the stand-in,
+    point a build helper at its :obj:`endpoint`, e.g.::
+
+        with CircleCiStandIn(fixtures_filename='tests/fixtures/circleci/cascade.json', latency=0.1) as stand_in:
+            build_helper.CIRCLE_API_ENDPOINT = stand_in.endpoint
+            with stand_in.scenario('trigger'):
+                build_helper.trigger_tests_of_downstream_dependencies()
+            print(stand_in.get_counts('trigger'))
+
+    Attributes:
+        fixtures (:obj:`dict`): dictionary which maps requests (``<METHOD> <path>``) to responses (dictionaries with
+            the keys ``status``, ``body``, and optionally ``headers``)
+        fixtures_filename (:obj:`str`): path to a JSON file to load the fixtures from and save recorded fixtures to
+        record_endpoint (:obj:`str`): endpoint to forward requests without fixtures to and record (e.g.,
+            ``https://circleci.com/api``); if :obj:`None`, the stand-in only replays fixtures
+        latency (:obj:`float`): simulated latency of each request (s)
+        rate (:obj:`float`): maximum sustained rate of requests (requests per second); if :obj:`None`, the rate
+            isn't limited
+        burst (:obj:`int`): maximum number of requests which can be sent without waiting
+        counts (:obj:`dict` of :obj:`str` to :obj:`collections.Counter`): number of each request for each scenario
+        log (:obj:`list` of :obj:`dict`): scenario, method, path, status, and body of each request
+    """
+
+    DEFAULT_SCENARIO = 'default'
+
+    # response headers which aren't recorded because they are set by the stand-in or describe the connection
+    UNRECORDED_HEADERS = ('connection', 'content-encoding', 'content-length', 'content-type', 'date', 'etag',
+                          'keep-alive', 'server', 'set-cookie', 'transfer-encoding')
+
+    def __init__(self, fixtures=None, fixtures_filename=None, record_endpoint=None, latency=0., rate=None, burst=1):
+        """
+        Args:
+            fixtures (:obj:`dict`, optional): dictionary which maps requests to responses
+            fixtures_filename (:obj:`str`, optional): path to a JSON file to load the fixtures from and save recorded
+                fixtures to
+            record_endpoint (:obj:`str`, optional): endpoint to forward requests without fixtures to and record
+            latency (:obj:`float`, optional): simulated latency of each request (s)
+            rate (:obj:`float`, optional): maximum sustained rate of requests (requests per second)
+            burst (:obj:`int`, optional): maximum number of requests which can be sent without waiting
+        """
+        self.fixtures = {}
+        if fixtures_filename and os.path.isfile(fixtures_filename):
+            with open(fixtures_filename, 'r') as file:
+                self.fixtures.update(json.load(file))
+        self.fixtures.update(fixtures or {})
+        self.fixtures_filename = fixtures_filename
+        self.record_endpoint = record_endpoint
+        self.latency = latency
+        self.rate = rate
+        self.burst = burst
+        self.counts = collections.defaultdict(collections.Counter)
+        self.log = []
+        self._scenario = self.DEFAULT_SCENARIO
+        self._n_served = collections.Counter()
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def endpoint(self):
+        """ Get the endpoint of the stand-in, which can be used in place of
+        :obj:`karr_lab_build_utils.core.BuildHelper.CIRCLE_API_ENDPOINT`
+
+        Returns:
+            :obj:`str`: endpoint
+        """
+        return 'http://{}:{}/api'.format(*self._server.server_address[0:2])
+
+    def start(self):
+        """ Start serving requests in a background thread """
+        stand_in = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                stand_in._handle(self, 'GET')
+
+            def do_POST(self):
+                stand_in._handle(self, 'POST')
+
+            def do_DELETE(self):
+                stand_in._handle(self, 'DELETE')
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """ Stop serving requests, and save the fixtures if requests were recorded """
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+            self._thread = None
+
+        if self.record_endpoint and self.fixtures_filename:
+            dirname = os.path.dirname(self.fixtures_filename)
+            if dirname and not os.path.isdir(dirname):
+                os.makedirs(dirname)
+            with open(self.fixtures_filename, 'w') as file:
+                json.dump(self.fixtures, file, indent=2, sort_keys=True)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    @contextlib.contextmanager
+    def scenario(self, name):
+        """ Count the requests made within a block as a scenario
+
+        Args:
+            name (:obj:`str`): name of the scenario
+        """
+        with self._lock:
+            previous_scenario = self._scenario
+            self._scenario = name
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._scenario = previous_scenario
+
+    def get_counts(self, scenario=None):
+        """ Get the number of each request of a scenario
+
+        Args:
+            scenario (:obj:`str`, optional): name of the scenario; if :obj:`None`, get the counts of the default
+                scenario
+
+        Returns:
+            :obj:`collections.Counter`: number of each request (``<METHOD> <path>``)
+        """
+        with self._lock:
+            return collections.Counter(self.counts[scenario or self.DEFAULT_SCENARIO])
+
+    def _handle(self, handler, method):
+        """ Respond to a request
+
+        Args:
+            handler (:obj:`http.server.BaseHTTPRequestHandler`): request handler
+            method (:obj:`str`): HTTP method
+        """
+        url = urllib.parse.urlsplit(handler.path)
+        path = url.path[len('/api'):] if url.path.startswith('/api/') else url.path
+        key = '{} {}'.format(method, path)
+        length = int(handler.headers.get('Content-Length', 0) or 0)
+        request_body = json.loads(handler.rfile.read(length).decode()) if length else None
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        with self._lock:
+            scenario = self._scenario
+            self.counts[scenario][key] += 1
+
+            # limit the rate of requests
+            retry_after = None
+            if self.rate:
+                now = time.monotonic()
+                self._tokens = min(float(self.burst), self._tokens + (now - self._last_refill) * self.rate)
+                self._last_refill = now
+                if self._tokens >= 1.:
+                    self._tokens -= 1.
+                else:
+                    retry_after = (1. - self._tokens) / self.rate
+
+        if retry_after is not None:
+            response = {'status': 429, 'body': {'message': 'Too many requests'},
+                        'headers': {'Retry-After': str(int(math.ceil(retry_after)))}}
+        else:
+            response = self._get_response(key, method, path, url.query, request_body)
+
+        with self._lock:
+            self.log.append({'scenario': scenario, 'method': method, 'path': path, 'status': response['status'],
+                             'body': request_body})
+
+        body = json.dumps(response.get('body', None)).encode()
+        etag = '"{}"'.format(hashlib.sha1(body).hexdigest())
+        if method == 'GET' and response['status'] == 200 and handler.headers.get('If-None-Match', None) == etag:
+            handler.send_response(304)
+            handler.send_header('ETag', etag)
+            handler.end_headers()
+            return
+
+        handler.send_response(response['status'])
+        handler.send_header('Content-Type', 'application/json')
+        handler.send_header('Content-Length', str(len(body)))
+        if method == 'GET' and response['status'] == 200:
+            handler.send_header('ETag', etag)
+        for name, value in response.get('headers', {}).items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def _get_response(self, key, method, path, query, request_body):
+        """ Get the response to a request from the fixtures, or record it from :obj:`record_endpoint`
+
+        Args:
+            key (:obj:`str`): key of the request (``<METHOD> <path>``)
+            method (:obj:`str`): HTTP method
+            path (:obj:`str`): path of the request, relative to the endpoint
+            query (:obj:`str`): query string of the request (e.g., the API token)
+            request_body (:obj:`object`): JSON-decoded body of the request
+
+        Returns:
+            :obj:`dict`: response with the keys ``status``, ``body``, and optionally ``headers``
+        """
+        with self._lock:
+            fixture = self.fixtures.get(key, None)
+            if isinstance(fixture, list):
+                i_response = self._n_served[key]
+                self._n_served[key] += 1
+                fixture = fixture[min(i_response, len(fixture) - 1)] if fixture else None
+
+        if fixture is not None:
+            return fixture
+
+        if not self.record_endpoint:
+            return {'status': 404, 'body': {'message': 'Not found'}}
+
+        url = self.record_endpoint + path + ('?' + query if query else '')
+        recorded_response = requests.request(method, url, json=request_body)
+        try:
+            body = recorded_response.json()
+        except ValueError:
+            body = None
+        fixture = {'status': recorded_response.status_code, 'body': body}
+        headers = {name: value for name, value in recorded_response.headers.items()
+                   if name.lower() not in self.UNRECORDED_HEADERS}
+        if headers:
+            fixture['headers'] = headers
+        with self._lock:
+            self.fixtures[key] = fixture
+        return fixture
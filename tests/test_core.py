@@ -30,16 +30,21 @@ from glob import glob
 from jinja2 import Template
 from karr_lab_build_utils import __main__
 from karr_lab_build_utils import core
+from karr_lab_build_utils import testing
 from pkg_resources import resource_filename
 from sphinx.application import Sphinx
 import abduct
 import attrdict
 import base64
 import capturer
+import collections
+import concurrent.futures
 import configparser
+import coverage
 import ftputil
 import git
 import github
+import hashlib
 import imp
 import json
 import karr_lab_build_utils
@@ -48,6 +53,7 @@ import karr_lab_build_utils.config.core
 import mock
 import nose
 import os
+import pickle
 import pytest
 import re
 import requests
@@ -62,6 +68,7 @@ import yaml
 
 # reload modules to get coverage correct
 imp.reload(core)
+imp.reload(testing)
 imp.reload(karr_lab_build_utils)
 imp.reload(karr_lab_build_utils.__init__)
 imp.reload(karr_lab_build_utils.config.core)
@@ -567,6 +574,7 @@ class TestKarrLabBuildUtils(unittest.TestCase):
     def test_run_tests(self):
         self.help_run('pytest', coverage_type=core.CoverageType.branch)
         self.help_run('nose', coverage_type=core.CoverageType.branch)
+        self.help_run('pytest', coverage_type=core.CoverageType.fast)
         with self.assertRaisesRegex(core.BuildHelperError, '^Unsupported coverage type: '):
             self.help_run('pytest', coverage_type=core.CoverageType.multiple_condition)
 
@@ -626,6 +634,20 @@ class TestKarrLabBuildUtils(unittest.TestCase):
 
         shutil.rmtree(tempdirname)
 
+    def test_start_fast_coverage(self):
+        prev_core = os.environ.get('COVERAGE_CORE', None)
+
+        if hasattr(sys, 'monitoring'):
+            cov = core.BuildHelper._start_fast_coverage(data_file=os.path.join(self.tmp_dirname, '.coverage'))
+            cov.stop()
+            self.assertEqual(dict(cov.sys_info())['core'], 'SysMonitor')
+        else:
+            with pytest.warns(UserWarning, match='sys.monitoring is not available'):
+                cov = core.BuildHelper._start_fast_coverage(data_file=os.path.join(self.tmp_dirname, '.coverage'))
+            cov.stop()
+
+        self.assertEqual(os.environ.get('COVERAGE_CORE', None), prev_core)
+
     @unittest.skip('Todo')
     def test_run_tests_multiple_workers(self):
         pass
@@ -788,6 +810,90 @@ class TestKarrLabBuildUtils(unittest.TestCase):
         with self.assertRaisesRegex(core.BuildHelperError, '^Unsupported environment:'):
             build_helper.run_tests(test_path=self.DUMMY_TEST, environment=None)
 
+    def test_TaskScheduler(self):
+        finished = []
+
+        def task(name, fail=False):
+            time.sleep(0.05)
+            finished.append(name)
+            if fail:
+                raise ValueError(name)
+            return name
+
+        scheduler = core.TaskScheduler()
+        scheduler.add_task('a', task, args=('a',))
+        scheduler.add_task('b', task, args=('b',))
+        scheduler.add_task('c', task, args=('c',), dependencies=['a', 'b'])
+        scheduler.add_task('pid', os.getpid, executor=core.TaskExecutor.process)
+        scheduler.add_task('d', task, args=('d',), kwargs={'fail': True})
+        scheduler.add_task('e', task, args=('e',), dependencies=['d'])
+        scheduler.add_task('f', task, args=('f',), dependencies=['e'])
+        scheduler.add_task('g', task, dependencies=['a'], dependency_kwargs={'name': 'a'})
+
+        with self.assertRaisesRegex(core.BuildHelperError, 'has already been added'):
+            scheduler.add_task('a', task, args=('a',))
+        with self.assertRaisesRegex(core.BuildHelperError, 'must be added before the task'):
+            scheduler.add_task('h', task, args=('h',), dependencies=['i'])
+        with self.assertRaisesRegex(core.BuildHelperError, 'must be a dependency'):
+            scheduler.add_task('h', task, dependency_kwargs={'name': 'a'})
+
+        with self.assertRaisesRegex(ValueError, '^d$'):
+            scheduler.run()
+        self.assertGreater(finished.index('c'), finished.index('a'))
+        self.assertGreater(finished.index('c'), finished.index('b'))
+        self.assertEqual(set(finished), set(['a', 'b', 'c', 'd']))
+        self.assertEqual(finished.count('a'), 2)
+        self.assertEqual(scheduler.results['c'], 'c')
+        self.assertEqual(scheduler.results['g'], 'a')
+        self.assertNotEqual(scheduler.results['pid'], os.getpid())
+        self.assertEqual(list(scheduler.errors.keys()), ['d'])
+        self.assertEqual(scheduler.skipped, ['e', 'f'])
+
+        results = scheduler.run(raise_errors=False)
+        self.assertEqual(sorted(results.keys()), ['a', 'b', 'c', 'g', 'pid'])
+
+    def test_Tracer(self):
+        # disabled tracer
+        tracer = core.Tracer()
+        with tracer.span('noop', attrs={'key': 'value'}) as span:
+            span.set('key', 'value')
+        self.assertEqual(tracer.events, [])
+        tracer.save()
+
+        # enabled tracer
+        filename = os.path.join(self.tmp_dirname, 'logs', 'trace.json')
+        tracer = core.Tracer(filename)
+        tracer.redact('secret-token', None)
+        with tracer.span('outer', attrs={'cmd': 'upload -r secret-token'}) as span:
+            span.set('status_code', 200)
+            with self.assertRaises(ValueError):
+                with tracer.span('inner', category='subprocess'):
+                    raise ValueError()
+        tracer.save()
+
+        with open(filename, 'r') as file:
+            trace = json.load(file)
+        events = [event for event in trace['traceEvents'] if event['ph'] == 'X']
+        self.assertEqual([event['name'] for event in events], ['inner', 'outer'])
+        self.assertEqual(events[0]['cat'], 'subprocess')
+        self.assertEqual(events[0]['args'], {'error': 'ValueError'})
+        self.assertEqual(events[1]['args'], {'cmd': 'upload -r ***', 'status_code': 200})
+        self.assertGreaterEqual(events[1]['dur'], events[0]['dur'])
+        self.assertEqual(len([event for event in trace['traceEvents'] if event['ph'] == 'M']), 1)
+
+        # build helper methods
+        build_helper = self.construct_build_helper()
+        build_helper.tracer = tracer
+        with mock.patch('subprocess.check_call', return_value=None):
+            build_helper._install_requirements_helper(['six'])
+        self.assertEqual(tracer.events[-1]['cat'], 'subprocess')
+        self.assertRegex(tracer.events[-1]['args']['cmd'], r'^pip\d+\.\d+ install -r ')
+
+        with self.assertWarnsRegex(UserWarning, 'No coverage file exists'):
+            build_helper.make_coverage_report(coverage_dirname=self.tmp_dirname)
+        self.assertEqual(tracer.events[-1]['name'], 'make_coverage_report')
+        self.assertEqual(tracer.events[-1]['args'], {'coverage_dirname': self.tmp_dirname})
+
     def test_do_post_test_tasks(self):
         down_pkgs_return = ([], {})
         notify_return = {
@@ -797,12 +903,23 @@ class TestKarrLabBuildUtils(unittest.TestCase):
             'is_other_error': False,
             'is_new_downstream_error': False,
         }
-        with mock.patch.object(core.BuildHelper, 'make_and_archive_reports', return_value=None):
-            with mock.patch.object(core.BuildHelper, 'trigger_tests_of_downstream_dependencies', return_value=down_pkgs_return):
-                with mock.patch.object(core.BuildHelper, 'send_email_notifications', return_value=notify_return):
+        with mock.patch.object(core.BuildHelper, 'make_and_archive_reports', return_value=None) as make_and_archive_reports:
+            with mock.patch.object(core.BuildHelper, 'trigger_tests_of_downstream_dependencies',
+                                   return_value=down_pkgs_return) as trigger_tests_of_downstream_dependencies:
+                with mock.patch.object(core.BuildHelper, 'send_email_notifications',
+                                       return_value=notify_return) as send_email_notifications:
                     # test api
                     build_helper = self.construct_build_helper()
-                    build_helper.do_post_test_tasks(False, False)
+                    test_results = core.TestResults()
+                    with mock.patch.object(core.BuildHelper, 'get_test_results',
+                                           return_value=test_results) as get_test_results:
+                        build_helper.do_post_test_tasks(False, False)
+
+                    # the test results are loaded once and shared by the concurrent tasks
+                    get_test_results.assert_called_once_with()
+                    self.assertIs(make_and_archive_reports.call_args[1]['test_results'], test_results)
+                    self.assertIs(trigger_tests_of_downstream_dependencies.call_args[1]['test_results'], test_results)
+                    self.assertIs(send_email_notifications.call_args[1]['test_results'], test_results)
 
                     # test cli
                     with self.construct_environment():
@@ -907,10 +1024,253 @@ class TestKarrLabBuildUtils(unittest.TestCase):
         self.assertEqual(test_results.get_num_skipped(), 1)
         self.assertEqual(test_results.get_num_errors(), 0)
         self.assertEqual(test_results.get_num_failures(), 0)
+        self.assertEqual(test_results.group_by('type'), {
+            core.TestCaseResultType.passed: 3,
+            core.TestCaseResultType.skipped: 1,
+        })
+        self.assertEqual(test_results.group_by('filename', 'type')[('/script.py', core.TestCaseResultType.skipped)], 1)
+        self.assertEqual(test_results.group_by('python_version'), {'2.7.12': 4})
+
+        skipped_case = next(case for case in test_results.cases if case.type == core.TestCaseResultType.skipped)
+        self.assertIsInstance(skipped_case._stdout, core.XmlText)
+        self.assertEqual(skipped_case.stdout, 'stdout')
+        self.assertEqual(skipped_case.stderr, 'stderr')
+        self.assertEqual(skipped_case.subtype, 'skip')
+        self.assertEqual(skipped_case.message, 'msg')
+        self.assertEqual(skipped_case.details, 'details')
+        self.assertEqual(skipped_case.filename, '/script.py')
+        self.assertEqual(skipped_case.line, 1)
 
         # cleanup
         os.remove(filename)
 
+    def test_get_test_results_escaped_text(self):
+        filename = os.path.join(self.tmp_dirname, 'latest.0-1.3.7.3.xml')
+        with open(filename, 'wb') as file:
+            file.write('<?xml version="1.0" encoding="utf-8"?>'.encode())
+            file.write('<testsuite errors="0" failures="1" skips="0" tests="2">'.encode())
+            file.write('  <testcase classname="tests.core.TestCase" name="test_pass" time="0.01"/>'.encode())
+            file.write('  <testcase classname="tests.core.TestCase" name="test_failure" time="0.01">'.encode())
+            file.write('    <failure type="AssertionError" message="1 &gt; 0">a &lt; b<![CDATA[ <c> ]]>\u00e9</failure>'.encode())
+            file.write('    <system-out></system-out>'.encode())
+            file.write('  </testcase>'.encode())
+            file.write('</testsuite>'.encode())
+
+        cases = core.BuildHelper._parse_test_results_file(filename, '3.7.3')
+        self.assertEqual(len(cases), 2)
+
+        self.assertEqual(cases[0].type, core.TestCaseResultType.passed)
+        self.assertEqual(cases[0].stdout, None)
+        self.assertEqual(cases[0].details, None)
+
+        self.assertEqual(cases[1].type, core.TestCaseResultType.failure)
+        self.assertEqual(cases[1].message, '1 > 0')
+        self.assertEqual(cases[1].details, 'a < b <c> \u00e9')
+        self.assertEqual(cases[1].stdout, '')
+        self.assertEqual(cases[1].stderr, None)
+
+    def test_get_test_results_cache(self):
+        build_helper = self.construct_build_helper(build_num=1)
+        build_helper.proj_tests_xml_dir = self.tmp_dirname
+
+        for i_worker in range(2):
+            filename = os.path.join(self.tmp_dirname, '{0}.{1}-2.3.7.3.xml'.format(
+                build_helper.proj_tests_xml_latest_filename, i_worker))
+            with open(filename, 'w') as file:
+                file.write('<?xml version="1.0" encoding="utf-8"?>')
+                file.write('<testsuite errors="0" failures="1" skips="0" tests="2">')
+                file.write('  <testcase classname="tests.core.TestCase" name="test_pass_{}" time="0.01"/>'.format(i_worker))
+                file.write('  <testcase classname="tests.core.TestCase" name="test_failure_{}" time="0.01">'.format(i_worker))
+                file.write('    <failure type="AssertionError" message="msg">details</failure>')
+                file.write('  </testcase>')
+                file.write('</testsuite>')
+
+        # parse files in parallel and save them to the cache
+        test_results = build_helper.get_test_results()
+        self.assertEqual(test_results.get_num_tests(), 4)
+        self.assertEqual(test_results.get_num_failures(), 2)
+        self.assertTrue(os.path.isfile(os.path.join(self.tmp_dirname, build_helper.TEST_RESULTS_CACHE_FILENAME)))
+
+        # read results from the cache
+        build_helper_2 = self.construct_build_helper(build_num=1)
+        build_helper_2.proj_tests_xml_dir = self.tmp_dirname
+        with mock.patch.object(core.BuildHelper, '_parse_test_results_file', side_effect=Exception('Parsed')):
+            test_results = build_helper_2.get_test_results()
+        self.assertEqual(test_results.get_num_tests(), 4)
+        self.assertEqual(test_results.get_num_failures(), 2)
+        self.assertEqual(sorted(case.details for case in test_results.cases if case.details), ['details', 'details'])
+
+        # reparse modified files
+        with open(filename, 'w') as file:
+            file.write('<?xml version="1.0" encoding="utf-8"?>')
+            file.write('<testsuite errors="0" failures="0" skips="0" tests="1">')
+            file.write('  <testcase classname="tests.core.TestCase" name="test_pass" time="0.01"/>')
+            file.write('</testsuite>')
+        os.utime(filename, ns=(0, 0))
+        test_results = build_helper_2.get_test_results()
+        self.assertEqual(test_results.get_num_tests(), 3)
+        self.assertEqual(test_results.get_num_failures(), 1)
+
+        # concurrent calls
+        os.remove(os.path.join(self.tmp_dirname, build_helper.TEST_RESULTS_CACHE_FILENAME))
+        build_helper_3 = self.construct_build_helper(build_num=1)
+        build_helper_3.proj_tests_xml_dir = self.tmp_dirname
+        with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(lambda i: build_helper_3.get_test_results(), range(8)))
+        self.assertEqual([test_results.get_num_tests() for test_results in results], [3] * 8)
+        self.assertEqual(sorted(os.listdir(self.tmp_dirname)), sorted([
+            build_helper.TEST_RESULTS_CACHE_FILENAME,
+            '{0}.0-2.3.7.3.xml'.format(build_helper.proj_tests_xml_latest_filename),
+            '{0}.1-2.3.7.3.xml'.format(build_helper.proj_tests_xml_latest_filename),
+        ]))
+
+        # the build helper and its bound methods can be sent to other processes
+        find_missing_requirements = pickle.loads(pickle.dumps(build_helper_3.find_missing_requirements))
+        self.assertEqual(find_missing_requirements.__func__, core.BuildHelper.find_missing_requirements)
+        build_helper_4 = pickle.loads(pickle.dumps(build_helper_3))
+        self.assertIsNot(build_helper_4._parsed_test_results_files_lock, build_helper_3._parsed_test_results_files_lock)
+        self.assertEqual(build_helper_4.get_test_results().get_num_tests(), 3)
+
+    def test_TestResults(self):
+        test_results = core.TestResults()
+        for i_case, (classname, type) in enumerate([
+                ('tests.core.TestCase', core.TestCaseResultType.passed),
+                ('tests.core.TestCase', core.TestCaseResultType.failure),
+                ('tests.main.TestCase', core.TestCaseResultType.error),
+                ('tests.main.TestCase', core.TestCaseResultType.passed),
+        ]):
+            case = core.TestCaseResult()
+            case.classname = classname
+            case.name = 'test_{}'.format(i_case)
+            case.python_version = '3.7.3'
+            case.time = 0.5
+            case.type = type
+            test_results.add_case(case)
+
+        self.assertEqual(test_results.num_tests, 4)
+        self.assertEqual(test_results.num_passed, 2)
+        self.assertEqual(test_results.num_skipped, 0)
+        self.assertEqual(test_results.num_errors, 1)
+        self.assertEqual(test_results.num_failures, 1)
+        self.assertEqual(test_results.get_total_time(), 2.)
+
+        self.assertEqual(test_results.group_by('classname', 'type'), {
+            ('tests.core.TestCase', core.TestCaseResultType.passed): 1,
+            ('tests.core.TestCase', core.TestCaseResultType.failure): 1,
+            ('tests.main.TestCase', core.TestCaseResultType.error): 1,
+            ('tests.main.TestCase', core.TestCaseResultType.passed): 1,
+        })
+        self.assertEqual(test_results.get_time_by('classname'), {
+            'tests.core.TestCase': 1.,
+            'tests.main.TestCase': 1.,
+        })
+
+        with self.assertRaisesRegex(core.BuildHelperError, 'cannot be grouped by'):
+            test_results.group_by('name')
+        with self.assertRaisesRegex(core.BuildHelperError, 'At least one attribute'):
+            test_results.group_by()
+
+    def test_TestResultsDiff(self):
+        def make_test_results(types):
+            test_results = core.TestResults()
+            for name, type in types.items():
+                case = core.TestCaseResult()
+                case.classname = 'tests.core.TestCase'
+                case.name = name
+                case.python_version = '3.7.3'
+                case.time = 0.1
+                case.type = core.TestCaseResultType[type]
+                test_results.add_case(case)
+            return test_results
+
+        prev_test_results = make_test_results({
+            'test_new_failure': 'passed',
+            'test_old_failure': 'failure',
+            'test_fixed': 'error',
+            'test_pass': 'passed',
+            'test_removed': 'failure',
+        })
+        test_results = make_test_results({
+            'test_new_failure': 'failure',
+            'test_old_failure': 'failure',
+            'test_fixed': 'passed',
+            'test_pass': 'passed',
+            'test_added_error': 'error',
+            'test_added_pass': 'passed',
+        })
+
+        diff = test_results.diff(prev_test_results)
+        self.assertEqual([case.name for case in diff.new_failures], ['test_new_failure'])
+        self.assertEqual([case.name for case in diff.old_failures], ['test_old_failure'])
+        self.assertEqual([case.name for case in diff.fixed], ['test_fixed'])
+        self.assertEqual([case.name for case in diff.added], ['test_added_error', 'test_added_pass'])
+        self.assertEqual([case.name for case in diff.removed], ['test_removed'])
+        self.assertEqual([case.name for case in diff.newly_failing], ['test_new_failure', 'test_added_error'])
+        self.assertEqual(diff.get_num_new_failing(), 2)
+        self.assertEqual(diff.num_prev_failing, 3)
+
+    def test_get_test_results_status_with_history(self):
+        build_helper = self.construct_build_helper(build_num=5)
+        build_helper.test_history_filename = os.path.join(self.tmp_dirname, 'test_history.sqlite')
+
+        def make_test_results(type):
+            test_results = core.TestResults()
+            case = core.TestCaseResult()
+            case.classname = 'tests.core.TestCase'
+            case.name = 'test'
+            case.python_version = '3.7.3'
+            case.time = 0.1
+            case.type = type
+            test_results.add_case(case)
+            return test_results
+
+        history = build_helper.get_test_history()
+        history.add_results(make_test_results(core.TestCaseResultType.passed), build_helper.repo_name, 4)
+        history.close()
+
+        test_results = make_test_results(core.TestCaseResultType.failure)
+        with mock.patch.object(core.BuildHelper, 'run_circleci_api', side_effect=Exception('API was called')):
+            status = build_helper.get_test_results_status(test_results, False, True, False)
+        self.assertEqual(status['is_new_error'], True)
+        self.assertEqual(status['is_old_error'], False)
+        self.assertEqual(status['is_fixed'], False)
+
+        diff = build_helper.get_test_results_diff(test_results)
+        self.assertEqual([case.name for case in diff.newly_failing], ['test'])
+
+        history = build_helper.get_test_history()
+        history.add_results(make_test_results(core.TestCaseResultType.failure), build_helper.repo_name, 4)
+        history.close()
+        with mock.patch.object(core.BuildHelper, 'run_circleci_api', side_effect=Exception('API was called')):
+            status = build_helper.get_test_results_status(test_results, False, True, False)
+            self.assertEqual(status['is_new_error'], False)
+            self.assertEqual(status['is_old_error'], True)
+
+            status = build_helper.get_test_results_status(make_test_results(core.TestCaseResultType.passed), False, False, False)
+            self.assertEqual(status['is_fixed'], True)
+
+        # builds are fixed if the previous build failed without failing test cases (e.g., an installation error)
+        history = build_helper.get_test_history()
+        history.add_results(make_test_results(core.TestCaseResultType.passed), build_helper.repo_name, 4)
+        history.close()
+        passed_test_results = make_test_results(core.TestCaseResultType.passed)
+        with mock.patch.object(core.BuildHelper, 'get_circleci_build', return_value={'status': 'failed'}):
+            status = build_helper.get_test_results_status(passed_test_results, False, False, False)
+            self.assertEqual(status['is_fixed'], True)
+        with mock.patch.object(core.BuildHelper, 'get_circleci_build', return_value={'status': 'success'}):
+            status = build_helper.get_test_results_status(passed_test_results, False, False, False)
+            self.assertEqual(status['is_fixed'], False)
+
+        # the results aren't compared with older builds because the database may not contain the previous build
+        build_helper.build_num = 6
+        self.assertEqual(build_helper.get_test_results_diff(test_results), None)
+        with mock.patch.object(core.BuildHelper, 'get_circleci_build',
+                               return_value={'status': 'failed'}) as mock_get_circleci_build:
+            status = build_helper.get_test_results_status(test_results, False, True, False)
+        mock_get_circleci_build.assert_called_once_with(5)
+        self.assertEqual(status['is_new_error'], False)
+        self.assertEqual(status['is_old_error'], True)
+
     def test_send_email_notifications_no_failure(self):
         build_helper = self.construct_build_helper(build_num=1)
 
@@ -974,7 +1334,7 @@ class TestKarrLabBuildUtils(unittest.TestCase):
 
         with self.construct_environment(build_num=1):
             build_helper = self.construct_build_helper(build_num=1)
-            with mock.patch('requests.get', side_effect=[requests_get_1]):
+            with mock.patch('requests.Session.get', side_effect=[requests_get_1]):
                 with mock.patch('smtplib.SMTP', return_value=smtp):
                     result = build_helper.send_email_notifications(False, False, False, static_analyses)
                     self.assertEqual(result, {
@@ -1063,7 +1423,7 @@ class TestKarrLabBuildUtils(unittest.TestCase):
             'unused_requirements': ['unused_1', 'unused_2'],
         }
 
-        with mock.patch('requests.get', side_effect=[requests_get_1, requests_get_2]):
+        with mock.patch('requests.Session.get', side_effect=[requests_get_1, requests_get_2]):
             with mock.patch('smtplib.SMTP', return_value=smtp):
                 result = build_helper.send_email_notifications(False, False, False, static_analyses)
                 self.assertEqual(result, {
@@ -1141,7 +1501,7 @@ class TestKarrLabBuildUtils(unittest.TestCase):
             'unused_requirements': ['unused_1', 'unused_2'],
         }
 
-        with mock.patch('requests.get', side_effect=[requests_get_1]):
+        with mock.patch('requests.Session.get', side_effect=[requests_get_1]):
             with mock.patch('smtplib.SMTP', return_value=smtp):
                 result = build_helper.send_email_notifications(False, False, False, static_analyses)
                 self.assertEqual(result, {
@@ -1227,7 +1587,7 @@ class TestKarrLabBuildUtils(unittest.TestCase):
             'unused_requirements': ['unused_1', 'unused_2'],
         }
 
-        with mock.patch('requests.get', side_effect=[requests_get_1]):
+        with mock.patch('requests.Session.get', side_effect=[requests_get_1]):
             with mock.patch('smtplib.SMTP', return_value=smtp):
                 with env:
                     build_helper = self.construct_build_helper(build_num=1)
@@ -1321,7 +1681,7 @@ class TestKarrLabBuildUtils(unittest.TestCase):
 
         with env:
             build_helper = self.construct_build_helper(build_num=51)
-            with mock.patch('requests.get', side_effect=[requests_get_1, requests_get_2]):
+            with mock.patch('requests.Session.get', side_effect=[requests_get_1, requests_get_2]):
                 with mock.patch('smtplib.SMTP', return_value=smtp):
                     result = build_helper.send_email_notifications(False, False, False, static_analyses)
                     self.assertEqual(result, {
@@ -1384,7 +1744,7 @@ class TestKarrLabBuildUtils(unittest.TestCase):
 
         with env:
             build_helper = self.construct_build_helper(build_num=51)
-            with mock.patch('requests.get', side_effect=[requests_get_1]):
+            with mock.patch('requests.Session.get', side_effect=[requests_get_1]):
                 with mock.patch('smtplib.SMTP', return_value=smtp):
                     result = build_helper.send_email_notifications(False, True, False, static_analyses)
                     self.assertEqual(result, {
@@ -1485,7 +1845,7 @@ class TestKarrLabBuildUtils(unittest.TestCase):
 
         with env:
             build_helper = self.construct_build_helper(build_num=51)
-            with mock.patch('requests.get', side_effect=[requests_get_1,
+            with mock.patch('requests.Session.get', side_effect=[requests_get_1,
                                                          requests_get_2,
                                                          requests_get_3]):
                 with mock.patch('smtplib.SMTP', return_value=smtp):
@@ -1558,7 +1918,7 @@ class TestKarrLabBuildUtils(unittest.TestCase):
 
         with self.construct_environment(build_num=1):
             build_helper = self.construct_build_helper(build_num=1)
-            with mock.patch('requests.get', side_effect=[requests_get_1]):
+            with mock.patch('requests.Session.get', side_effect=[requests_get_1]):
                 with mock.patch('smtplib.SMTP', return_value=smtp):
                     result = build_helper.send_email_notifications(False, False, False, static_analyses)
                     self.assertEqual(result, {
@@ -1615,7 +1975,10 @@ class TestKarrLabBuildUtils(unittest.TestCase):
         )
 
         """ test API """
-        build_helper.make_and_archive_reports(coverage_dirname=self.tmp_dirname, dry_run=True)
+        with mock.patch.object(core.CoverageModel, 'load', wraps=core.CoverageModel.load) as mock_load:
+            build_helper.make_and_archive_reports(coverage_dirname=self.tmp_dirname, dry_run=True)
+        # the coverage model is loaded once for the HTML report and the reporters, and once for the changed lines
+        self.assertEqual(len([call for call in mock_load.call_args_list if 'filenames' not in call[1]]), 1)
 
         """ test CLI """
         with self.construct_environment():
@@ -1694,6 +2057,80 @@ class TestKarrLabBuildUtils(unittest.TestCase):
             with self.assertRaisesRegex(core.BuildHelperError, '^Error uploading report to test history server:'):
                 build_helper.archive_test_report()
 
+    def test_archive_test_results_to_history(self):
+        build_helper = self.construct_build_helper(build_num=3)
+        build_helper.test_history_filename = os.path.join(self.tmp_dirname, 'test_history.sqlite')
+
+        test_results = core.TestResults()
+        case = core.TestCaseResult()
+        case.classname = 'tests.core.TestCase'
+        case.name = 'test_pass'
+        case.python_version = '3.7.3'
+        case.time = 0.5
+        case.type = core.TestCaseResultType.passed
+        test_results.add_case(case)
+
+        """ test API """
+        build_helper.archive_test_results_to_history(test_results=test_results)
+
+        history = build_helper.get_test_history()
+        self.assertEqual([build[0:3] for build in history.get_builds(build_helper.repo_name)],
+                         [(3, 'master', '--test--')])
+        self.assertEqual(history.get_duration_trend(build_helper.repo_name, 'tests.core.TestCase', 'test_pass'),
+                         [(3, '3.7.3', 0.5)])
+        history.close()
+
+        """ test CLI """
+        with self.construct_environment():
+            with mock.patch.object(core.BuildHelper, 'get_test_history', return_value=core.TestHistory(
+                    build_helper.test_history_filename)):
+                with capturer.CaptureOutput(merged=False, relay=False) as captured:
+                    with __main__.App(argv=['test-history', 'duration-trend', 'tests.core.TestCase', 'test_pass']) as app:
+                        app.run()
+                        self.assertRegex(captured.stdout.get_text(), '3\t3.7.3\t0.5')
+
+    def test_TestHistory(self):
+        history = core.TestHistory(os.path.join(self.tmp_dirname, 'test_history.sqlite'))
+
+        outcomes = {
+            'test_pass': ['passed', 'passed', 'passed', 'passed'],
+            'test_flaky': ['passed', 'failure', 'passed', 'failure'],
+            'test_broken': ['passed', 'passed', 'error', 'failure'],
+            'test_skipped': ['skipped', 'skipped', 'skipped', 'skipped'],
+        }
+        for i_build in range(4):
+            test_results = core.TestResults()
+            for name, types in outcomes.items():
+                case = core.TestCaseResult()
+                case.classname = 'tests.core.TestCase'
+                case.name = name
+                case.python_version = '3.7.3'
+                case.time = float(i_build + 1)
+                case.type = core.TestCaseResultType[types[i_build]]
+                test_results.add_case(case)
+            history.add_results(test_results, 'repo', i_build + 1, repo_revision='sha-{}'.format(i_build + 1))
+
+        # re-adding results of a build replaces them
+        history.add_results(test_results, 'repo', 4, repo_revision='sha-4')
+        self.assertEqual(len(history.get_builds('repo')), 4)
+        self.assertEqual(len(history.get_test_time_series('repo', 'tests.core.TestCase', 'test_pass')), 4)
+
+        self.assertEqual(history.get_flake_rates('repo'), [
+            ('tests.core.TestCase', 'test_flaky', '3.7.3', 4, 1.),
+            ('tests.core.TestCase', 'test_broken', '3.7.3', 4, 1. / 3.),
+        ])
+        self.assertEqual(history.get_flake_rates('repo', min_builds=5), [])
+
+        self.assertEqual(history.get_first_failing_build('repo', 'tests.core.TestCase', 'test_broken'), 3)
+        self.assertEqual(history.get_first_failing_build('repo', 'tests.core.TestCase', 'test_flaky'), 4)
+        self.assertEqual(history.get_first_failing_build('repo', 'tests.core.TestCase', 'test_pass'), None)
+
+        self.assertEqual(history.get_duration_trend('repo', 'tests.core.TestCase', 'test_pass', python_version='3.7.3'),
+                         [(1, '3.7.3', 1.), (2, '3.7.3', 2.), (3, '3.7.3', 3.), (4, '3.7.3', 4.)])
+        self.assertEqual(history.get_duration_trend('repo', 'tests.core.TestCase', 'test_skipped'), [])
+
+        history.close()
+
     def test_combine_coverage_reports(self):
         build_helper = self.construct_build_helper()
         build_helper.run_tests(
@@ -1718,6 +2155,21 @@ class TestKarrLabBuildUtils(unittest.TestCase):
         self.assertTrue(os.path.isfile(os.path.join(self.tmp_dirname, '.coverage')))
         self.assertTrue(os.path.isfile(os.path.join(self.tmp_dirname, '.coverage.0-1.1')))
         self.assertTrue(os.path.isfile(os.path.join(self.tmp_dirname, '.coverage.0-1.2')))
+        with open(os.path.join(self.tmp_dirname, build_helper.COVERAGE_MANIFEST_FILENAME), 'r') as file:
+            self.assertEqual(sorted(json.load(file).keys()), ['.coverage.0-1.1', '.coverage.0-1.2'])
+
+        """ test that reports which have already been combined are skipped """
+        with mock.patch.object(core.BuildHelper, '_update_coverage_data') as update_coverage_data:
+            build_helper.combine_coverage_reports(coverage_dirname=self.tmp_dirname)
+        update_coverage_data.assert_not_called()
+
+        shutil.copyfile(
+            os.path.join(self.tmp_dirname, '.coverage.0-1.1'),
+            os.path.join(self.tmp_dirname, '.coverage.0-1.3'))
+        with mock.patch.object(core.BuildHelper, '_update_coverage_data',
+                               side_effect=core.BuildHelper._update_coverage_data) as update_coverage_data:
+            build_helper.combine_coverage_reports(coverage_dirname=self.tmp_dirname)
+        self.assertEqual(update_coverage_data.call_count, 1)
 
         """ test CLI """
         if os.path.isfile(os.path.join(self.tmp_dirname, '.coverage')):
@@ -1758,6 +2210,169 @@ class TestKarrLabBuildUtils(unittest.TestCase):
             with __main__.App(argv=['archive-coverage-report', '--coverage-dirname', self.tmp_dirname, '--dry-run']) as app:
                 app.run()
 
+    def test_get_coverage_model(self):
+        build_helper = self.construct_build_helper()
+        build_helper.run_tests(
+            test_path=self.DUMMY_TEST,
+            with_xunit=True,
+            with_coverage=True, coverage_dirname=self.tmp_dirname)
+
+        build_helper.combine_coverage_reports(coverage_dirname=self.tmp_dirname)
+
+        model = build_helper.get_coverage_model(coverage_dirname=self.tmp_dirname)
+        self.assertIsInstance(model, core.CoverageModel)
+        self.assertGreater(len(model.files), 0)
+
+        summary = model.get_summary()
+        self.assertEqual(summary['n_files'], len(model.files))
+        self.assertGreater(summary['n_statements'], 0)
+        self.assertLessEqual(summary['n_missing'], summary['n_statements'])
+
+        cov = coverage.Coverage(data_file=os.path.join(self.tmp_dirname, '.coverage'))
+        cov.load()
+        with open(os.devnull, 'w') as file:
+            self.assertAlmostEqual(summary['coverage'], cov.report(file=file))
+
+        coveralls_files = model.to_coveralls()
+        self.assertEqual(len(coveralls_files), len(model.files))
+        for file_coverage, coveralls_file in zip(model.files, coveralls_files):
+            self.assertEqual(coveralls_file['name'], file_coverage.filename)
+            self.assertEqual(coveralls_file['coverage'].count(0), len(file_coverage.missing))
+            self.assertEqual(coveralls_file['coverage'].count(1),
+                             len(file_coverage.statements) - len(file_coverage.missing))
+
+        xml_filename = os.path.join(self.tmp_dirname, 'coverage.xml')
+        model.write_cobertura_xml(xml_filename)
+        with open(xml_filename, 'r') as file:
+            self.assertIn('lines-valid="{}"'.format(summary['n_statements']), file.read())
+
+        lcov_filename = os.path.join(self.tmp_dirname, 'coverage.lcov')
+        model.write_lcov(lcov_filename)
+        with open(lcov_filename, 'r') as file:
+            lcov = file.read()
+        self.assertEqual(lcov.count('end_of_record'), len(model.files))
+
+        omitted_model = model.omit([model.files[0].abs_filename])
+        self.assertEqual(len(omitted_model.files), len(model.files) - 1)
+        self.assertEqual(model.omit([]), model)
+
+    def test_get_coverage_model_branch_hits(self):
+        filename = os.path.join(self.tmp_dirname, 'branch_module.py')
+        with open(filename, 'w') as file:
+            file.write('def func(x):\n')
+            file.write('    if x > 0:\n')
+            file.write('        return 1\n')
+            file.write('    return 2\n')
+
+        data_filename = os.path.join(self.tmp_dirname, '.coverage')
+        cov = coverage.Coverage(data_file=data_filename, branch=True)
+        cov.start()
+        sys.path.insert(0, self.tmp_dirname)
+        try:
+            __import__('branch_module').func(-1)
+        finally:
+            sys.path.remove(self.tmp_dirname)
+            sys.modules.pop('branch_module', None)
+            cov.stop()
+        cov.save()
+
+        model = core.CoverageModel.load(data_filename, filenames=[os.path.realpath(filename)])
+        self.assertEqual(len(model.files), 1)
+        file_coverage = model.files[0]
+
+        # only the second exit of the branch (to line 4) was taken
+        self.assertEqual(file_coverage.branch_exits, {2: [(3, False), (4, True)]})
+        self.assertEqual(file_coverage.branches, {2: (2, 1)})
+        self.assertEqual(file_coverage.missing_branches, {2: [3]})
+        self.assertEqual(file_coverage.get_branch_hits(), [(2, 0, 0), (2, 1, 1)])
+        self.assertIn('BRDA:2,0,0,0\nBRDA:2,0,1,1\n', model.to_lcov())
+        self.assertEqual(model.to_coveralls()[0]['branches'], [2, 0, 0, 0, 2, 0, 1, 1])
+
+    def test_make_coverage_report(self):
+        build_helper = self.construct_build_helper()
+        build_helper.run_tests(
+            test_path=self.DUMMY_TEST,
+            with_xunit=True,
+            with_coverage=True, coverage_dirname=self.tmp_dirname)
+
+        build_helper.combine_coverage_reports(coverage_dirname=self.tmp_dirname)
+        model = build_helper.get_coverage_model(coverage_dirname=self.tmp_dirname)
+        html_dirname = os.path.join(self.tmp_dirname, 'html')
+
+        """ test API """
+        rendered = build_helper.make_coverage_report(coverage_dirname=self.tmp_dirname)
+        self.assertEqual(sorted(rendered), sorted(file.filename for file in model.files))
+        self.assertTrue(os.path.isfile(os.path.join(html_dirname, 'index.html')))
+        with open(os.path.join(html_dirname, build_helper.COVERAGE_REPORT_MANIFEST_FILENAME), 'r') as file:
+            manifest = json.load(file)
+        for page_filename, _ in manifest.values():
+            self.assertTrue(os.path.isfile(os.path.join(html_dirname, page_filename)))
+
+        # pages are only rendered if they have changed
+        self.assertEqual(build_helper.make_coverage_report(coverage_dirname=self.tmp_dirname), [])
+
+        filename = model.files[0].filename
+        os.remove(os.path.join(html_dirname, manifest[filename][0]))
+        self.assertEqual(build_helper.make_coverage_report(coverage_dirname=self.tmp_dirname), [filename])
+
+        """ test CLI """
+        with self.construct_environment():
+            with __main__.App(argv=['make-coverage-report', '--coverage-dirname', self.tmp_dirname]) as app:
+                app.run()
+
+    def test_make_coverage_report_no_files(self):
+        build_helper = self.construct_build_helper()
+
+        with pytest.warns(UserWarning, match='No coverage file exists to make a report'):
+            self.assertEqual(build_helper.make_coverage_report(coverage_dirname=self.tmp_dirname), [])
+
+    def test_get_diff_coverage(self):
+        build_helper = self.construct_build_helper()
+
+        repo_dirname = os.path.join(self.tmp_dirname, 'repo')
+        os.makedirs(os.path.join(repo_dirname, 'diff_cov_pkg'))
+        with open(os.path.join(repo_dirname, 'diff_cov_pkg', '__init__.py'), 'w') as file:
+            pass
+        with open(os.path.join(repo_dirname, 'diff_cov_pkg', 'mod.py'), 'w') as file:
+            file.write('def f(x):\n    return 1\n')
+        repo = git.Repo.init(repo_dirname)
+        repo.index.add(['diff_cov_pkg/__init__.py', 'diff_cov_pkg/mod.py'])
+        repo.index.commit('base')
+        repo.create_head('base')
+        with open(os.path.join(repo_dirname, 'diff_cov_pkg', 'mod.py'), 'w') as file:
+            file.write('# comment\ndef f(x):\n    if x:\n        return 1\n    return 2\n\n\ndef g():\n    return 3\n')
+
+        cwd = os.getcwd()
+        os.chdir(repo_dirname)
+        sys.path.insert(0, repo_dirname)
+        try:
+            cov = coverage.Coverage(data_file=os.path.join(repo_dirname, '.coverage'), source=['diff_cov_pkg'])
+            cov.start()
+            import diff_cov_pkg.mod
+            diff_cov_pkg.mod.f(True)
+            cov.stop()
+            cov.save()
+
+            changed_lines = build_helper.get_changed_lines(base='base')
+            self.assertEqual(changed_lines, {
+                os.path.join(os.path.realpath(repo_dirname), 'diff_cov_pkg', 'mod.py'): set([1, 3, 4, 5, 6, 7, 8, 9]),
+            })
+
+            diff_coverage = build_helper.get_diff_coverage(base='base', coverage_dirname=repo_dirname)
+        finally:
+            os.chdir(cwd)
+            sys.path.remove(repo_dirname)
+            sys.modules.pop('diff_cov_pkg.mod', None)
+            sys.modules.pop('diff_cov_pkg', None)
+
+        self.assertEqual(diff_coverage.base, 'base')
+        self.assertEqual(dict(diff_coverage.files), {
+            os.path.join('diff_cov_pkg', 'mod.py'): ([3, 4, 8], [5, 9]),
+        })
+        self.assertEqual(diff_coverage.get_num_covered(), 3)
+        self.assertEqual(diff_coverage.get_num_uncovered(), 2)
+        self.assertEqual(diff_coverage.get_percent(), 60.)
+
     def test_upload_coverage_report_to_coveralls(self):
         build_helper = self.construct_build_helper()
         build_helper.run_tests(
@@ -1800,9 +2415,36 @@ class TestKarrLabBuildUtils(unittest.TestCase):
             os.path.join(self.tmp_dirname, '.coverage.{}-{}.{}'.format(0, 1, build_helper.get_python_version())),
             os.path.join(self.tmp_dirname, '.coverage'))
 
+        build_helper.code_climate_test_reporter_dirname = os.path.join(self.tmp_dirname, 'code_climate')
+        build_helper.code_climate_token = 'code-climate-secret-token'
+
         """ test API """
-        with mock.patch('subprocess.check_call', return_value=None):
+        with mock.patch('subprocess.check_call', return_value=None) as mock_check_call:
             build_helper.upload_coverage_report_to_code_climate(coverage_dirname=self.tmp_dirname)
+        cc_path = build_helper.get_code_climate_test_reporter()
+        payload_filename = os.path.join(self.tmp_dirname, build_helper.CODE_CLIMATE_PAYLOAD_FILENAME)
+        mock_check_call.assert_called_once_with([cc_path, 'upload-coverage', '-i', payload_filename,
+                                                 '-r', build_helper.code_climate_token])
+
+        # the payload, which is archived as a build artifact, doesn't contain the token
+        with open(payload_filename, 'r') as file:
+            self.assertNotIn(build_helper.code_climate_token, file.read())
+
+        with open(payload_filename, 'r') as file:
+            payload = json.load(file)
+        self.assertNotIn('repo_token', payload)
+        self.assertGreater(len(payload['source_files']), 0)
+        self.assertEqual(payload['line_counts']['total'],
+                         payload['line_counts']['covered'] + payload['line_counts']['missed'])
+
+        # dry run doesn't download the reporter
+        shutil.rmtree(build_helper.code_climate_test_reporter_dirname)
+        os.remove(payload_filename)
+        with mock.patch('subprocess.check_call', return_value=None) as mock_check_call:
+            build_helper.upload_coverage_report_to_code_climate(coverage_dirname=self.tmp_dirname, dry_run=True)
+        mock_check_call.assert_not_called()
+        self.assertTrue(os.path.isfile(payload_filename))
+        self.assertFalse(os.path.isdir(build_helper.code_climate_test_reporter_dirname))
 
         """ test CLI """
         with self.construct_environment():
@@ -1813,6 +2455,44 @@ class TestKarrLabBuildUtils(unittest.TestCase):
                 with mock.patch('subprocess.check_call', return_value=None):
                     app.run()
 
+    def test_get_code_climate_test_reporter(self):
+        build_helper = self.construct_build_helper()
+        build_helper.code_climate_test_reporter_dirname = os.path.join(self.tmp_dirname, 'code_climate')
+
+        content = b'reporter'
+        checksum = hashlib.sha256(content).hexdigest()
+
+        def get(url):
+            if url.endswith('.sha256'):
+                return attrdict.AttrDict(text='{}  test-reporter\n'.format(checksum), raise_for_status=lambda: None)
+            return attrdict.AttrDict(content=content, raise_for_status=lambda: None)
+
+        with mock.patch('requests.get', side_effect=get) as mock_get:
+            cc_path = build_helper.get_code_climate_test_reporter()
+            self.assertEqual(mock_get.call_count, 2)
+            with open(cc_path, 'rb') as file:
+                self.assertEqual(file.read(), content)
+            self.assertTrue(os.access(cc_path, os.X_OK))
+
+            # cached
+            self.assertEqual(build_helper.get_code_climate_test_reporter(), cc_path)
+            self.assertEqual(mock_get.call_count, 2)
+
+            # corrupted cache
+            with open(cc_path, 'wb') as file:
+                file.write(b'corrupted')
+            self.assertEqual(build_helper.get_code_climate_test_reporter(), cc_path)
+            self.assertEqual(mock_get.call_count, 4)
+            with open(cc_path, 'rb') as file:
+                self.assertEqual(file.read(), content)
+
+        # invalid checksum
+        os.remove(cc_path)
+        checksum = '0' * 64
+        with mock.patch('requests.get', side_effect=get):
+            with self.assertRaisesRegex(core.BuildHelperError, 'Checksum'):
+                build_helper.get_code_climate_test_reporter()
+
     def test_upload_coverage_report_to_code_climate_no_coverage_files(self):
         build_helper = self.construct_build_helper()
 
@@ -2046,6 +2726,121 @@ class TestKarrLabBuildUtils(unittest.TestCase):
         shutil.rmtree(packages_parent_dir)
         os.remove(config_filename)
 
+    def test_compile_all_downstream_dependencies(self):
+        packages_parent_dir = tempfile.mkdtemp()
+        for pkg, requirements in [('pkg_1', ['dep_1']), ('pkg_2', ['pkg_1']), ('pkg_3', ['pkg_1', 'pkg_2'])]:
+            os.makedirs(os.path.join(packages_parent_dir, pkg, '.circleci'))
+            with open(os.path.join(packages_parent_dir, pkg, '.circleci', 'config.yml'), 'w') as file:
+                pass
+            with open(os.path.join(packages_parent_dir, pkg, 'requirements.txt'), 'w') as file:
+                file.write('\n'.join(requirements) + '\n')
+        with open(os.path.join(packages_parent_dir, 'pkg_1', '.karr_lab_build_utils.yml'), 'w') as file:
+            file.write('downstream_dependencies: []\nstatic_analyses:\n  ignore_unused_requirements: []\n')
+
+        # test api
+        build_helper = core.BuildHelper()
+        build_helper.dependency_index_dirname = tempfile.mkdtemp()
+        deps = build_helper.compile_all_downstream_dependencies(packages_parent_dir=packages_parent_dir)
+        self.assertEqual(deps, {'pkg_1': ['pkg_2', 'pkg_3'], 'pkg_2': ['pkg_3'], 'pkg_3': []})
+
+        with open(os.path.join(packages_parent_dir, 'pkg_1', '.karr_lab_build_utils.yml'), 'r') as file:
+            config = yaml.load(file, Loader=yaml.FullLoader)
+        self.assertEqual(config, {
+            'downstream_dependencies': ['pkg_2', 'pkg_3'],
+            'downstream_dependency_graph': {'pkg_2': ['pkg_3'], 'pkg_3': []},
+            'downstream_dependency_imports': {'pkg_2': [], 'pkg_3': []},
+            'static_analyses': {'ignore_unused_requirements': []},
+        })
+        with open(os.path.join(packages_parent_dir, 'pkg_3', '.karr_lab_build_utils.yml'), 'r') as file:
+            self.assertEqual(yaml.load(file, Loader=yaml.FullLoader), {
+                'downstream_dependencies': [],
+                'downstream_dependency_graph': {},
+                'downstream_dependency_imports': {},
+            })
+
+        # test cli
+        with self.construct_environment():
+            with capturer.CaptureOutput(merged=False, relay=False) as captured:
+                with __main__.App(argv=['compile-all-downstream-dependencies',
+                                        '--packages-parent-dir', packages_parent_dir]) as app:
+                    app.run()
+                    self.assertRegex(captured.stdout.get_text(), 'pkg_1: pkg_2, pkg_3')
+                    self.assertEqual(captured.stderr.get_text(), '')
+
+        # cleanup
+        shutil.rmtree(packages_parent_dir)
+        shutil.rmtree(build_helper.dependency_index_dirname)
+
+    def test_DependencyIndex(self):
+        packages_parent_dir = tempfile.mkdtemp()
+        for pkg, requirements in [('pkg_1', ['dep_1']), ('pkg_2', ['pkg_1']), ('pkg_3', ['mod_1', 'pkg_2'])]:
+            os.makedirs(os.path.join(packages_parent_dir, pkg, '.circleci'))
+            with open(os.path.join(packages_parent_dir, pkg, '.circleci', 'config.yml'), 'w') as file:
+                pass
+            with open(os.path.join(packages_parent_dir, pkg, 'requirements.txt'), 'w') as file:
+                file.write('\n'.join(requirements) + '\n')
+        os.mkdir(os.path.join(packages_parent_dir, 'not_a_pkg'))
+        with open(os.path.join(packages_parent_dir, 'pkg_1', 'setup.cfg'), 'w') as file:
+            file.write('[coverage:run]\nsource = \n    mod_1\n')
+        filename = os.path.join(tempfile.mkdtemp(), 'index.json')
+
+        # build the index in one pass
+        index = core.DependencyIndex(packages_parent_dir, filename=filename).update()
+        self.assertEqual(index.n_parsed, 3)
+        self.assertEqual(sorted(index.packages.keys()), ['pkg_1', 'pkg_2', 'pkg_3'])
+        self.assertEqual(index.packages['pkg_1']['module'], 'mod_1')
+        self.assertEqual(index.upstream, {'pkg_1': [], 'pkg_2': [], 'pkg_3': ['pkg_1', 'pkg_2']})
+        self.assertEqual(index.downstream, {'pkg_1': ['pkg_3'], 'pkg_2': ['pkg_3'], 'pkg_3': []})
+        self.assertEqual(index.get_dependents('mod_1'), ['pkg_3'])
+        self.assertEqual(index.get_dependents('pkg_1'), ['pkg_2'])
+        self.assertEqual(index.get_downstream_closure('pkg_1'), ['pkg_3'])
+        self.assertEqual(index.get_downstream_graph('pkg_1'), {'pkg_3': []})
+        self.assertTrue(os.path.isfile(filename))
+
+        # reload the index and reparse only the changed packages
+        index = core.DependencyIndex(packages_parent_dir, filename=filename)
+        self.assertEqual(index.downstream, {'pkg_1': ['pkg_3'], 'pkg_2': ['pkg_3'], 'pkg_3': []})
+        index.update()
+        self.assertEqual(index.n_parsed, 0)
+
+        with open(os.path.join(packages_parent_dir, 'pkg_2', 'requirements.txt'), 'w') as file:
+            file.write('mod_1\nother_dep\n')
+        shutil.rmtree(os.path.join(packages_parent_dir, 'pkg_3'))
+        index = core.DependencyIndex(packages_parent_dir, filename=filename).update()
+        self.assertEqual(index.n_parsed, 1)
+        self.assertEqual(index.downstream, {'pkg_1': ['pkg_2'], 'pkg_2': []})
+
+        # the requirements of the tests are also indexed
+        os.mkdir(os.path.join(packages_parent_dir, 'pkg_1', 'tests'))
+        with open(os.path.join(packages_parent_dir, 'pkg_1', 'tests', 'requirements.txt'), 'w') as file:
+            file.write('pytest\n')
+        with mock.patch.object(core.DependencyIndex, '_parse_package',
+                               wraps=core.DependencyIndex._parse_package) as mock_parse_package:
+            index = core.DependencyIndex(packages_parent_dir, filename=filename).update()
+        self.assertEqual(index.n_parsed, 1)
+        mock_parse_package.assert_called_once_with(os.path.join(packages_parent_dir, 'pkg_1'))
+        self.assertIn('pytest', index.packages['pkg_1']['requirements'])
+
+        # the index of another directory isn't reused
+        index = core.DependencyIndex(os.path.join(packages_parent_dir, 'pkg_1'), filename=filename)
+        self.assertEqual(index.packages, {})
+
+        # write the downstream dependencies of each package
+        index = core.DependencyIndex(packages_parent_dir).update()
+        self.assertEqual(index.n_parsed, 2)
+        self.assertEqual(index.write_downstream_dependencies(), ['pkg_1', 'pkg_2'])
+        self.assertEqual(index.write_downstream_dependencies(), [])
+        with open(os.path.join(packages_parent_dir, 'pkg_1', '.karr_lab_build_utils.yml'), 'r') as file:
+            self.assertEqual(yaml.load(file, Loader=yaml.FullLoader), {
+                'downstream_dependencies': ['pkg_2'],
+                'downstream_dependency_graph': {'pkg_2': []},
+                'downstream_dependency_imports': {'pkg_2': []},
+            })
+
+        # cleanup
+        shutil.rmtree(packages_parent_dir)
+        shutil.rmtree(os.path.dirname(filename))
+
     def test_are_package_dependencies_acyclic(self):
         packages_parent_dir = tempfile.mkdtemp()
         os.mkdir(os.path.join(packages_parent_dir, 'pkg_1'))
@@ -2060,17 +2855,18 @@ class TestKarrLabBuildUtils(unittest.TestCase):
             pass
         with open(os.path.join(packages_parent_dir, 'pkg_3', '.circleci', 'config.yml'), 'w') as file:
             pass
-        with open(os.path.join(packages_parent_dir, 'pkg_1', '.karr_lab_build_utils.yml'), 'w') as file:
-            file.write('downstream_dependencies:\n  - pkg_2\n')
-        with open(os.path.join(packages_parent_dir, 'pkg_2', '.karr_lab_build_utils.yml'), 'w') as file:
-            file.write('downstream_dependencies:\n  - pkg_3\n')
-        with open(os.path.join(packages_parent_dir, 'pkg_3', '.karr_lab_build_utils.yml'), 'w') as file:
-            file.write('downstream_dependencies: []\n')
+        with open(os.path.join(packages_parent_dir, 'pkg_1', 'requirements.txt'), 'w') as file:
+            pass
+        with open(os.path.join(packages_parent_dir, 'pkg_2', 'requirements.txt'), 'w') as file:
+            file.write('pkg_1\n')
+        with open(os.path.join(packages_parent_dir, 'pkg_3', 'requirements.txt'), 'w') as file:
+            file.write('pkg_2\n')
 
         """ Acyclic """
 
         # test api
         build_helper = core.BuildHelper()
+        build_helper.dependency_index_dirname = self.tmp_dirname
         result = build_helper.are_package_dependencies_acyclic(packages_parent_dir=packages_parent_dir)
         self.assertTrue(result)
 
@@ -2085,11 +2881,10 @@ class TestKarrLabBuildUtils(unittest.TestCase):
 
         """ cyclic """
 
-        with open(os.path.join(packages_parent_dir, 'pkg_3', '.karr_lab_build_utils.yml'), 'w') as file:
-            file.write('downstream_dependencies:\n  - pkg_1\n')
+        with open(os.path.join(packages_parent_dir, 'pkg_1', 'requirements.txt'), 'w') as file:
+            file.write('pkg_3\n')
 
         # test api
-        build_helper = core.BuildHelper()
         result = build_helper.are_package_dependencies_acyclic(packages_parent_dir=packages_parent_dir)
         self.assertFalse(result)
 
@@ -2119,12 +2914,12 @@ class TestKarrLabBuildUtils(unittest.TestCase):
             pass
         with open(os.path.join(packages_parent_dir, 'pkg_3', '.circleci', 'config.yml'), 'w') as file:
             pass
-        with open(os.path.join(packages_parent_dir, 'pkg_1', '.karr_lab_build_utils.yml'), 'w') as file:
-            file.write('downstream_dependencies:\n  - pkg_2\n')
-        with open(os.path.join(packages_parent_dir, 'pkg_2', '.karr_lab_build_utils.yml'), 'w') as file:
-            file.write('downstream_dependencies:\n  - pkg_3\n')
-        with open(os.path.join(packages_parent_dir, 'pkg_3', '.karr_lab_build_utils.yml'), 'w') as file:
-            file.write('downstream_dependencies:\n  - pkg_1\n')
+        with open(os.path.join(packages_parent_dir, 'pkg_1', 'requirements.txt'), 'w') as file:
+            file.write('pkg_3\n')
+        with open(os.path.join(packages_parent_dir, 'pkg_2', 'requirements.txt'), 'w') as file:
+            file.write('pkg_1\n')
+        with open(os.path.join(packages_parent_dir, 'pkg_3', 'requirements.txt'), 'w') as file:
+            file.write('pkg_2\n')
 
         tmp_file, out_filename = tempfile.mkstemp(suffix='.pdf')
         os.close(tmp_file)
@@ -2132,6 +2927,7 @@ class TestKarrLabBuildUtils(unittest.TestCase):
 
         # test api
         build_helper = core.BuildHelper()
+        build_helper.dependency_index_dirname = self.tmp_dirname
         build_helper.visualize_package_dependencies(packages_parent_dir=packages_parent_dir, out_filename=out_filename)
         self.assertTrue(os.path.isfile(out_filename))
 
@@ -2152,6 +2948,273 @@ class TestKarrLabBuildUtils(unittest.TestCase):
         shutil.rmtree(packages_parent_dir)
         os.remove(out_filename)
 
+    def test_DependencyIndex_graph(self):
+        packages_parent_dir = tempfile.mkdtemp()
+        for pkg, requirements in [('pkg_1', []), ('pkg_2', ['pkg_1']), ('pkg_3', ['pkg_1', 'pkg_2']),
+                                  ('pkg_4', ['pkg_3']), ('pkg_5', None)]:
+            os.makedirs(os.path.join(packages_parent_dir, pkg, '.circleci'))
+            with open(os.path.join(packages_parent_dir, pkg, '.circleci', 'config.yml'), 'w') as file:
+                pass
+            if requirements is not None:
+                with open(os.path.join(packages_parent_dir, pkg, 'requirements.txt'), 'w') as file:
+                    file.write(''.join(requirement + '\n' for requirement in requirements))
+        filename = os.path.join(self.tmp_dirname, 'index.json')
+
+        index = core.DependencyIndex(packages_parent_dir, filename=filename).update()
+        self.assertEqual(index.n_parsed, 5)
+        self.assertTrue(index.is_acyclic())
+        self.assertEqual(index.find_cycle(), None)
+        self.assertEqual(index.get_downstream_closure('pkg_2'), ['pkg_3', 'pkg_4'])
+        self.assertEqual(index.get_downstream_closure('pkg_6'), [])
+        self.assertEqual(index.get_upstream_closure('pkg_3'), ['pkg_1', 'pkg_2'])
+        self.assertEqual(index.get_topological_order(), ['pkg_1', 'pkg_2', 'pkg_3', 'pkg_4', 'pkg_5'])
+        self.assertEqual(index.get_topological_waves(), [['pkg_1', 'pkg_5'], ['pkg_2'], ['pkg_3'], ['pkg_4']])
+        self.assertEqual(index.get_topological_waves(['pkg_2', 'pkg_4']), [['pkg_2', 'pkg_4']])
+
+        # the graph is rebuilt when the requirements change
+        with open(os.path.join(packages_parent_dir, 'pkg_2', 'requirements.txt'), 'w') as file:
+            file.write('pkg_1\npkg_4\n')
+        index.update()
+        self.assertEqual(index.n_parsed, 1)
+        self.assertFalse(index.is_acyclic())
+        self.assertEqual(sorted(index.find_cycle()), [('pkg_2', 'pkg_3'), ('pkg_3', 'pkg_4'), ('pkg_4', 'pkg_2')])
+        with self.assertRaisesRegex(core.BuildHelperError, 'cyclic'):
+            index.get_topological_order()
+        with self.assertRaisesRegex(core.BuildHelperError, 'cyclic'):
+            index.get_topological_waves()
+
+        # cleanup
+        shutil.rmtree(packages_parent_dir)
+
+    def test_DependencyIndex_get_critical_path(self):
+        packages_parent_dir = tempfile.mkdtemp()
+        for pkg, requirements in [('pkg_1', []), ('pkg_2', ['pkg_1']), ('pkg_3', ['pkg_1']),
+                                  ('pkg_4', ['pkg_1', 'pkg_2']), ('pkg_5', [])]:
+            os.makedirs(os.path.join(packages_parent_dir, pkg, '.circleci'))
+            with open(os.path.join(packages_parent_dir, pkg, '.circleci', 'config.yml'), 'w') as file:
+                pass
+            with open(os.path.join(packages_parent_dir, pkg, 'requirements.txt'), 'w') as file:
+                file.write(''.join(requirement + '\n' for requirement in requirements))
+
+        index = core.DependencyIndex(packages_parent_dir).update()
+
+        # each package is triggered by the first of its upstream dependencies to finish
+        prediction = index.get_critical_path('pkg_1', {'pkg_1': 10., 'pkg_2': 20., 'pkg_3': 40., 'pkg_4': 15.})
+        self.assertEqual(prediction['wall_time'], 50.)
+        self.assertEqual(prediction['critical_path'], ['pkg_1', 'pkg_3'])
+        self.assertEqual(prediction['schedule'], {
+            'pkg_1': {'triggered_by': None, 'queue_time': 0., 'duration': 10., 'start': 0., 'finish': 10., 'slack': 0.},
+            'pkg_2': {'triggered_by': 'pkg_1', 'queue_time': 0., 'duration': 20., 'start': 10., 'finish': 30.,
+                      'slack': 20.},
+            'pkg_3': {'triggered_by': 'pkg_1', 'queue_time': 0., 'duration': 40., 'start': 10., 'finish': 50.,
+                      'slack': 0.},
+            'pkg_4': {'triggered_by': 'pkg_1', 'queue_time': 0., 'duration': 15., 'start': 10., 'finish': 25.,
+                      'slack': 25.},
+        })
+
+        prediction = index.get_critical_path('pkg_1', {'pkg_1': 10., 'pkg_2': 20., 'pkg_3': 5., 'pkg_4': 15.})
+        self.assertEqual(prediction['wall_time'], 30.)
+        self.assertEqual(prediction['critical_path'], ['pkg_1', 'pkg_2'])
+
+        # deferred packages are triggered by their intermediate dependencies
+        prediction = index.get_critical_path('pkg_1', {'pkg_1': 10., 'pkg_2': 20., 'pkg_3': 40., 'pkg_4': 15.},
+                                             deferring_packages=['pkg_1'])
+        self.assertEqual(prediction['wall_time'], 50.)
+        self.assertEqual(prediction['critical_path'], ['pkg_1', 'pkg_3'])
+        self.assertEqual(prediction['schedule']['pkg_2']['slack'], 5.)
+        self.assertEqual(prediction['schedule']['pkg_4'], {
+            'triggered_by': 'pkg_2', 'queue_time': 0., 'duration': 15., 'start': 30., 'finish': 45., 'slack': 5.})
+
+        prediction = index.get_critical_path('pkg_1', {'pkg_1': 10., 'pkg_2': 20., 'pkg_3': 5., 'pkg_4': 15.},
+                                             deferring_packages=['pkg_1'])
+        self.assertEqual(prediction['wall_time'], 45.)
+        self.assertEqual(prediction['critical_path'], ['pkg_1', 'pkg_2', 'pkg_4'])
+
+        # builds wait in the queue before they start
+        prediction = index.get_critical_path('pkg_1', {'pkg_1': 10., 'pkg_2': 20., 'pkg_3': 40., 'pkg_4': 15.},
+                                             queue_times={'pkg_1': 1., 'pkg_3': 5.})
+        self.assertEqual(prediction['wall_time'], 56.)
+        self.assertEqual(prediction['critical_path'], ['pkg_1', 'pkg_3'])
+        self.assertEqual(prediction['schedule']['pkg_3'], {
+            'triggered_by': 'pkg_1', 'queue_time': 5., 'duration': 40., 'start': 16., 'finish': 56., 'slack': 0.})
+
+        prediction = index.get_critical_path('pkg_6', {'pkg_6': 10.})
+        self.assertEqual(prediction['wall_time'], 10.)
+        self.assertEqual(prediction['critical_path'], ['pkg_6'])
+
+        with open(os.path.join(packages_parent_dir, 'pkg_2', 'requirements.txt'), 'w') as file:
+            file.write('pkg_1\npkg_4\n')
+        index.update()
+        with self.assertRaisesRegex(core.BuildHelperError, 'cyclic'):
+            index.get_critical_path('pkg_1', {'pkg_1': 10., 'pkg_2': 20., 'pkg_3': 40., 'pkg_4': 15.})
+
+        # cleanup
+        shutil.rmtree(packages_parent_dir)
+
+    def test_predict_cascade_duration(self):
+        packages_parent_dir = tempfile.mkdtemp()
+        for pkg, requirements in [('pkg_1', []), ('pkg_2', ['pkg_1']), ('pkg_3', ['pkg_1', 'pkg_2'])]:
+            os.makedirs(os.path.join(packages_parent_dir, pkg, '.circleci'))
+            with open(os.path.join(packages_parent_dir, pkg, '.circleci', 'config.yml'), 'w') as file:
+                pass
+            with open(os.path.join(packages_parent_dir, pkg, 'requirements.txt'), 'w') as file:
+                file.write(''.join(requirement + '\n' for requirement in requirements))
+
+        def get_builds(build_times):
+            return {'status': 200, 'body': [
+                {'build_num': i_build + 1, 'lifecycle': 'finished', 'status': status, 'build_time_millis': build_time,
+                 'queued_at': '2026-01-01T00:00:00.000Z',
+                 'start_time': '2026-01-01T00:00:{:02d}.000Z'.format(queue_time)}
+                for i_build, (status, build_time, queue_time) in enumerate(build_times)]}
+
+        fixtures = {
+            'GET /v1.1/project/github/KarrLab/pkg_1': get_builds([('success', 60000, 0), ('fixed', 120000, 0),
+                                                                  ('failed', 600000, 0), ('success', 180000, 0)]),
+            'GET /v1.1/project/github/KarrLab/pkg_2': get_builds([('success', 300000, 20), ('success', 300000, 40)]),
+            'GET /v1.1/project/github/KarrLab/pkg_3': get_builds([('failed', 60000, 10)]),
+        }
+
+        env = self.construct_environment()
+        env.set('CIRCLE_PROJECT_USERNAME', 'KarrLab')
+
+        with env:
+            with testing.CircleCiStandIn(fixtures=fixtures) as stand_in:
+                build_helper = core.BuildHelper()
+                build_helper.CIRCLE_API_ENDPOINT = stand_in.endpoint
+                build_helper.dependency_index_dirname = self.tmp_dirname
+
+                self.assertEqual(build_helper.get_circleci_build_times(['pkg_1', 'pkg_2', 'pkg_3']), (
+                    {'pkg_1': 120., 'pkg_2': 300., 'pkg_3': None},
+                    {'pkg_1': 0., 'pkg_2': 30., 'pkg_3': None},
+                ))
+
+                # pkg_3 is triggered by pkg_1
+                with self.assertWarnsRegex(UserWarning, 'pkg_3 has no successful CircleCI builds'):
+                    prediction = build_helper.predict_cascade_duration(
+                        package='pkg_1', packages_parent_dir=packages_parent_dir)
+                self.assertEqual(prediction['wall_time'], 120. + 30. + 300.)
+                self.assertEqual(prediction['critical_path'], ['pkg_1', 'pkg_2'])
+                self.assertEqual(prediction['schedule']['pkg_3']['start'], 120.)
+
+                # pkg_3 is deferred to pkg_2
+                with open(os.path.join(packages_parent_dir, 'pkg_1', '.karr_lab_build_utils.yml'), 'w') as file:
+                    yaml.dump({
+                        'downstream_dependencies': ['pkg_2', 'pkg_3'],
+                        'downstream_dependency_graph': {'pkg_2': ['pkg_3'], 'pkg_3': []},
+                        'defer_downstream_dependencies': True,
+                    }, file)
+                with self.assertWarnsRegex(UserWarning, 'pkg_3 has no successful CircleCI builds'):
+                    prediction = build_helper.predict_cascade_duration(
+                        package='pkg_1', packages_parent_dir=packages_parent_dir)
+
+                # test cli
+                with mock.patch.object(core.BuildHelper, 'CIRCLE_API_ENDPOINT', stand_in.endpoint):
+                    with capturer.CaptureOutput(merged=False, relay=False) as captured:
+                        with __main__.App(argv=['predict-cascade-duration', 'pkg_1',
+                                                '--packages-parent-dir', packages_parent_dir]) as app:
+                            app.run()
+                            self.assertRegex(captured.stdout.get_text(), 'Predicted wall time: 11.0 min')
+                            self.assertRegex(captured.stdout.get_text(), 'Critical path: pkg_1 -> pkg_2 -> pkg_3')
+
+        self.assertEqual(prediction['wall_time'], 120. + 30. + 300. + 210.)
+        self.assertEqual(prediction['total_time'], 120. + 300. + 210.)
+        self.assertEqual(prediction['critical_path'], ['pkg_1', 'pkg_2', 'pkg_3'])
+
+        # cleanup
+        shutil.rmtree(packages_parent_dir)
+
+    def test_get_downstream_dependencies(self):
+        packages_parent_dir = tempfile.mkdtemp()
+        for pkg, requirements in [('pkg_1', []), ('pkg_2', ['pkg_1']), ('pkg_3', ['pkg_1', 'pkg_2'])]:
+            os.makedirs(os.path.join(packages_parent_dir, pkg, '.circleci'))
+            with open(os.path.join(packages_parent_dir, pkg, '.circleci', 'config.yml'), 'w') as file:
+                pass
+            with open(os.path.join(packages_parent_dir, pkg, 'requirements.txt'), 'w') as file:
+                file.write(''.join(requirement + '\n' for requirement in requirements))
+
+        with self.construct_environment():
+            with capturer.CaptureOutput(merged=False, relay=False) as captured:
+                with __main__.App(argv=['get-downstream-dependencies', 'pkg_1',
+                                        '--packages-parent-dir', packages_parent_dir]) as app:
+                    app.run()
+                    self.assertRegex(captured.stdout.get_text(),
+                                     'The following downstream dependencies were found:\n  1: pkg_2\n  2: pkg_3')
+                    self.assertEqual(captured.stderr.get_text(), '')
+
+        with self.construct_environment():
+            with capturer.CaptureOutput(merged=False, relay=False) as captured:
+                with __main__.App(argv=['get-downstream-dependencies', 'pkg_3',
+                                        '--packages-parent-dir', packages_parent_dir]) as app:
+                    app.run()
+                    self.assertRegex(captured.stdout.get_text(), 'No downstream packages were found.')
+                    self.assertEqual(captured.stderr.get_text(), '')
+
+        # cleanup
+        shutil.rmtree(packages_parent_dir)
+
+    def test_test_downstream_dependencies(self):
+        packages_parent_dir = tempfile.mkdtemp()
+        for pkg, requirements, test in [
+                ('pkg_1', [], None),
+                ('pkg_2', ['pkg_1'], 'def test_1():\n    pass\n\ndef test_2():\n    pass\n'),
+                ('pkg_3', ['pkg_1', 'pkg_2'], 'import pytest\n\ndef test_1():\n    assert False\n\n'
+                              '@pytest.mark.skip\ndef test_2():\n    pass\n'),
+                ('pkg_4', [], 'def test_1():\n    pass\n')]:
+            os.makedirs(os.path.join(packages_parent_dir, pkg, '.circleci'))
+            with open(os.path.join(packages_parent_dir, pkg, '.circleci', 'config.yml'), 'w') as file:
+                pass
+            with open(os.path.join(packages_parent_dir, pkg, 'requirements.txt'), 'w') as file:
+                file.write(''.join(requirement + '\n' for requirement in requirements))
+            if test:
+                os.mkdir(os.path.join(packages_parent_dir, pkg, 'tests'))
+                with open(os.path.join(packages_parent_dir, pkg, 'tests', 'test_core.py'), 'w') as file:
+                    file.write(test)
+
+        # test api
+        build_helper = core.BuildHelper()
+        build_helper.dependency_index_dirname = self.tmp_dirname
+        results = build_helper.test_downstream_dependencies(
+            dirname=os.path.join(packages_parent_dir, 'pkg_1'), packages_parent_dir=packages_parent_dir,
+            n_workers=2, install=False)
+        self.assertEqual(list(results.keys()), ['pkg_2', 'pkg_3'])
+        self.assertTrue(results['pkg_2']['passed'])
+        self.assertEqual(results['pkg_2']['num_tests'], 2)
+        self.assertEqual(results['pkg_2']['num_passed'], 2)
+        self.assertFalse(results['pkg_3']['passed'])
+        self.assertEqual(results['pkg_3']['num_tests'], 2)
+        self.assertEqual(results['pkg_3']['num_failures'], 1)
+        self.assertEqual(results['pkg_3']['num_skipped'], 1)
+        self.assertGreater(results['pkg_3']['duration'], 0.)
+        self.assertIn('assert False', results['pkg_3']['output'])
+
+        results = build_helper.test_downstream_dependencies(
+            dirname=os.path.join(packages_parent_dir, 'pkg_4'), packages_parent_dir=packages_parent_dir,
+            install=False)
+        self.assertEqual(results, {})
+
+        # test cli
+        with self.construct_environment():
+            with capturer.CaptureOutput(merged=False, relay=False) as captured:
+                with __main__.App(argv=['test-downstream',
+                                        '--dirname', os.path.join(packages_parent_dir, 'pkg_2'),
+                                        '--packages-parent-dir', packages_parent_dir,
+                                        '--no-install']) as app:
+                    with self.assertRaisesRegex(SystemExit, '1 of 1 downstream packages failed: pkg_3'):
+                        app.run()
+                    self.assertRegex(captured.stdout.get_text(), r'pkg_3 +fail +2 +0 +1 +1 +0')
+
+        with self.construct_environment():
+            with capturer.CaptureOutput(merged=False, relay=False) as captured:
+                with __main__.App(argv=['test-downstream',
+                                        '--dirname', os.path.join(packages_parent_dir, 'pkg_3'),
+                                        '--packages-parent-dir', packages_parent_dir,
+                                        '--no-install']) as app:
+                    app.run()
+                    self.assertRegex(captured.stdout.get_text(), 'No downstream packages were found.')
+
+        # cleanup
+        shutil.rmtree(packages_parent_dir)
+
     def test_trigger_tests_of_downstream_dependencies_with_error(self):
         build_helper = core.BuildHelper()
         filename_pattern = os.path.join(build_helper.proj_tests_xml_dir,
@@ -2238,16 +3301,26 @@ class TestKarrLabBuildUtils(unittest.TestCase):
 
         env = self.construct_environment()
 
+        # the recent builds of the downstream dependencies are requested concurrently
+        def requests_get(url, **kwargs):
+            if re.search(r'/dep_[12]$', url):
+                return requests_get_2
+            if re.search(r'/dep_[12]/[^/]+$', url):
+                return requests_get_3
+            return requests_get_1
+
         with env:
-            with mock.patch('requests.post', return_value=requests_post):
-                with mock.patch('requests.get', side_effect=[requests_get_1,
-                                                             requests_get_2, requests_get_3,
-                                                             requests_get_2, requests_get_3]):
+            with mock.patch('requests.Session.post', return_value=requests_post) as mock_post:
+                with mock.patch('requests.Session.get', side_effect=requests_get) as mock_get:
                     build_helper = core.BuildHelper()
+                    build_helper.cascade_ledger = core.SqliteCascadeLedger(
+                        os.path.join(self.tmp_dirname, 'cascade_ledger.sqlite'))
                     deps, no_deps = build_helper.trigger_tests_of_downstream_dependencies(
                         config_filename=config_filename)
                     self.assertEqual(deps, ['dep_1', 'dep_2'])
                     self.assertEqual(no_deps, {})
+                    self.assertEqual(mock_get.call_count, 5)
+                    self.assertEqual(mock_post.call_count, 2)
         # cleanup
         os.remove(config_filename)
 
@@ -2310,12 +3383,20 @@ class TestKarrLabBuildUtils(unittest.TestCase):
         env.set('UPSTREAM_REPONAME', 'dep_3')
         env.set('UPSTREAM_BUILD_NUM', '1')
 
+        # the recent builds of the downstream dependencies are requested concurrently
+        def requests_get(url, **kwargs):
+            if re.search(r'/dep_[12]$', url):
+                return requests_get_2
+            if re.search(r'/dep_[12]/[^/]+$', url):
+                return requests_get_3
+            return requests_get_1
+
         with env:
-            with mock.patch('requests.post', return_value=requests_post):
-                with mock.patch('requests.get', side_effect=[requests_get_1,
-                                                             requests_get_2, requests_get_3,
-                                                             requests_get_2, requests_get_3]):
+            with mock.patch('requests.Session.post', return_value=requests_post) as mock_post:
+                with mock.patch('requests.Session.get', side_effect=requests_get) as mock_get:
                     build_helper = core.BuildHelper()
+                    build_helper.cascade_ledger = core.SqliteCascadeLedger(
+                        os.path.join(self.tmp_dirname, 'cascade_ledger.sqlite'))
                     deps, no_deps = build_helper.trigger_tests_of_downstream_dependencies(
                         config_filename=config_filename)
                     self.assertEqual(deps, [])
@@ -2323,6 +3404,8 @@ class TestKarrLabBuildUtils(unittest.TestCase):
                     self.assertIn('package has already been triggered by the current build cascade', no_deps['dep_1'])
                     self.assertIn('dep_2', no_deps)
                     self.assertIn('package has already been triggered by the current build cascade', no_deps['dep_2'])
+                    self.assertEqual(mock_get.call_count, 5)
+                    mock_post.assert_not_called()
 
         # cleanup
         os.remove(config_filename)
@@ -2381,10 +3464,12 @@ class TestKarrLabBuildUtils(unittest.TestCase):
         env.set('UPSTREAM_BUILD_NUM', '1')
 
         with env:
-            with mock.patch('requests.get', side_effect=[requests_get_1, requests_get_2, requests_get_3, requests_get_3]):
-                with mock.patch('requests.post', return_value=requests_post):
+            with mock.patch('requests.Session.get', side_effect=[requests_get_1, requests_get_2, requests_get_3, requests_get_3]):
+                with mock.patch('requests.Session.post', return_value=requests_post):
                     # test api
                     build_helper = core.BuildHelper()
+                    build_helper.cascade_ledger = core.SqliteCascadeLedger(
+                        os.path.join(self.tmp_dirname, 'cascade_ledger.sqlite'))
                     deps, no_deps = build_helper.trigger_tests_of_downstream_dependencies(
                         config_filename=config_filename)
                     self.assertEqual(deps, [])
@@ -2441,10 +3526,12 @@ class TestKarrLabBuildUtils(unittest.TestCase):
         env.set('CIRCLE_PROJECT_REPONAME', 'pkg_1')
 
         with env:
-            with mock.patch('requests.get', side_effect=[requests_get_1, requests_get_2, requests_get_3]):
-                with mock.patch('requests.post', return_value=requests_post):
+            with mock.patch('requests.Session.get', side_effect=[requests_get_1, requests_get_2, requests_get_3]):
+                with mock.patch('requests.Session.post', return_value=requests_post):
                     # test api
                     build_helper = core.BuildHelper()
+                    build_helper.cascade_ledger = core.SqliteCascadeLedger(
+                        os.path.join(self.tmp_dirname, 'cascade_ledger.sqlite'))
                     deps, no_deps = build_helper.trigger_tests_of_downstream_dependencies(
                         config_filename=config_filename)
                     self.assertEqual(deps, [])
@@ -2456,10 +3543,12 @@ class TestKarrLabBuildUtils(unittest.TestCase):
             'json': lambda: {'start_time': '2019-01-01T01:01:01-05:00'},
         })
         with env:
-            with mock.patch('requests.get', side_effect=[requests_get_1, requests_get_2, requests_get_3]):
-                with mock.patch('requests.post', return_value=requests_post):
+            with mock.patch('requests.Session.get', side_effect=[requests_get_1, requests_get_2, requests_get_3]):
+                with mock.patch('requests.Session.post', return_value=requests_post):
                     # test api
                     build_helper = core.BuildHelper()
+                    build_helper.cascade_ledger = core.SqliteCascadeLedger(
+                        os.path.join(self.tmp_dirname, 'cascade_ledger.sqlite'))
                     deps, no_deps = build_helper.trigger_tests_of_downstream_dependencies(
                         config_filename=config_filename)
                     self.assertEqual(deps, ['pkg_2'])
@@ -2468,6 +3557,444 @@ class TestKarrLabBuildUtils(unittest.TestCase):
         # cleanup
         os.remove(config_filename)
 
+    def test_trigger_tests_of_downstream_dependencies_cascade_ledger(self):
+        build_helper = core.BuildHelper()
+        filename_pattern = os.path.join(build_helper.proj_tests_xml_dir,
+                                        '{0}.*-*.*.xml'.format(build_helper.proj_tests_xml_latest_filename))
+        for filename in glob(filename_pattern):
+            os.remove(filename)
+
+        tmp_file, config_filename = tempfile.mkstemp(suffix='.yml')
+        os.close(tmp_file)
+        with open(config_filename, 'w') as file:
+            yaml.dump({'downstream_dependencies': ['dep_1']}, file)
+
+        requests_get_1 = attrdict.AttrDict({
+            'raise_for_status': lambda: None,
+            'json': lambda: {'start_time': '2017-01-01T01:01:01-05:00'},
+        })
+
+        env = self.construct_environment()
+        env.set('UPSTREAM_REPONAME', 'dep_3')
+        env.set('UPSTREAM_BUILD_NUM', '1')
+
+        with env:
+            build_helper = core.BuildHelper()
+            build_helper.cascade_ledger = core.SqliteCascadeLedger(
+                os.path.join(self.tmp_dirname, 'cascade_ledger.sqlite'))
+            self.assertTrue(build_helper.cascade_ledger.claim('dep_3', 1, 'dep_1', 'dep_2', 5))
+
+            # the recent builds of the package aren't requested because the ledger contains the package
+            with mock.patch('requests.Session.get', side_effect=[requests_get_1]) as mock_get:
+                with mock.patch('requests.Session.post') as mock_post:
+                    deps, no_deps = build_helper.trigger_tests_of_downstream_dependencies(
+                        config_filename=config_filename)
+            self.assertEqual(deps, [])
+            self.assertIn('package has already been triggered by the current build cascade', no_deps['dep_1'])
+            self.assertIn('triggered by: dep_2 build 5', no_deps['dep_1'])
+            self.assertEqual(mock_get.call_count, 1)
+            mock_post.assert_not_called()
+
+        build_helper.cascade_ledger.close()
+
+        # cleanup
+        os.remove(config_filename)
+
+    def test_trigger_tests_of_downstream_dependencies_circleci_stand_in(self):
+        build_helper = core.BuildHelper()
+        filename_pattern = os.path.join(build_helper.proj_tests_xml_dir,
+                                        '{0}.*-*.*.xml'.format(build_helper.proj_tests_xml_latest_filename))
+        for filename in glob(filename_pattern):
+            os.remove(filename)
+
+        tmp_file, config_filename = tempfile.mkstemp(suffix='.yml')
+        os.close(tmp_file)
+        with open(config_filename, 'w') as file:
+            yaml.dump({'downstream_dependencies': ['dep_1', 'dep_2']}, file)
+
+        env = self.construct_environment()
+        env.set('CIRCLE_PROJECT_USERNAME', 'KarrLab')
+        env.set('UPSTREAM_REPONAME', 'dep_3')
+        env.set('UPSTREAM_BUILD_NUM', '1')
+
+        with env:
+            with testing.CircleCiStandIn(fixtures_filename='tests/fixtures/circleci/cascade.json') as stand_in:
+                for scenario in ['first', 'repeat']:
+                    build_helper = core.BuildHelper()
+                    build_helper.CIRCLE_API_ENDPOINT = stand_in.endpoint
+                    build_helper.cascade_ledger = core.SqliteCascadeLedger(
+                        os.path.join(self.tmp_dirname, 'cascade_ledger.sqlite'))
+                    build_helper.circleci_build_store = core.CircleCiBuildStore(
+                        os.path.join(self.tmp_dirname, 'circleci_builds.sqlite'))
+                    with stand_in.scenario(scenario):
+                        deps, no_deps = build_helper.trigger_tests_of_downstream_dependencies(
+                            config_filename=config_filename)
+                    build_helper.cascade_ledger.close()
+                    build_helper.circleci_build_store.close()
+
+                    if scenario == 'first':
+                        self.assertEqual(deps, ['dep_1', 'dep_2'])
+                        self.assertEqual(no_deps, {})
+                    else:
+                        self.assertEqual(deps, [])
+                        self.assertEqual(sorted(no_deps.keys()), ['dep_1', 'dep_2'])
+
+        # the upstream build, the recent builds of each package, and the details of each build are requested once
+        self.assertEqual(stand_in.get_counts('first'), collections.Counter({
+            'GET /v1.1/project/github/KarrLab/dep_3/1': 1,
+            'GET /v1.1/project/github/KarrLab/dep_1': 1,
+            'GET /v1.1/project/github/KarrLab/dep_1/1': 1,
+            'GET /v1.1/project/github/KarrLab/dep_1/2': 1,
+            'POST /v2/project/github/KarrLab/dep_1/pipeline': 1,
+            'GET /v1.1/project/github/KarrLab/dep_2': 1,
+            'GET /v1.1/project/github/KarrLab/dep_2/1': 1,
+            'GET /v1.1/project/github/KarrLab/dep_2/2': 1,
+            'POST /v2/project/github/KarrLab/dep_2/pipeline': 1,
+        }))
+
+        # repeating the cascade is served by the build store and the cascade ledger
+        self.assertEqual(sum(stand_in.get_counts('repeat').values()), 0)
+
+        # cleanup
+        os.remove(config_filename)
+
+    def test_trigger_tests_of_downstream_dependencies_transitive_reduction(self):
+        build_helper = core.BuildHelper()
+        filename_pattern = os.path.join(build_helper.proj_tests_xml_dir,
+                                        '{0}.*-*.*.xml'.format(build_helper.proj_tests_xml_latest_filename))
+        for filename in glob(filename_pattern):
+            os.remove(filename)
+
+        # dep_2 also depends on dep_1, so it can be triggered by dep_1 rather than by this package
+        tmp_file, config_filename = tempfile.mkstemp(suffix='.yml')
+        os.close(tmp_file)
+
+        def trigger(scenario, defer, claimed_packages=()):
+            with open(config_filename, 'w') as file:
+                yaml.dump({
+                    'downstream_dependencies': ['dep_1', 'dep_2'],
+                    'downstream_dependency_graph': {'dep_1': ['dep_2'], 'dep_2': []},
+                    'defer_downstream_dependencies': defer,
+                }, file)
+
+            env = self.construct_environment()
+            env.set('CIRCLE_PROJECT_USERNAME', 'KarrLab')
+            env.set('UPSTREAM_REPONAME', 'dep_3')
+            env.set('UPSTREAM_BUILD_NUM', '1')
+            with env:
+                with testing.CircleCiStandIn(fixtures_filename='tests/fixtures/circleci/cascade.json') as stand_in:
+                    build_helper = core.BuildHelper()
+                    build_helper.CIRCLE_API_ENDPOINT = stand_in.endpoint
+                    build_helper.cascade_ledger = core.SqliteCascadeLedger(
+                        os.path.join(self.tmp_dirname, scenario + '.cascade_ledger.sqlite'))
+                    build_helper.circleci_build_store = core.CircleCiBuildStore(
+                        os.path.join(self.tmp_dirname, scenario + '.circleci_builds.sqlite'))
+                    for package in claimed_packages:
+                        build_helper.cascade_ledger.claim('dep_3', '1', package, 'dep_4', 1)
+                    with stand_in.scenario(scenario):
+                        deps, no_deps = build_helper.trigger_tests_of_downstream_dependencies(
+                            config_filename=config_filename)
+                    build_helper.cascade_ledger.close()
+                    build_helper.circleci_build_store.close()
+            return (deps, no_deps, stand_in.get_counts(scenario))
+
+        # by default, all of the direct downstream dependencies are triggered
+        deps, no_deps, counts = trigger('all', False)
+        self.assertEqual(deps, ['dep_1', 'dep_2'])
+        self.assertEqual(no_deps, {})
+
+        # dep_2 is deferred to dep_1
+        deps, no_deps, counts = trigger('deferred', True)
+        self.assertEqual(deps, ['dep_1'])
+        self.assertEqual(list(no_deps.keys()), ['dep_2'])
+        self.assertIn('will be triggered by its upstream dependencies', no_deps['dep_2'])
+        self.assertIn('upstream dependencies: dep_1', no_deps['dep_2'])
+
+        # the builds of dep_2 aren't requested
+        self.assertNotIn('GET /v1.1/project/github/KarrLab/dep_2', counts)
+        self.assertNotIn('POST /v2/project/github/KarrLab/dep_2/pipeline', counts)
+
+        # dep_2 is triggered directly if dep_1 isn't triggered by this build
+        deps, no_deps, counts = trigger('not_deferred', True, claimed_packages=['dep_1'])
+        self.assertEqual(deps, ['dep_2'])
+        self.assertEqual(list(no_deps.keys()), ['dep_1'])
+        self.assertEqual(counts['POST /v2/project/github/KarrLab/dep_2/pipeline'], 1)
+
+        # cleanup
+        os.remove(config_filename)
+
+    def test_get_downstream_dependency_waves(self):
+        waves, intermediates = core.BuildHelper.get_downstream_dependency_waves(
+            'wc_utils', ['obj_tables', 'wc_lang', 'wc_onto'],
+            {'obj_tables': ['wc_lang'], 'wc_lang': ['wc_sim'], 'wc_onto': [], 'wc_sim': []})
+        self.assertEqual(waves, [['obj_tables', 'wc_onto'], ['wc_lang'], ['wc_sim']])
+        self.assertEqual(intermediates, {'wc_lang': ['obj_tables']})
+
+        # cyclic dependencies
+        waves, intermediates = core.BuildHelper.get_downstream_dependency_waves(
+            'pkg_1', ['pkg_2', 'pkg_3'], {'pkg_2': ['pkg_3'], 'pkg_3': ['pkg_2']})
+        self.assertEqual(waves, [['pkg_2', 'pkg_3']])
+        self.assertEqual(intermediates, {})
+
+    def test_DependencyIndex_imports(self):
+        packages_parent_dir = tempfile.mkdtemp()
+        for pkg, requirements in [('pkg_1', []), ('pkg_2', ['pkg_1']), ('pkg_3', ['pkg_1'])]:
+            os.makedirs(os.path.join(packages_parent_dir, pkg, pkg, 'sub'))
+            os.makedirs(os.path.join(packages_parent_dir, pkg, '.circleci'))
+            with open(os.path.join(packages_parent_dir, pkg, '.circleci', 'config.yml'), 'w') as file:
+                pass
+            with open(os.path.join(packages_parent_dir, pkg, 'requirements.txt'), 'w') as file:
+                file.write(''.join(requirement + '\n' for requirement in requirements))
+        with open(os.path.join(packages_parent_dir, 'pkg_2', 'pkg_2', '__init__.py'), 'w') as file:
+            file.write('import os\nimport pkg_1.core\nfrom . import sub\n')
+        with open(os.path.join(packages_parent_dir, 'pkg_2', 'pkg_2', 'sub', 'mod.py'), 'w') as file:
+            file.write('from pkg_1.util import f, g\nfrom .. import other\nfrom ... import too_far\n')
+        with open(os.path.join(packages_parent_dir, 'pkg_3', 'pkg_3', '__init__.py'), 'w') as file:
+            file.write('def f():\n    import pkg_10\n')
+        os.makedirs(os.path.join(packages_parent_dir, 'pkg_3', 'build'))
+        with open(os.path.join(packages_parent_dir, 'pkg_3', 'build', 'mod.py'), 'w') as file:
+            file.write('import pkg_1\n')
+
+        # scan the imports of a file
+        filename = os.path.join(packages_parent_dir, 'pkg_2', 'pkg_2', 'sub', 'mod.py')
+        self.assertEqual(core.DependencyIndex.scan_imports(filename),
+                         ['pkg_1.util', 'pkg_1.util.f', 'pkg_1.util.g'])
+        self.assertEqual(core.DependencyIndex.scan_imports(filename, package='pkg_2.sub'),
+                         ['pkg_1.util', 'pkg_1.util.f', 'pkg_1.util.g', 'pkg_2', 'pkg_2.other'])
+
+        with open(os.path.join(self.tmp_dirname, 'invalid.py'), 'w') as file:
+            file.write('def f(:\n')
+        with self.assertWarnsRegex(UserWarning, 'could not be parsed'):
+            self.assertEqual(core.DependencyIndex.scan_imports(os.path.join(self.tmp_dirname, 'invalid.py')), [])
+
+        # index the imports of the downstream dependencies
+        filename = os.path.join(self.tmp_dirname, 'index.json')
+        index = core.DependencyIndex(packages_parent_dir, filename=filename).update()
+        self.assertEqual(index.get_imports('pkg_2'), ['os', 'pkg_1.core', 'pkg_1.util', 'pkg_1.util.f', 'pkg_1.util.g'])
+        self.assertEqual(index.get_downstream_imports('pkg_1'), {
+            'pkg_2': ['pkg_1.core', 'pkg_1.util', 'pkg_1.util.f', 'pkg_1.util.g'],
+            'pkg_3': [],
+        })
+
+        # the imports are saved with the index, and only the changed files are rescanned
+        index = core.DependencyIndex(packages_parent_dir, filename=filename).update()
+        with mock.patch.object(core.DependencyIndex, 'scan_imports',
+                               wraps=core.DependencyIndex.scan_imports) as mock_scan_imports:
+            self.assertEqual(index.get_imports('pkg_2'),
+                             ['os', 'pkg_1.core', 'pkg_1.util', 'pkg_1.util.f', 'pkg_1.util.g'])
+            mock_scan_imports.assert_not_called()
+
+            with open(os.path.join(packages_parent_dir, 'pkg_2', 'pkg_2', '__init__.py'), 'w') as file:
+                file.write('import pkg_1\n')
+            self.assertEqual(index.get_imports('pkg_2'), ['pkg_1', 'pkg_1.util', 'pkg_1.util.f', 'pkg_1.util.g'])
+            self.assertEqual(mock_scan_imports.call_count, 1)
+
+        # the imports are saved to the configuration of each package
+        index.write_downstream_dependencies()
+        with open(os.path.join(packages_parent_dir, 'pkg_1', '.karr_lab_build_utils.yml'), 'r') as file:
+            config = yaml.load(file, Loader=yaml.FullLoader)
+        self.assertEqual(config['downstream_dependency_imports'], {
+            'pkg_2': ['pkg_1', 'pkg_1.util', 'pkg_1.util.f', 'pkg_1.util.g'],
+            'pkg_3': [],
+        })
+
+        # cleanup
+        shutil.rmtree(packages_parent_dir)
+
+    def test_get_changed_modules(self):
+        build_helper = self.construct_build_helper()
+
+        repo_dirname = os.path.join(self.tmp_dirname, 'repo')
+        os.makedirs(os.path.join(repo_dirname, 'pkg', 'sub'))
+        os.makedirs(os.path.join(repo_dirname, 'tests'))
+        files = {
+            'setup.cfg': '[coverage:run]\nsource = \n    pkg\n',
+            'requirements.txt': 'numpy\n',
+            'README.md': '# pkg\n',
+            'pkg/__init__.py': 'from . import core\n',
+            'pkg/core.py': 'from .sub import util\n',
+            'pkg/io.py': 'import pkg.sub.util\n',
+            'pkg/other.py': 'import os\n',
+            'pkg/sub/__init__.py': '',
+            'pkg/sub/util.py': 'def f():\n    pass\n',
+            'tests/test_core.py': 'import pkg\n',
+        }
+        for filename, text in files.items():
+            with open(os.path.join(repo_dirname, filename), 'w') as file:
+                file.write(text)
+        repo = git.Repo.init(repo_dirname)
+        repo.index.add(list(files.keys()))
+        repo.index.commit('base')
+
+        def commit(filename, text):
+            with open(os.path.join(repo_dirname, filename), 'w') as file:
+                file.write(text)
+            repo.index.add([filename])
+            return repo.index.commit('change ' + filename).hexsha
+
+        other_commit = commit('pkg/other.py', 'import sys\n')
+        util_commit = commit('pkg/sub/util.py', 'def f():\n    return 1\n')
+        tests_commit = commit('tests/test_core.py', 'import pkg.core\n')
+        readme_commit = commit('README.md', '# pkg\n\nDescription\n')
+
+        self.assertEqual(build_helper.get_changed_modules(commits=[other_commit], dirname=repo_dirname), ['pkg.other'])
+        self.assertEqual(build_helper.get_changed_modules(commits=[util_commit], dirname=repo_dirname),
+                         ['pkg', 'pkg.core', 'pkg.io', 'pkg.sub.util'])
+        self.assertEqual(build_helper.get_changed_modules(commits=[tests_commit, readme_commit], dirname=repo_dirname),
+                         [])
+        self.assertEqual(build_helper.get_changed_modules(dirname=repo_dirname), [])
+
+        # compare the commits with an earlier commit
+        self.assertEqual(build_helper.get_changed_modules(commits=[readme_commit], base=other_commit,
+                                                          dirname=repo_dirname),
+                         ['pkg', 'pkg.core', 'pkg.io', 'pkg.sub.util'])
+        self.assertEqual(build_helper.get_changed_modules(commits=[readme_commit], base='0' * 40,
+                                                          dirname=repo_dirname), None)
+
+        # changes to other files may affect all of the modules
+        requirements_commit = commit('requirements.txt', 'numpy\nscipy\n')
+        self.assertEqual(build_helper.get_changed_modules(dirname=repo_dirname), None)
+        self.assertEqual(build_helper.get_changed_modules(commits=[other_commit, requirements_commit],
+                                                          dirname=repo_dirname), None)
+
+        # the commits can't be found
+        self.assertEqual(build_helper.get_changed_modules(commits=['0' * 40], dirname=repo_dirname), None)
+        self.assertEqual(build_helper.get_changed_modules(commits=[repo.commit('HEAD~5').hexsha],
+                                                          dirname=repo_dirname), None)
+
+    def test_trigger_tests_of_downstream_dependencies_imports(self):
+        build_helper = core.BuildHelper()
+        filename_pattern = os.path.join(build_helper.proj_tests_xml_dir,
+                                        '{0}.*-*.*.xml'.format(build_helper.proj_tests_xml_latest_filename))
+        for filename in glob(filename_pattern):
+            os.remove(filename)
+
+        tmp_file, config_filename = tempfile.mkstemp(suffix='.yml')
+        os.close(tmp_file)
+        with open(config_filename, 'w') as file:
+            yaml.dump({
+                'downstream_dependencies': ['dep_1', 'dep_2'],
+                'downstream_dependency_imports': {'dep_1': ['dep_3.util'], 'dep_2': ['dep_3', 'dep_3.core.f']},
+            }, file)
+
+        # this build of dep_3 starts the build cascade
+        env = self.construct_environment(build_num=1)
+        env.set('CIRCLE_PROJECT_USERNAME', 'KarrLab')
+        env.set('CIRCLE_PROJECT_REPONAME', 'dep_3')
+        env.unset('UPSTREAM_REPONAME')
+        env.unset('UPSTREAM_BUILD_NUM')
+
+        with env:
+            with testing.CircleCiStandIn(fixtures_filename='tests/fixtures/circleci/cascade.json') as stand_in:
+                build_helper = core.BuildHelper()
+                build_helper.CIRCLE_API_ENDPOINT = stand_in.endpoint
+                build_helper.cascade_ledger = core.SqliteCascadeLedger(
+                    os.path.join(self.tmp_dirname, 'cascade_ledger.sqlite'))
+                build_helper.circleci_build_store = core.CircleCiBuildStore(
+                    os.path.join(self.tmp_dirname, 'circleci_builds.sqlite'))
+                with mock.patch.object(core.BuildHelper, 'get_changed_modules',
+                                       return_value=['dep_3.core']) as mock_get_changed_modules:
+                    with stand_in.scenario('imports'):
+                        deps, no_deps = build_helper.trigger_tests_of_downstream_dependencies(
+                            config_filename=config_filename)
+                mock_get_changed_modules.assert_called_once_with(commits=None)
+
+                # all of the packages are triggered if the changed modules can't be determined
+                build_helper.cascade_ledger = core.SqliteCascadeLedger(
+                    os.path.join(self.tmp_dirname, 'cascade_ledger_2.sqlite'))
+                with mock.patch.object(core.BuildHelper, 'get_changed_modules', return_value=None):
+                    deps_2, no_deps_2 = build_helper.trigger_tests_of_downstream_dependencies(
+                        config_filename=config_filename)
+
+                # all of the packages are triggered if CircleCI truncated the commits of the build
+                stand_in.fixtures['GET /v1.1/project/github/KarrLab/dep_3/2'] = {'status': 200, 'body': {
+                    'all_commit_details': [{'commit': 'a' * 40}], 'all_commit_details_truncated': True,
+                    'build_num': 2, 'circle_yml': {'string': '{}'}, 'lifecycle': 'finished',
+                    'start_time': '2017-01-01T01:01:01-05:00', 'status': 'success'}}
+                build_helper.build_num = 2
+                build_helper.cascade_ledger = core.SqliteCascadeLedger(
+                    os.path.join(self.tmp_dirname, 'cascade_ledger_3.sqlite'))
+                with mock.patch.object(core.BuildHelper, 'get_changed_modules',
+                                       return_value=['dep_3.core']) as mock_get_changed_modules:
+                    deps_3, no_deps_3 = build_helper.trigger_tests_of_downstream_dependencies(
+                        config_filename=config_filename)
+                mock_get_changed_modules.assert_not_called()
+
+                # the changes are compared with the revision of the last build which started a build cascade
+                upstream_circle_yml = {'string': json.dumps({'jobs': {'build': {'steps': [{'run': {
+                    'command': 'python -m pytest tests/',
+                    'environment': {'UPSTREAM_REPONAME': 'dep_4', 'UPSTREAM_BUILD_NUM': '1'}}}]}}})}
+                stand_in.fixtures.update({
+                    'GET /v1.1/project/github/KarrLab/dep_3': {'status': 200, 'body': [
+                        {'build_num': 6, 'branch': 'master', 'status': 'success', 'vcs_revision': 'f' * 40},
+                        {'build_num': 5, 'branch': 'master', 'status': 'success', 'vcs_revision': 'e' * 40},
+                        {'build_num': 4, 'branch': 'master', 'status': 'failed', 'vcs_revision': 'd' * 40},
+                        {'build_num': 3, 'branch': 'dev', 'status': 'success', 'vcs_revision': 'c' * 40},
+                        {'build_num': 2, 'branch': 'master', 'status': 'success', 'vcs_revision': 'b' * 40},
+                    ]},
+                    'GET /v1.1/project/github/KarrLab/dep_3/2': {'status': 200, 'body': {
+                        'build_num': 2, 'circle_yml': {'string': '{}'}, 'lifecycle': 'finished'}},
+                    'GET /v1.1/project/github/KarrLab/dep_3/5': {'status': 200, 'body': {
+                        'build_num': 5, 'circle_yml': upstream_circle_yml, 'lifecycle': 'finished'}},
+                    'GET /v1.1/project/github/KarrLab/dep_3/6': {'status': 200, 'body': {
+                        'all_commit_details': [{'commit': 'f' * 40}], 'branch': 'master', 'build_num': 6,
+                        'circle_yml': {'string': '{}'}, 'lifecycle': 'finished',
+                        'start_time': '2017-01-01T01:01:01-05:00', 'status': 'success', 'vcs_revision': 'f' * 40}},
+                })
+                build_helper.build_num = 6
+                build_helper.circleci_build_store.clear()
+                build_helper.cascade_ledger = core.SqliteCascadeLedger(
+                    os.path.join(self.tmp_dirname, 'cascade_ledger_4.sqlite'))
+                with mock.patch.object(core.BuildHelper, 'get_changed_modules',
+                                       return_value=['dep_3.core']) as mock_get_changed_modules:
+                    deps_4, no_deps_4 = build_helper.trigger_tests_of_downstream_dependencies(
+                        config_filename=config_filename)
+                mock_get_changed_modules.assert_called_once_with(commits=['f' * 40], base='b' * 40)
+                build_helper.cascade_ledger.close()
+                build_helper.circleci_build_store.close()
+
+        self.assertEqual(deps, ['dep_2'])
+        self.assertEqual(list(no_deps.keys()), ['dep_1'])
+        self.assertIn("doesn't import any of the changed modules", no_deps['dep_1'])
+        self.assertIn('changed modules: dep_3.core', no_deps['dep_1'])
+        self.assertNotIn('GET /v1.1/project/github/KarrLab/dep_1', stand_in.get_counts('imports'))
+
+        self.assertEqual(deps_2, ['dep_1', 'dep_2'])
+        self.assertEqual(no_deps_2, {})
+
+        self.assertEqual(deps_3, ['dep_1', 'dep_2'])
+        self.assertEqual(no_deps_3, {})
+
+        self.assertEqual(deps_4, ['dep_2'])
+        self.assertEqual(list(no_deps_4.keys()), ['dep_1'])
+
+        # cleanup
+        os.remove(config_filename)
+
+    def test_imports_any_modules(self):
+        self.assertTrue(core.BuildHelper._imports_any_modules(['a.b.c'], ['a']))
+        self.assertTrue(core.BuildHelper._imports_any_modules(['a.b.c'], ['a.b.c']))
+        self.assertFalse(core.BuildHelper._imports_any_modules(['a.b'], ['a.b.c']))
+        self.assertFalse(core.BuildHelper._imports_any_modules(['a.bc'], ['a.b']))
+        self.assertFalse(core.BuildHelper._imports_any_modules([], ['a']))
+
+    def test_SqliteCascadeLedger(self):
+        ledger = core.SqliteCascadeLedger(os.path.join(self.tmp_dirname, 'cascade_ledger.sqlite'))
+        self.assertEqual(ledger.get('pkg_1', 1, 'pkg_2'), None)
+
+        self.assertTrue(ledger.claim('pkg_1', '1', 'pkg_2', 'pkg_1', 1))
+        self.assertFalse(ledger.claim('pkg_1', 1, 'pkg_2', 'pkg_3', 2))
+        self.assertTrue(ledger.claim('pkg_1', 2, 'pkg_2', 'pkg_1', 2))
+
+        trigger = ledger.get('pkg_1', 1, 'pkg_2')
+        self.assertEqual(trigger['repo_name'], 'pkg_1')
+        self.assertEqual(trigger['build_num'], 1)
+
+        ledger.release('pkg_1', 1, 'pkg_2')
+        self.assertEqual(ledger.get('pkg_1', 1, 'pkg_2'), None)
+        self.assertNotEqual(ledger.get('pkg_1', 2, 'pkg_2'), None)
+        ledger.close()
+
     def test_trigger_tests_of_downstream_dependencies_dry_run(self):
         build_helper = core.BuildHelper()
         deps, no_deps = build_helper.trigger_tests_of_downstream_dependencies(dry_run=True)
@@ -2744,6 +4271,235 @@ class TestKarrLabBuildUtils(unittest.TestCase):
         self.assertIn('karr_lab_build_utils', config)
         self.assertIn('email_password', config['karr_lab_build_utils'])
 
+    def test_FileCache(self):
+        filename = os.path.join(self.tmp_dirname, 'config.yml')
+        with open(filename, 'w') as file:
+            file.write('key: 1\n')
+
+        def parse():
+            with open(filename, 'r') as file:
+                return yaml.load(file, Loader=yaml.FullLoader)
+        parse = mock.Mock(side_effect=parse)
+
+        cache = core.FileCache()
+        self.assertEqual(cache.get('config', [filename], parse), {'key': 1})
+        value = cache.get('config', [filename], parse)
+        value['key'] = 2
+        self.assertEqual(cache.get('config', [filename], parse), {'key': 1})
+        self.assertEqual(parse.call_count, 1)
+        self.assertEqual(cache.get_stats(), {'hits': 2, 'misses': 1, 'size': 1})
+
+        # touching the file doesn't invalidate the cache
+        os.utime(filename, ns=(0, 0))
+        self.assertEqual(cache.get('config', [filename], parse), {'key': 1})
+        self.assertEqual(parse.call_count, 1)
+
+        # changing the file invalidates the cache
+        with open(filename, 'w') as file:
+            file.write('key: 3\n')
+        self.assertEqual(cache.get('config', [filename], parse), {'key': 3})
+        self.assertEqual(parse.call_count, 2)
+        self.assertEqual(cache.get_stats(), {'hits': 3, 'misses': 2, 'size': 1})
+
+        cache.clear()
+        self.assertEqual(cache.get_stats(), {'hits': 0, 'misses': 0, 'size': 0})
+
+    def test_get_build_config_and_dependencies_cached(self):
+        build_helper = self.construct_build_helper()
+
+        config = build_helper.get_build_config()
+        self.assertEqual(build_helper.get_build_config(), config)
+        dependencies = build_helper.get_dependencies('.', include_extras=False, include_specs=False,
+                                                     include_markers=False)
+        self.assertEqual(build_helper.get_dependencies('.', include_extras=False, include_specs=False,
+                                                       include_markers=False), dependencies)
+        self.assertIn('pkg_utils', dependencies[0])
+        self.assertEqual(build_helper.file_cache.get_stats(), {'hits': 2, 'misses': 2, 'size': 2})
+
+    def test_CircleCiClient(self):
+        def response(status_code, headers=None, result=None):
+            def raise_for_status():
+                if status_code >= 400:
+                    raise requests.exceptions.HTTPError(str(status_code))
+            return attrdict.AttrDict({
+                'status_code': status_code,
+                'headers': headers or {},
+                'json': lambda: result,
+                'raise_for_status': raise_for_status,
+            })
+
+        client = core.CircleCiClient(backoff_factor=0.001)
+
+        # retries and conditional requests
+        with mock.patch('requests.Session.get', side_effect=[
+            response(503),
+            response(429, headers={'Retry-After': '0'}),
+            response(200, headers={'ETag': '"1"'}, result={'build_num': 1}),
+            response(304),
+        ]) as mock_get:
+            self.assertEqual(client.request('get', 'https://circleci.com/api/v1.1/project/a'), {'build_num': 1})
+            self.assertEqual(client.request('get', 'https://circleci.com/api/v1.1/project/a'), {'build_num': 1})
+            self.assertEqual(mock_get.call_args[1]['headers']['If-None-Match'], '"1"')
+        self.assertEqual(client.get_stats(), {'requests': 4, 'retries': 2, 'cache_hits': 0, 'not_modified': 1,
+                                              'cache_size': 1})
+
+        # fresh results aren't requested again
+        with mock.patch('requests.Session.get', side_effect=[
+            response(200, headers={'Cache-Control': 'max-age=60'}, result={'build_num': 2}),
+        ]):
+            self.assertEqual(client.request('get', 'https://circleci.com/api/v1.1/project/b'), {'build_num': 2})
+            self.assertEqual(client.request('get', 'https://circleci.com/api/v1.1/project/b'), {'build_num': 2})
+        self.assertEqual(client.get_stats()['cache_hits'], 1)
+
+        # non-idempotent requests aren't retried after server errors
+        with mock.patch('requests.Session.post', side_effect=[response(502)]):
+            with self.assertRaises(requests.exceptions.HTTPError):
+                client.request('post', 'https://circleci.com/api/v2/project/a/pipeline', data={})
+
+        # too many retries
+        client.max_retries = 1
+        with mock.patch('requests.Session.get', side_effect=[response(500), response(500)]):
+            with self.assertRaises(requests.exceptions.HTTPError):
+                client.request('get', 'https://circleci.com/api/v1.1/project/c')
+
+        self.assertEqual(core.CircleCiClient._parse_retry_after('2'), 2.)
+        self.assertEqual(core.CircleCiClient._parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT'), 0.)
+        self.assertEqual(core.CircleCiClient._parse_retry_after('invalid'), None)
+
+    def test_CircleCiStandIn(self):
+        build_helper = self.construct_build_helper()
+
+        fixtures = {
+            'GET /v1.1/project/github/KarrLab/pkg_1/1': {'status': 200, 'body': {'build_num': 1}},
+            'GET /v1.1/project/github/KarrLab/pkg_1/2': [
+                {'status': 200, 'body': {'build_num': 2, 'lifecycle': 'running'}},
+                {'status': 200, 'body': {'build_num': 2, 'lifecycle': 'finished'}},
+            ],
+        }
+        with testing.CircleCiStandIn(fixtures=fixtures) as stand_in:
+            build_helper.CIRCLE_API_ENDPOINT = stand_in.endpoint
+
+            with stand_in.scenario('lookup'):
+                for i in range(2):
+                    self.assertEqual(build_helper.run_circleci_api('/1', repo_owner='KarrLab', repo_name='pkg_1'),
+                                     {'build_num': 1})
+                self.assertEqual(build_helper.run_circleci_api('/2', repo_owner='KarrLab', repo_name='pkg_1'),
+                                 {'build_num': 2, 'lifecycle': 'running'})
+                self.assertEqual(build_helper.run_circleci_api('/2', repo_owner='KarrLab', repo_name='pkg_1'),
+                                 {'build_num': 2, 'lifecycle': 'finished'})
+                with self.assertRaises(requests.exceptions.HTTPError):
+                    build_helper.run_circleci_api('/3', repo_owner='KarrLab', repo_name='pkg_1')
+
+            self.assertEqual(stand_in.get_counts('lookup'), collections.Counter({
+                'GET /v1.1/project/github/KarrLab/pkg_1/1': 2,
+                'GET /v1.1/project/github/KarrLab/pkg_1/2': 2,
+                'GET /v1.1/project/github/KarrLab/pkg_1/3': 1,
+            }))
+            self.assertEqual([entry['status'] for entry in stand_in.log], [200, 200, 200, 200, 404])
+            self.assertEqual(build_helper.circleci_client.get_stats()['not_modified'], 1)
+
+            # rate limit
+            stand_in.rate = 0.5
+            self.assertEqual(requests.get(stand_in.endpoint + '/v1.1/project/github/KarrLab/pkg_1/1').status_code, 200)
+            response = requests.get(stand_in.endpoint + '/v1.1/project/github/KarrLab/pkg_1/1')
+            self.assertEqual(response.status_code, 429)
+            self.assertEqual(response.headers['Retry-After'], '2')
+
+        # record fixtures
+        fixtures_filename = os.path.join(self.tmp_dirname, 'fixtures', 'circleci.json')
+        fixtures['GET /v1.1/project/github/KarrLab/pkg_1/4'] = {
+            'status': 429, 'body': {'message': 'Too many requests'}, 'headers': {'Retry-After': '3'}}
+        with testing.CircleCiStandIn(fixtures=fixtures) as circleci:
+            with testing.CircleCiStandIn(fixtures_filename=fixtures_filename, record_endpoint=circleci.endpoint,
+                                         latency=0.01) as recorder:
+                build_helper.CIRCLE_API_ENDPOINT = recorder.endpoint
+                self.assertEqual(build_helper.run_circleci_api('/1', repo_owner='KarrLab', repo_name='pkg_1'),
+                                 {'build_num': 1})
+                self.assertEqual(requests.get(recorder.endpoint + '/v1.1/project/github/KarrLab/pkg_1/4').status_code,
+                                 429)
+        with open(fixtures_filename, 'r') as file:
+            self.assertEqual(json.load(file), {
+                'GET /v1.1/project/github/KarrLab/pkg_1/1': {'status': 200, 'body': {'build_num': 1}},
+                'GET /v1.1/project/github/KarrLab/pkg_1/4': {'status': 429, 'body': {'message': 'Too many requests'},
+                                                             'headers': {'Retry-After': '3'}},
+            })
+
+        # replay fixtures
+        with testing.CircleCiStandIn(fixtures_filename=fixtures_filename) as stand_in:
+            build_helper.CIRCLE_API_ENDPOINT = stand_in.endpoint
+            build_helper.circleci_client.clear_cache()
+            self.assertEqual(build_helper.run_circleci_api('/1', repo_owner='KarrLab', repo_name='pkg_1'),
+                             {'build_num': 1})
+            response = requests.get(stand_in.endpoint + '/v1.1/project/github/KarrLab/pkg_1/4')
+            self.assertEqual(response.status_code, 429)
+            self.assertEqual(response.headers['Retry-After'], '3')
+
+    def test_CircleCiBuildStore(self):
+        filename = os.path.join(self.tmp_dirname, 'cache', 'circleci_builds.sqlite')
+        store = core.CircleCiBuildStore(filename, max_size=80)
+        self.assertEqual(store.get('github/KarrLab/pkg', 1), None)
+
+        store.set('github/KarrLab/pkg', 1, {'build_num': 1, 'status': 'success'})
+        store.set('github/KarrLab/pkg', 2, {'build_num': 2, 'status': 'failed'})
+        time.sleep(0.01)
+        self.assertEqual(store.get('github/KarrLab/pkg', 1), {'build_num': 1, 'status': 'success'})
+        self.assertEqual(store.get_stats()['builds'], 2)
+
+        # the least recently used build is evicted
+        time.sleep(0.01)
+        store.set('github/KarrLab/pkg', 3, {'build_num': 3, 'status': 'fixed'})
+        self.assertEqual(store.get('github/KarrLab/pkg', 2), None)
+        self.assertEqual(store.get('github/KarrLab/pkg', 1), {'build_num': 1, 'status': 'success'})
+        self.assertEqual(store.get('github/KarrLab/pkg', 3), {'build_num': 3, 'status': 'fixed'})
+        self.assertLessEqual(store.get_stats()['size'], 80)
+
+        # the store persists
+        store.close()
+        store = core.CircleCiBuildStore(filename)
+        self.assertEqual(store.get('github/KarrLab/pkg', 3), {'build_num': 3, 'status': 'fixed'})
+        store.clear()
+        self.assertEqual(store.get_stats(), {'builds': 0, 'size': 0})
+        store.close()
+
+    def test_get_circleci_build(self):
+        build_helper = self.construct_build_helper()
+        build_helper.circleci_build_store = core.CircleCiBuildStore(
+            os.path.join(self.tmp_dirname, 'circleci_builds.sqlite'))
+
+        circle_yml = {
+            'string': json.dumps({
+                'jobs': {
+                    'build': {
+                        'steps': [
+                            'checkout',
+                            {'run': {'environment': {'UPSTREAM_REPONAME': 'pkg_1', 'UPSTREAM_BUILD_NUM': '3'}}},
+                        ],
+                    },
+                },
+            }),
+        }
+        running_build = attrdict.AttrDict({
+            'raise_for_status': lambda: None,
+            'json': lambda: {'build_num': 1, 'lifecycle': 'running', 'circle_yml': circle_yml},
+        })
+        finished_build = attrdict.AttrDict({
+            'raise_for_status': lambda: None,
+            'json': lambda: {'build_num': 1, 'lifecycle': 'finished', 'status': 'success', 'circle_yml': circle_yml},
+        })
+        with mock.patch('requests.Session.get', side_effect=[running_build, finished_build]) as mock_get:
+            build = build_helper.get_circleci_build(1, repo_name='pkg_2')
+            self.assertEqual(build['lifecycle'], 'running')
+            self.assertEqual(build['upstream_environment'], {'UPSTREAM_REPONAME': 'pkg_1', 'UPSTREAM_BUILD_NUM': '3'})
+            self.assertNotIn('circle_yml', build)
+
+            build = build_helper.get_circleci_build(1, repo_name='pkg_2')
+            self.assertEqual(build['status'], 'success')
+
+            # finished builds are retrieved from the store
+            self.assertEqual(build_helper.get_circleci_build(1, repo_name='pkg_2'), build)
+            self.assertEqual(mock_get.call_count, 2)
+        build_helper.circleci_build_store.close()
+
 
 @pytest.fixture()
 def dummy_pytest_fixture():